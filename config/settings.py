@@ -15,13 +15,131 @@ class Settings(BaseSettings):
     glm_model: str = "glm-4"
     glm_base_url: str = "https://open.bigmodel.cn/api/paas/v4"
 
+    # HTTP Transport
+    http_shared_pool: bool = True
+    http2_enabled: bool = False
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_connect_timeout: float = 10.0
+    http_read_timeout: float = 60.0
+    http_write_timeout: float = 30.0
+    http_pool_timeout: float = 10.0
+
+    # Retry & Rate Limiting (0 disables a limit)
+    glm_max_retries: int = 5
+    glm_retry_base_delay: float = 0.5
+    glm_retry_max_delay: float = 30.0
+    glm_requests_per_minute: int = 0
+    glm_tokens_per_minute: int = 0
+
+    # Response Cache
+    response_cache_enabled: bool = False
+    response_cache_path: str = "./response_cache.db"
+    response_cache_ttl: int = 86400
+    response_cache_max_entries: int = 1024
+    response_cache_max_disk_entries: int = 100000
+    response_cache_allow_nondeterministic: bool = False
+
+    # Request Coalescing
+    glm_coalesce_requests: bool = True
+
     # Database
     database_url: str = "sqlite+aiosqlite:///./knowledge_base.db"
 
+    # Knowledge Retrieval (embedding_backend: sentence-transformers|hashing)
+    embedding_backend: str = "sentence-transformers"
+    embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_dimension: int = 384
+    retrieval_similarity_weight: float = 0.8
+    retrieval_success_weight: float = 0.15
+    retrieval_usage_weight: float = 0.05
+
+    # Knowledge Base Writes
+    kb_write_batch_size: int = 64
+    kb_write_max_delay: float = 0.5
+    kb_decay_half_life_days: float = 14.0
+    kb_read_pool_size: int = 8
+    kb_pattern_cache_size: int = 4096
+    kb_dedup_enabled: bool = True
+    kb_near_duplicate_threshold: float = 0.85
+    kb_minhash_permutations: int = 64
+    kb_lsh_bands: int = 16
+
+    # Knowledge Base Retention (0 disables a rule)
+    kb_retention_max_rows_per_type: int = 5000
+    kb_retention_min_success_rate: float = 0.2
+    kb_retention_min_uses: int = 5
+    kb_retention_max_age_days: float = 180.0
+    kb_maintenance_interval_hours: float = 0.0
+
+    # SQLite Tuning (cache_size < 0 is in KiB)
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout: int = 5000
+    sqlite_cache_size: int = -65536
+    sqlite_mmap_size: int = 268435456
+
     # Agent Settings
     max_iterations: int = 100
     learning_enabled: bool = True
     autonomy_level: str = "medium"
+    plan_max_workers: int = 4
+
+    # Plan Cache (reuse cached plans above reuse_threshold, seed the planner above seed_threshold)
+    plan_cache_enabled: bool = True
+    plan_cache_reuse_threshold: float = 0.75
+    plan_cache_seed_threshold: float = 0.6
+    plan_cache_max_parameters: int = 3
+    plan_cache_min_success: float = 0.5
+    plan_cache_min_uses: int = 3
+
+    # Context Window (context_max_tokens=0 uses the model's window)
+    context_max_tokens: int = 0
+    context_reserve_tokens: int = 4096
+    context_pin_first_turn: bool = True
+    context_summarize: bool = True
+    context_summary_max_tokens: int = 512
+    context_tokenizer: str = "approximate"
+
+    # Tool Execution
+    tool_max_concurrency: int = 8
+    tool_process_concurrency: int = 2
+    tool_result_max_chars: int = 4000
+
+    # Bash Tool (0 disables a limit)
+    bash_timeout: float = 600.0
+    bash_idle_timeout: float = 120.0
+    bash_max_output_bytes: int = 1_000_000
+    bash_cpu_time_limit: int = 0
+    bash_memory_limit_mb: int = 0
+    bash_pool_enabled: bool = False
+    bash_pool_size: int = 4
+    bash_pool_max_uses: int = 200
+    bash_python_worker: bool = True
+    bash_python_preload: str = "pytest"
+
+    # File Cache (files above the mmap threshold are read via mmap, never cached)
+    file_cache_max_bytes: int = 64 * 1024 * 1024
+    file_cache_mmap_threshold: int = 8 * 1024 * 1024
+
+    # Workspace Index (search_files; directory names in the exclude list are never walked)
+    workspace_index_exclude: str = (
+        ".git,.hg,.svn,node_modules,__pycache__,.venv,venv,.tox,.nox,"
+        ".mypy_cache,.pytest_cache,.ruff_cache"
+    )
+    workspace_index_use_inotify: bool = True
+    workspace_index_poll_interval: float = 2.0
+    workspace_index_max_files: int = 500_000
+    search_max_results: int = 200
+
+    # Content Search (files above the size limit are scanned, not indexed; 0 workers = CPUs)
+    content_search_index: bool = True
+    content_search_index_dir: str = "~/.cache/glm-code-system/search"
+    content_search_max_file_bytes: int = 2_000_000
+    content_search_workers: int = 0
+    content_search_max_matches: int = 100
+    content_search_context_lines: int = 2
 
     # Security
     allowed_commands: str = "git,npm,pnpm,yarn,python,pytest,node"
@@ -1,3 +1,15 @@
 from .base import BaseAgent
+from .context import ContextWindow
+from .task_graph import Subtask, TaskGraph, TaskScheduler, parse_plan
+from .tool_loop import AgentEvent, run_tool_loop
 
-__all__ = ["BaseAgent"]
+__all__ = [
+    "BaseAgent",
+    "ContextWindow",
+    "Subtask",
+    "TaskGraph",
+    "TaskScheduler",
+    "parse_plan",
+    "AgentEvent",
+    "run_tool_loop",
+]
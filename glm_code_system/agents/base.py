@@ -2,6 +2,7 @@
 
 from typing import Any
 
+from glm_code_system.agents.context import ContextWindow
 from glm_code_system.utils.glm_client import GLMClient
 from glm_code_system.tools.registry import ToolRegistry
 from glm_code_system.learning.knowledge_base import KnowledgeBase
@@ -23,6 +24,7 @@ class BaseAgent:
         self.kb = knowledge_base
         self.system_prompt = system_prompt
         self.memory: list[dict[str, Any]] = []
+        self.context = ContextWindow(model)
 
     async def think(
         self,
@@ -31,15 +33,7 @@ class BaseAgent:
         temperature: float = 0.7,
     ) -> str:
         """Generate response to user input."""
-        messages = []
-
-        if self.system_prompt:
-            messages.append({"role": "system", "content": self.system_prompt})
-
-        if use_memory and self.memory:
-            messages.extend(self.memory)
-
-        messages.append({"role": "user", "content": user_input})
+        messages = self._build_messages(user_input, use_memory)
 
         response = await self.model.generate(messages, temperature=temperature)
 
@@ -56,15 +50,7 @@ class BaseAgent:
         temperature: float = 0.7,
     ):
         """Generate streaming response."""
-        messages = []
-
-        if self.system_prompt:
-            messages.append({"role": "system", "content": self.system_prompt})
-
-        if use_memory and self.memory:
-            messages.extend(self.memory)
-
-        messages.append({"role": "user", "content": user_input})
+        messages = self._build_messages(user_input, use_memory)
 
         response_chunks = []
         async for chunk in self.model.generate_stream(messages, temperature=temperature):
@@ -77,6 +63,17 @@ class BaseAgent:
             self.memory.append({"role": "user", "content": user_input})
             self.memory.append({"role": "assistant", "content": full_response})
 
+    def _build_messages(self, user_input: str, use_memory: bool) -> list[dict[str, Any]]:
+        """Build the prompt, keeping memory within the model's token budget."""
+        if not use_memory:
+            messages = []
+            if self.system_prompt:
+                messages.append({"role": "system", "content": self.system_prompt})
+            messages.append({"role": "user", "content": user_input})
+            return messages
+
+        return self.context.build_messages(self.system_prompt, self.memory, user_input)
+
     async def use_tool(
         self,
         tool_name: str,
@@ -90,20 +87,38 @@ class BaseAgent:
 
         return (False, result.error or "Unknown error")
 
-    async def search_knowledge(self, query: str) -> list[Any]:
-        """Search knowledge base for relevant information."""
-        patterns = await self.kb.search_patterns(limit=5)
-
+    async def use_tools(
+        self,
+        calls: list[tuple[str, dict[str, Any]]],
+    ) -> list[tuple[bool, str]]:
+        """Run independent tool calls concurrently; results keep call order."""
+        results = await self.tools.execute_many(calls)
         return [
-            {
-                "type": pattern.pattern_type,
-                "code": pattern.code,
-                "description": pattern.description,
-                "success_rate": pattern.success_rate,
-            }
-            for pattern in patterns
+            (True, result.output) if result.success else (False, result.error or "Unknown error")
+            for result in results
         ]
 
+    async def search_knowledge(
+        self,
+        query: str,
+        include_code: bool = False,
+    ) -> list[Any]:
+        """Search knowledge base for relevant information.
+
+        Code bodies are only loaded when ``include_code`` is set.
+        """
+        results = await self.kb.semantic_search_pattern_summaries(query, limit=5)
+
+        knowledge = []
+        for summary, score in results:
+            info = {**summary.to_dict(), "score": score}
+            if include_code:
+                info["code"] = await self.kb.get_pattern_code(summary.id)
+            knowledge.append(info)
+
+        return knowledge
+
     def clear_memory(self) -> None:
         """Clear agent memory."""
         self.memory = []
+        self.context.reset()
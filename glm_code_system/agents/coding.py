@@ -1,11 +1,16 @@
 """Coding agent for implementing tasks."""
 
 import json
-from typing import Any
+import re
+from typing import Any, AsyncGenerator
 
 from glm_code_system.agents.base import BaseAgent
+from glm_code_system.agents.tool_loop import AgentEvent, LoopResult, run_tool_loop
 from glm_code_system.tools.registry import ToolResult
 
+# Final line the model is asked to end its report with.
+_STATUS_LINE = re.compile(r"^\W*status\W*:\W*(success|failure)\b", re.I | re.M)
+
 
 class CodingAgent(BaseAgent):
     """Agent specialized in writing and modifying code."""
@@ -27,15 +32,14 @@ Your responsibilities:
 5. Run tests and verify functionality
 6. Report results and any issues
 
-Available tools:
-- read_file(path): Read file contents
-- write_file(path, content): Write content to file
-- bash(command): Execute shell commands
-- search_files(pattern): Search for files
+Call tools (read_file, write_file, bash, search_files, search_content)
+through function calling. Calls you make in the same turn run in parallel,
+so batch independent reads and searches. Prefer write_file with a diff for
+small edits.
 
 When using tools, clearly state what you're doing and why.
 Always test your changes if possible.
-Report success or failure clearly."""
+End your final answer with a line "STATUS: success" or "STATUS: failure"."""
         super().__init__(model, tools, knowledge_base, system_prompt)
         self.current_task: dict[str, Any] | None = None
         self.test_results: list[dict[str, Any]] = []
@@ -45,7 +49,46 @@ Report success or failure clearly."""
         task: dict[str, Any],
         plan_context: str | None = None,
     ) -> dict[str, Any]:
-        """Execute a single coding task."""
+        """Execute a single coding task.
+
+        The task succeeded if the loop finished, the last test run of the
+        task (if any) passed, and the model did not report failure.
+        """
+        result = LoopResult("", False, 0, [])
+        async for event in self.stream_task(task, plan_context):
+            if event.kind == "done":
+                result = event.data
+
+        test_runs = [run for run in map(self._test_run, result.tool_calls) if run is not None]
+        statuses = _STATUS_LINE.findall(result.content)
+        success = (
+            result.finished
+            and (not test_runs or test_runs[-1]["success"])
+            and (not statuses or statuses[-1].lower() == "success")
+        )
+
+        return {
+            "task": task,
+            "success": success,
+            "output": result.content,
+            "iterations": result.iterations,
+            "tool_calls": [
+                {"name": call.name, "arguments": call.arguments, "success": call.result.success}
+                for call in result.tool_calls
+            ],
+            "test_results": test_runs,
+        }
+
+    async def stream_task(
+        self,
+        task: dict[str, Any],
+        plan_context: str | None = None,
+    ) -> AsyncGenerator[AgentEvent, None]:
+        """Execute a task, streaming text, tool-call arguments and tool results.
+
+        The last event is "done" with the LoopResult. Only the prompt and the
+        final answer are kept in memory, not the intermediate tool traffic.
+        """
         self.current_task = task
 
         context = f"Context:\n{plan_context}" if plan_context else ""
@@ -59,16 +102,28 @@ Complexity: {task.get('complexity', 'medium')}
 
 Use available tools to implement this task.
 Test your changes if possible.
-Report the result clearly."""
-
-        result = await self.think_stream(prompt)
-
-        return {
-            "task": task,
-            "success": True,
-            "output": result,
-            "test_results": self.test_results,
-        }
+Report the result clearly, ending with "STATUS: success" or "STATUS: failure"."""
+
+        messages = self._build_messages(prompt, use_memory=True)
+        async for event in run_tool_loop(
+            self.model, self.tools, messages, context=self.context
+        ):
+            if event.kind == "tool_result":
+                test_run = self._test_run(event.data)
+                if test_run is not None:
+                    self.test_results.append(test_run)
+            elif event.kind == "done":
+                self.memory.append({"role": "user", "content": prompt})
+                self.memory.append({"role": "assistant", "content": event.data.content})
+            yield event
+
+    @staticmethod
+    def _test_run(call: Any) -> dict[str, Any] | None:
+        """Outcome of a tool call if it was a test command, else None."""
+        command = str(call.arguments.get("command", ""))
+        if call.name != "bash" or "pytest" not in command:
+            return None
+        return {"command": command, "success": call.result.success, "output": call.result.output}
 
     async def write_code(
         self,
@@ -80,8 +135,9 @@ Report the result clearly."""
         result = await self.use_tool("write_file", path=path, content=content)
 
         if result[0]:
+            # Recorded write-behind so learning never delays the coding turn.
             pattern_type = self._infer_pattern_type(description)
-            await self.kb.add_pattern(
+            self.kb.enqueue_pattern(
                 pattern_type=pattern_type,
                 code=content,
                 description=description,
@@ -94,7 +150,7 @@ Report the result clearly."""
         """Run tests for the current task."""
         results = []
 
-        success, output = await self.use_tool("bash", "pytest -v")
+        success, output = await self.use_tool("bash", command="pytest -v")
 
         test_result = {
             "command": "pytest -v",
@@ -138,7 +194,7 @@ Report the result clearly."""
         """Learn from the execution of a task."""
         if task_result["success"]:
             # Record successful patterns
-            await self.kb.add_solution(
+            self.kb.enqueue_solution(
                 problem_type="coding_task",
                 solution=task_result.get("output", ""),
                 description=f"Successfully completed: {self.current_task['description']}",
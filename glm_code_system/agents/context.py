@@ -0,0 +1,237 @@
+"""Token-aware context window management for agent memory."""
+
+import asyncio
+import logging
+from typing import Any
+
+from config.settings import settings
+from glm_code_system.utils.tokenizer import (
+    Tokenizer,
+    count_message_tokens,
+    get_tokenizer,
+)
+
+logger = logging.getLogger(__name__)
+
+# Context window sizes in tokens for known GLM models.
+MODEL_CONTEXT_WINDOWS: dict[str, int] = {
+    "glm-4": 128000,
+    "glm-4-plus": 128000,
+    "glm-4-air": 128000,
+    "glm-4-airx": 8192,
+    "glm-4-flash": 128000,
+    "glm-4-long": 1000000,
+    "glm-4v": 2048,
+    "glm-3-turbo": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Stands in for an old tool result elided to fit the budget.
+ELIDED_TOOL_RESULT = "[Result omitted to save context; call the tool again if it is needed.]"
+
+SUMMARY_PROMPT = """\
+Summarize the earlier part of a conversation between a user and a coding assistant.
+Keep decisions, requirements, file names, code identifiers and open issues. Be concise.
+
+{previous}Conversation:
+{transcript}"""
+
+
+def turn_bounds(messages: list[dict[str, Any]]) -> list[tuple[int, int]]:
+    """``(start, end)`` of each turn: a user message and every reply up to the next one."""
+    starts = [0] + [i for i, m in enumerate(messages) if i and m.get("role") == "user"]
+    return [
+        (start, end) for start, end in zip(starts, starts[1:] + [len(messages)]) if start < end
+    ]
+
+
+def tool_round_bounds(messages: list[dict[str, Any]], start: int) -> list[tuple[int, int]]:
+    """``(start, end)`` of each tool round from ``start``: an assistant message and its results."""
+    starts = [i for i in range(start, len(messages)) if messages[i].get("role") == "assistant"]
+    return list(zip(starts, starts[1:] + [len(messages)]))
+
+
+class ContextWindow:
+    """Keeps the messages sent to the model within a token budget.
+
+    The system prompt and (optionally) the first exchange are pinned, the
+    most recent turns fill the remaining budget, and older turns are evicted
+    from memory. Evicted turns are folded into a rolling summary generated in
+    the background, so a turn never waits on summarization.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        max_tokens: int | None = None,
+        reserve_tokens: int | None = None,
+        tokenizer: Tokenizer | None = None,
+        pin_first_turn: bool | None = None,
+        summarize: bool | None = None,
+    ) -> None:
+        """Initialize context window."""
+        self.model = model
+        self.max_tokens = settings.context_max_tokens if max_tokens is None else max_tokens
+        self.reserve_tokens = (
+            settings.context_reserve_tokens if reserve_tokens is None else reserve_tokens
+        )
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.pin_first_turn = (
+            settings.context_pin_first_turn if pin_first_turn is None else pin_first_turn
+        )
+        self.summarize = settings.context_summarize if summarize is None else summarize
+
+        self.summary: str | None = None
+        self._pending: list[dict[str, Any]] = []
+        self._summary_task: asyncio.Task[None] | None = None
+        self.stats: dict[str, int] = {
+            "evicted_messages": 0,
+            "elided_tool_results": 0,
+            "summaries": 0,
+        }
+
+    @property
+    def budget(self) -> int:
+        """Prompt token budget for the current model."""
+        if self.max_tokens > 0:
+            window = self.max_tokens
+        else:
+            model_name = getattr(self.model, "model", settings.glm_model)
+            window = MODEL_CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW)
+
+        return max(window - self.reserve_tokens, 0)
+
+    def _count(self, message: dict[str, Any]) -> int:
+        """Count tokens in one message, including any tool calls it carries."""
+        return count_message_tokens([message], self.tokenizer)
+
+    def build_messages(
+        self,
+        system_prompt: str | None,
+        memory: list[dict[str, Any]],
+        user_input: str,
+    ) -> list[dict[str, Any]]:
+        """Build the messages for one turn, evicting old turns from ``memory`` in place."""
+        head: list[dict[str, Any]] = []
+        if system_prompt:
+            head.append({"role": "system", "content": system_prompt})
+        if self.summary:
+            head.append(
+                {"role": "system", "content": f"Summary of earlier conversation:\n{self.summary}"}
+            )
+        user_message = {"role": "user", "content": user_input}
+
+        remaining = self.budget - count_message_tokens(head + [user_message], self.tokenizer)
+
+        # Turns are kept or evicted whole, so an assistant reply never loses its
+        # prompt and a "tool" result never loses the call that asked for it.
+        turns = turn_bounds(memory)
+        pinned = memory[: turns[0][1]] if self.pin_first_turn and len(turns) > 1 else []
+        pinned_tokens = sum(self._count(m) for m in pinned)
+        if pinned_tokens > remaining:
+            pinned, pinned_tokens = [], 0
+        remaining -= pinned_tokens
+
+        # Fill the rest of the budget with the most recent turns.
+        start = len(memory)
+        for turn_start, turn_end in reversed(turns):
+            if turn_start < len(pinned):
+                break
+            cost = sum(self._count(m) for m in memory[turn_start:turn_end])
+            if cost > remaining:
+                break
+            remaining -= cost
+            start = turn_start
+
+        evicted = memory[len(pinned):start]
+        if evicted:
+            del memory[len(pinned):start]
+            self.stats["evicted_messages"] += len(evicted)
+            if self.summarize:
+                self._pending.extend(evicted)
+                self._schedule_summary()
+
+        return head[:1] + pinned + head[1:] + memory[len(pinned):] + [user_message]
+
+    def fit_tool_rounds(self, messages: list[dict[str, Any]], start: int) -> None:
+        """Shrink the tool rounds from ``messages[start]`` on, in place, to fit the budget.
+
+        Results of the oldest rounds are elided first; if that is not
+        enough, the oldest rounds are dropped whole, so no "tool" message
+        outlives the call it answers. The latest round is always kept.
+        """
+        total = count_message_tokens(messages, self.tokenizer)
+        if total <= self.budget:
+            return
+
+        rounds = tool_round_bounds(messages, start)[:-1]
+        for round_start, round_end in rounds:
+            for message in messages[round_start + 1 : round_end]:
+                if message.get("role") != "tool" or message["content"] == ELIDED_TOOL_RESULT:
+                    continue
+                total -= self._count(message)
+                message["content"] = ELIDED_TOOL_RESULT
+                total += self._count(message)
+                self.stats["elided_tool_results"] += 1
+            if total <= self.budget:
+                return
+
+        cut = None
+        for round_start, round_end in rounds:
+            total -= sum(self._count(m) for m in messages[round_start:round_end])
+            cut = round_end
+            if total <= self.budget:
+                break
+        if cut is not None:
+            self.stats["evicted_messages"] += cut - rounds[0][0]
+            del messages[rounds[0][0] : cut]
+
+    def _schedule_summary(self) -> None:
+        """Start a background summary of pending evicted turns if none is running."""
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        evicted, self._pending = self._pending, []
+        self._summary_task = loop.create_task(self._summarize(evicted))
+
+    async def _summarize(self, evicted: list[dict[str, Any]]) -> None:
+        """Fold evicted turns into the rolling summary."""
+        transcript = "\n".join(f"{m.get('role')}: {m.get('content')}" for m in evicted)
+        limit = self.budget * 4
+        if len(transcript) > limit:
+            transcript = transcript[-limit:]
+
+        previous = f"Previous summary:\n{self.summary}\n\n" if self.summary else ""
+        prompt = SUMMARY_PROMPT.format(previous=previous, transcript=transcript)
+
+        try:
+            self.summary = await self.model.generate(
+                [{"role": "user", "content": prompt}],
+                temperature=0.0,
+                max_tokens=settings.context_summary_max_tokens,
+            )
+            self.stats["summaries"] += 1
+        except Exception as e:
+            logger.warning("Failed to summarize evicted context: %s", e)
+
+        if self._pending:
+            self._summary_task = None
+            self._schedule_summary()
+
+    async def wait_for_summary(self) -> None:
+        """Wait for background summarization to finish."""
+        while self._summary_task is not None and not self._summary_task.done():
+            await self._summary_task
+
+    def reset(self) -> None:
+        """Forget the summary and any pending evictions."""
+        if self._summary_task is not None and not self._summary_task.done():
+            self._summary_task.cancel()
+        self._summary_task = None
+        self._pending = []
+        self.summary = None
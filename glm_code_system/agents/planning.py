@@ -1,8 +1,14 @@
 """Planning agent for task analysis and decomposition."""
 
-from typing import Any
+from typing import Any, Callable
 
+from config.settings import settings
 from glm_code_system.agents.base import BaseAgent
+from glm_code_system.agents.task_graph import Subtask, TaskOutcome, TaskScheduler, parse_plan
+from glm_code_system.learning.plan_cache import PlanCache
+
+# Characters of each upstream task's output passed on as context.
+UPSTREAM_OUTPUT_CHARS = 500
 
 
 class PlanningAgent(BaseAgent):
@@ -28,20 +34,53 @@ Your responsibilities:
 Format your plans as:
 - Main goal: [clear description]
 - Subtasks:
-  1. [task description] (complexity: low/medium/high)
-  2. [task description] (complexity: low/medium/high)
+  1. [task description] (complexity: low/medium/high; depends on: none)
+  2. [task description] (complexity: low/medium/high; depends on: 1)
   ...
-- Dependencies: [what must be done first]
+- Dependencies: [what must be done first, e.g. "3 depends on 1, 2"]
 - Risks: [potential issues]
 
+List only real dependencies: subtasks that do not depend on each other
+are executed in parallel.
+
 Always consider past solutions from the knowledge base."""
         super().__init__(model, tools, knowledge_base, system_prompt)
+        self.plan_cache = PlanCache(knowledge_base) if settings.plan_cache_enabled else None
 
     async def create_plan(
         self,
         user_request: str,
     ) -> dict[str, Any]:
-        """Create a detailed plan for the user request."""
+        """Create a detailed plan for the user request.
+
+        A cached plan for a near-identical request is reused without calling
+        the model; a merely similar one is adapted with a short prompt.
+        """
+        template = await self.plan_cache.lookup(user_request) if self.plan_cache else None
+        if template is not None:
+            if template.adapted is not None:
+                plan_text = template.adapted
+                cache = "hit"
+            else:
+                plan_text = await self.think(
+                    f"""Adapt this plan for a similar request to: {user_request}
+
+Request: {template.request}
+Plan:
+{template.plan}
+
+Keep the same format. Change only what the new request needs."""
+                )
+                cache = "seeded"
+            return {
+                "request": user_request,
+                "plan": plan_text,
+                "graph": parse_plan(plan_text, fallback=user_request),
+                "relevant_patterns": [],
+                "template_id": template.id,
+                "cache": cache,
+            }
+
         # Search knowledge base for similar patterns
         relevant_info = await self.search_knowledge(user_request)
 
@@ -62,7 +101,10 @@ Consider best practices and potential issues. Be thorough but practical."""
         return {
             "request": user_request,
             "plan": plan_text,
+            "graph": parse_plan(plan_text, fallback=user_request),
             "relevant_patterns": relevant_info,
+            "template_id": None,
+            "cache": "miss",
         }
 
     async def refine_plan(
@@ -86,5 +128,60 @@ Update the plan to address the feedback."""
         return {
             **current_plan,
             "plan": refined_plan,
+            "graph": parse_plan(refined_plan, fallback=current_plan["request"]),
             "refined": True,
         }
+
+    async def execute_plan(
+        self,
+        plan: dict[str, Any],
+        coder_factory: Callable[[], Any],
+        max_workers: int | None = None,
+    ) -> dict[str, Any]:
+        """Run a plan's subtasks, independent ones concurrently.
+
+        ``coder_factory`` returns a fresh CodingAgent per subtask, so parallel
+        subtasks never share conversation memory. Each subtask sees the plan
+        and the outputs of the subtasks it depends on.
+        """
+        graph = plan.get("graph") or parse_plan(plan["plan"], fallback=plan["request"])
+
+        async def run(task: Subtask, finished: dict[int, TaskOutcome]) -> dict[str, Any]:
+            upstream = ""
+            for dep in task.depends_on:
+                result = finished[dep].result or {}
+                output = str(result.get("output", ""))[:UPSTREAM_OUTPUT_CHARS]
+                upstream += f"\n- Subtask {dep} ({finished[dep].task.description}): {output}"
+            context = f"Plan:\n{plan['plan']}"
+            if upstream:
+                context += f"\n\nCompleted prerequisites:{upstream}"
+            return await coder_factory().execute_task(task.to_dict(), plan_context=context)
+
+        outcomes = await TaskScheduler(max_workers).run(graph, run)
+        success = all(outcome.status == "succeeded" for outcome in outcomes.values())
+        await self._learn_plan(plan, success)
+        return {
+            "request": plan["request"],
+            "success": success,
+            "critical_path": graph.critical_path_length(),
+            "results": [
+                {
+                    "task": outcome.task.to_dict(),
+                    "status": outcome.status,
+                    "result": outcome.result,
+                    "error": outcome.error,
+                    "duration": outcome.duration,
+                }
+                for outcome in outcomes.values()
+            ],
+        }
+
+    async def _learn_plan(self, plan: dict[str, Any], success: bool) -> None:
+        """Score the template a plan came from and cache new plans that worked."""
+        if self.plan_cache is None or not settings.learning_enabled:
+            return
+
+        if plan.get("template_id") is not None:
+            await self.plan_cache.record_outcome(plan["template_id"], success)
+        if success and (plan.get("cache") != "hit" or plan.get("refined")):
+            await self.plan_cache.store(plan["request"], plan["plan"])
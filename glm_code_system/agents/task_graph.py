@@ -0,0 +1,357 @@
+"""Plan subtasks as a dependency graph, and a scheduler that runs them concurrently."""
+
+import asyncio
+import heapq
+import json
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+COMPLEXITY_WEIGHTS = {"low": 1.0, "medium": 2.0, "high": 3.0}
+
+_SUBTASK_LINE = re.compile(r"^\s*(?:[-*]\s*)?(?:(?:sub)?task\s*)?#?(\d+)\s*[.):]\s+(.+)$", re.I)
+_SECTION = re.compile(r"^\s*[-*]?\s*\**\s*(main goal|subtasks?|dependencies|risks)\b", re.I)
+_COMPLEXITY = re.compile(r"complexity\s*:?\s*(low|medium|high)", re.I)
+# Matched only inside annotations; the id list must end the clause ("requires 3 tables" doesn't).
+_INLINE_DEPENDS = re.compile(
+    r"(?:depends on|after|requires)\s*:?\s*((?:#?\d+\s*(?:,|and|&)?\s*)+)(?=[;.]|$)", re.I
+)
+_DEPENDS_SENTENCE = re.compile(
+    r"(?:sub)?(?:task|step)?\s*#?(\d+)\s+(?:depends on|requires|needs|comes after|follows|"
+    r"must follow|after)\s+(?:(?:sub)?tasks?|steps?)?\s*((?:#?\d+\s*(?:,|and|&)?\s*)+)",
+    re.I,
+)
+_DEPENDS_COLON = re.compile(r"^\s*[-*]?\s*(?:(?:sub)?task\s*)?#?(\d+)\s*:\s*((?:#?\d+\s*,?\s*)+)$")
+_ARROW_CHAIN = re.compile(r"#?\d+(?:\s*(?:->|→|=>)\s*#?\d+)+")
+_ANNOTATION = re.compile(r"\s*\([^()]*(?:complexity|depends on|after|requires)[^()]*\)", re.I)
+_NO_DEPENDENCIES = re.compile(r"\b(none|no dependencies|independent|n/a)\b", re.I)
+
+
+class Subtask(NamedTuple):
+    """One node of a plan."""
+
+    id: int
+    description: str
+    complexity: str = "medium"
+    depends_on: tuple[int, ...] = ()
+
+    @property
+    def weight(self) -> float:
+        """Relative cost used for critical-path ordering."""
+        return COMPLEXITY_WEIGHTS.get(self.complexity, COMPLEXITY_WEIGHTS["medium"])
+
+    def to_dict(self) -> dict[str, Any]:
+        """Task dict as taken by ``CodingAgent.execute_task``."""
+        return {
+            "id": self.id,
+            "description": self.description,
+            "complexity": self.complexity,
+            "depends_on": list(self.depends_on),
+        }
+
+
+class TaskGraph:
+    """A validated DAG of subtasks.
+
+    Dependencies on unknown ids or on the task itself are dropped. If the
+    edges contain a cycle, only edges from lower to higher ids are kept,
+    which always yields a DAG that respects the written order.
+    """
+
+    def __init__(self, tasks: list[Subtask]) -> None:
+        """Initialize task graph."""
+        ids = {task.id for task in tasks}
+        cleaned = [
+            task._replace(
+                depends_on=tuple(
+                    sorted({dep for dep in task.depends_on if dep in ids and dep != task.id})
+                )
+            )
+            for task in tasks
+        ]
+        self.tasks: dict[int, Subtask] = {task.id: task for task in cleaned}
+        if self._topological_order() is None:
+            logger.warning("Plan dependencies contain a cycle; keeping forward edges only")
+            self.tasks = {
+                task.id: task._replace(depends_on=tuple(d for d in task.depends_on if d < task.id))
+                for task in cleaned
+            }
+
+        self.dependents: dict[int, list[int]] = {task_id: [] for task_id in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.depends_on:
+                self.dependents[dep].append(task.id)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def _topological_order(self) -> list[int] | None:
+        indegree = {task_id: len(task.depends_on) for task_id, task in self.tasks.items()}
+        children: dict[int, list[int]] = {task_id: [] for task_id in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.depends_on:
+                children[dep].append(task.id)
+
+        ready = sorted(task_id for task_id, count in indegree.items() if not count)
+        order = []
+        while ready:
+            task_id = ready.pop(0)
+            order.append(task_id)
+            for child in children[task_id]:
+                indegree[child] -= 1
+                if not indegree[child]:
+                    ready.append(child)
+        return order if len(order) == len(self.tasks) else None
+
+    def order(self) -> list[int]:
+        """Task ids in a dependency-respecting order."""
+        return self._topological_order() or []
+
+    def critical_path(self) -> dict[int, float]:
+        """Weight of the heaviest chain starting at each task (including it)."""
+        remaining: dict[int, float] = {}
+        for task_id in reversed(self.order()):
+            tail = max((remaining[child] for child in self.dependents[task_id]), default=0.0)
+            remaining[task_id] = self.tasks[task_id].weight + tail
+        return remaining
+
+    def critical_path_length(self) -> float:
+        """Weight of the longest chain; a lower bound on total run time."""
+        return max(self.critical_path().values(), default=0.0)
+
+    def descendants(self, task_id: int) -> set[int]:
+        """Every task that transitively depends on ``task_id``."""
+        found: set[int] = set()
+        stack = list(self.dependents.get(task_id, []))
+        while stack:
+            child = stack.pop()
+            if child not in found:
+                found.add(child)
+                stack.extend(self.dependents[child])
+        return found
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serialisable form."""
+        return {"subtasks": [self.tasks[task_id].to_dict() for task_id in sorted(self.tasks)]}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any] | list[Any]) -> "TaskGraph":
+        """Graph from ``{"subtasks": [...]}`` or a bare list of subtask objects."""
+        items = data.get("subtasks", []) if isinstance(data, dict) else data
+        tasks = []
+        for position, item in enumerate(items, 1):
+            if isinstance(item, str):
+                item = {"description": item}
+            depends = item.get("depends_on", item.get("dependencies", [])) or []
+            if isinstance(depends, (int, str)):
+                depends = [depends]
+            complexity = str(item.get("complexity", "medium")).lower()
+            tasks.append(
+                Subtask(
+                    id=int(item.get("id", position)),
+                    description=str(item.get("description") or item.get("title") or ""),
+                    complexity=complexity if complexity in COMPLEXITY_WEIGHTS else "medium",
+                    depends_on=tuple(int(dep) for dep in depends if str(dep).isdigit()),
+                )
+            )
+        return cls(tasks)
+
+
+def _ids(text: str) -> list[int]:
+    return [int(value) for value in re.findall(r"\d+", text)]
+
+
+def _json_plan(text: str) -> TaskGraph | None:
+    """Graph from a JSON plan, bare or in a fenced block, if the text is one."""
+    fenced = re.search(r"```(?:json)?\s*(\{.*?\}|\[.*?\])\s*```", text, re.S)
+    stripped = text.strip()
+    candidate = fenced.group(1) if fenced else stripped
+    if not candidate.startswith(("{", "[")):
+        return None
+
+    try:
+        data, _ = json.JSONDecoder().raw_decode(candidate)
+        if isinstance(data, dict) and "subtasks" not in data:
+            return None
+        graph = TaskGraph.from_dict(data)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return graph if len(graph) else None
+
+
+def parse_plan(text: str, fallback: str = "") -> TaskGraph:
+    """Parse a plan into a TaskGraph.
+
+    Accepts a JSON plan (``{"subtasks": [{"id", "description",
+    "complexity", "depends_on"}]}``) or the planner's text format: numbered
+    subtasks with ``(complexity: x; depends on: 1, 2)`` annotations and/or
+    a ``Dependencies:`` section ("2 depends on 1", "3: 1, 2", "1 -> 2").
+    When a dependency section exists but cannot be read, subtasks are
+    chained in order, which is always safe. A plan without subtasks becomes
+    a single task described by ``fallback``.
+    """
+    graph = _json_plan(text)
+    if graph is not None:
+        return graph
+
+    section = None
+    entries: list[tuple[int, str]] = []
+    dependency_lines: list[str] = []
+    for line in text.splitlines():
+        heading = _SECTION.match(line)
+        if heading:
+            section = heading.group(1).lower()
+            rest = line[heading.end() :].lstrip("*: ").strip()
+            if section == "dependencies" and rest:
+                dependency_lines.append(rest)
+            continue
+        if section in ("subtask", "subtasks"):
+            match = _SUBTASK_LINE.match(line)
+            if match:
+                entries.append((int(match.group(1)), match.group(2).strip()))
+            elif entries and line.strip() and line.startswith((" ", "\t")):
+                number, description = entries[-1]
+                entries[-1] = (number, f"{description} {line.strip()}")
+        elif section == "dependencies" and line.strip():
+            dependency_lines.append(line.strip())
+
+    if not entries:
+        return TaskGraph([Subtask(1, fallback or text.strip())])
+
+    edges: dict[int, set[int]] = {number: set() for number, _ in entries}
+    tasks = []
+    for number, description in entries:
+        complexity = _COMPLEXITY.search(description)
+        for annotation in _ANNOTATION.finditer(description):
+            inner = annotation.group(0).strip()[1:-1]
+            for found in _INLINE_DEPENDS.finditer(inner):
+                edges[number].update(_ids(found.group(1)))
+        cleaned = _ANNOTATION.sub("", description).replace("**", "").replace("__", "")
+        tasks.append(
+            (number, cleaned.strip(), complexity.group(1).lower() if complexity else "medium")
+        )
+
+    parsed = any(edges.values())
+    for line in dependency_lines:
+        for match in _DEPENDS_SENTENCE.finditer(line):
+            edges.setdefault(int(match.group(1)), set()).update(_ids(match.group(2)))
+            parsed = True
+        colon = _DEPENDS_COLON.match(line)
+        if colon:
+            edges.setdefault(int(colon.group(1)), set()).update(_ids(colon.group(2)))
+            parsed = True
+        for chain in _ARROW_CHAIN.findall(line):
+            ids = _ids(chain)
+            for before, after in zip(ids, ids[1:]):
+                edges.setdefault(after, set()).add(before)
+            parsed = True
+        if _NO_DEPENDENCIES.search(line):
+            parsed = True
+
+    if dependency_lines and not parsed:
+        logger.debug("Could not read plan dependencies; running subtasks in order")
+        ordered = [number for number, _, _ in tasks]
+        for before, after in zip(ordered, ordered[1:]):
+            edges[after].add(before)
+
+    return TaskGraph(
+        [
+            Subtask(number, description, complexity, tuple(sorted(edges.get(number, ()))))
+            for number, description, complexity in tasks
+        ]
+    )
+
+
+class TaskOutcome(NamedTuple):
+    """How one subtask ended."""
+
+    task: Subtask
+    status: str
+    result: Any = None
+    error: str | None = None
+    duration: float = 0.0
+
+
+TaskRunner = Callable[[Subtask, dict[int, TaskOutcome]], Awaitable[Any]]
+
+
+class TaskScheduler:
+    """Runs a TaskGraph with bounded concurrency.
+
+    A task starts once all its dependencies succeeded. Among ready tasks,
+    the one heading the heaviest remaining chain starts first, so the
+    critical path is never starved by side branches. When a task fails
+    (raises, or returns a dict with ``success`` false) every task depending
+    on it, directly or not, is marked ``cancelled`` without running, while
+    independent branches carry on.
+    """
+
+    def __init__(self, max_workers: int | None = None) -> None:
+        """Initialize task scheduler."""
+        self.max_workers = max_workers or settings.plan_max_workers
+
+    async def run(self, graph: TaskGraph, runner: TaskRunner) -> dict[int, TaskOutcome]:
+        """Execute every task; ``runner`` receives the task and finished outcomes so far."""
+        priority = graph.critical_path()
+        waiting = {task_id: len(task.depends_on) for task_id, task in graph.tasks.items()}
+        ready = [(-priority[task_id], task_id) for task_id, count in waiting.items() if not count]
+        heapq.heapify(ready)
+        outcomes: dict[int, TaskOutcome] = {}
+        running: dict[asyncio.Task, tuple[int, float]] = {}
+
+        try:
+            while ready or running:
+                while ready and len(running) < self.max_workers:
+                    _, task_id = heapq.heappop(ready)
+                    job = asyncio.ensure_future(runner(graph.tasks[task_id], dict(outcomes)))
+                    running[job] = (task_id, time.perf_counter())
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for job in done:
+                    task_id, started = running.pop(job)
+                    outcome = self._outcome(graph.tasks[task_id], job, started)
+                    outcomes[task_id] = outcome
+
+                    if outcome.status == "succeeded":
+                        for child in graph.dependents[task_id]:
+                            waiting[child] -= 1
+                            if not waiting[child] and child not in outcomes:
+                                heapq.heappush(ready, (-priority[child], child))
+                        continue
+
+                    for child in graph.descendants(task_id):
+                        if child not in outcomes:
+                            outcomes[child] = TaskOutcome(
+                                graph.tasks[child],
+                                "cancelled",
+                                error=f"Upstream task {task_id} failed",
+                            )
+                    ready = [item for item in ready if item[1] not in outcomes]
+                    heapq.heapify(ready)
+        finally:
+            for job in running:
+                job.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return {task_id: outcomes[task_id] for task_id in sorted(outcomes)}
+
+    @staticmethod
+    def _outcome(task: Subtask, job: asyncio.Task, started: float) -> TaskOutcome:
+        duration = time.perf_counter() - started
+        if job.cancelled():
+            return TaskOutcome(task, "failed", error="Task was cancelled", duration=duration)
+        error = job.exception()
+        if error is not None:
+            message = str(error) or type(error).__name__
+            return TaskOutcome(task, "failed", error=message, duration=duration)
+
+        result = job.result()
+        if isinstance(result, dict) and result.get("success") is False:
+            return TaskOutcome(task, "failed", result, result.get("error"), duration)
+        return TaskOutcome(task, "succeeded", result, duration=duration)
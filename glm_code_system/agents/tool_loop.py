@@ -0,0 +1,201 @@
+"""Function-calling loop: model turns interleaved with parallel tool execution."""
+
+import json
+import logging
+from typing import Any, AsyncGenerator, NamedTuple
+
+from config.settings import settings
+from glm_code_system.agents.context import ContextWindow
+from glm_code_system.tools.registry import ToolCall, ToolRegistry, ToolResult
+
+logger = logging.getLogger(__name__)
+
+
+class AgentEvent(NamedTuple):
+    """One step of a tool loop, as streamed to the caller.
+
+    ``kind`` is "text" (a content chunk), "tool_call_delta" (a fragment of
+    a call's arguments), "tool_call" (a complete call), "tool_result" or
+    "done" (whose data is the LoopResult).
+    """
+
+    kind: str
+    data: Any
+
+
+class ToolCallRecord(NamedTuple):
+    """A tool call the model made and how it went."""
+
+    id: str
+    name: str
+    arguments: dict[str, Any]
+    result: ToolResult
+
+
+class LoopResult(NamedTuple):
+    """Final answer of a tool loop."""
+
+    content: str
+    finished: bool
+    iterations: int
+    tool_calls: list[ToolCallRecord]
+
+
+class ToolCallBuffer:
+    """Reassembles tool calls from streamed fragments, keyed by their index."""
+
+    def __init__(self) -> None:
+        """Initialize buffer."""
+        self._calls: dict[int, dict[str, Any]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._calls)
+
+    def feed(self, fragments: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Add fragments; returns ``{"index", "name", "arguments"}`` deltas for display."""
+        deltas = []
+        for fragment in fragments:
+            index = fragment.get("index", len(self._calls))
+            call = self._calls.setdefault(index, {"id": None, "name": "", "arguments": []})
+            function = fragment.get("function") or {}
+            if fragment.get("id"):
+                call["id"] = fragment["id"]
+            if function.get("name"):
+                call["name"] += function["name"]
+            if function.get("arguments"):
+                call["arguments"].append(function["arguments"])
+            deltas.append(
+                {"index": index, "name": call["name"], "arguments": function.get("arguments", "")}
+            )
+        return deltas
+
+    def calls(self, prefix: str) -> list[tuple[str, str, str]]:
+        """``(id, name, arguments_json)`` per call, in index order."""
+        return [
+            (call["id"] or f"{prefix}_{index}", call["name"], "".join(call["arguments"]))
+            for index, call in sorted(self._calls.items())
+        ]
+
+
+def compact_result(result: ToolResult, limit: int | None = None) -> str:
+    """Tool result as message content, keeping the head and tail of long output."""
+    limit = limit or settings.tool_result_max_chars
+    text = result.output if result.success else f"Error: {result.error}\n{result.output}".rstrip()
+    if len(text) <= limit:
+        return text
+
+    # The tail of command output (summaries, tracebacks) matters as much as the head.
+    head = limit * 2 // 3
+    tail = limit - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n... [{omitted} characters omitted] ...\n{text[-tail:]}"
+
+
+def _parse_arguments(
+    name: str, arguments: str, allowed: set[str] | None = None
+) -> dict[str, Any] | ToolResult:
+    """Decoded call arguments, or a failed result explaining why they are unusable.
+
+    ``allowed`` are the parameters the tool's schema offers; others are refused.
+    """
+    try:
+        parsed = json.loads(arguments) if arguments.strip() else {}
+    except json.JSONDecodeError as e:
+        error = f"Invalid JSON arguments for {name}: {e}"
+    else:
+        if not isinstance(parsed, dict):
+            error = f"Arguments for {name} must be a JSON object"
+        elif allowed is not None and set(parsed) - allowed:
+            error = f"Unexpected arguments for {name}: {', '.join(sorted(set(parsed) - allowed))}"
+        else:
+            return parsed
+    return ToolResult(success=False, output="", error=error)
+
+
+async def run_tool_loop(
+    model: Any,
+    tools: ToolRegistry,
+    messages: list[dict[str, Any]],
+    max_iterations: int | None = None,
+    temperature: float = 0.7,
+    context: ContextWindow | None = None,
+) -> AsyncGenerator[AgentEvent, None]:
+    """Let the model call tools until it answers without any.
+
+    Each model turn is streamed; all tool calls of a turn are then run
+    together through ``ToolRegistry.execute_many``, and their compacted
+    results are sent back in the next turn. ``messages`` is extended in
+    place, and before each turn ``context`` shrinks the tool rounds added
+    so far to fit its budget. The loop stops after ``max_iterations``
+    model turns.
+    """
+    max_iterations = max_iterations or settings.max_iterations
+    context = context or ContextWindow(model)
+    start = len(messages)
+    schemas = tools.get_tool_schemas()
+    parameters = {
+        schema["function"]["name"]: set(schema["function"]["parameters"]["properties"])
+        for schema in schemas
+    }
+    records: list[ToolCallRecord] = []
+    content = ""
+
+    for iteration in range(1, max_iterations + 1):
+        context.fit_tool_rounds(messages, start)
+        chunks: list[str] = []
+        buffer = ToolCallBuffer()
+        async for delta in model.generate_stream_deltas(
+            messages, temperature=temperature, tools=schemas
+        ):
+            if delta.content:
+                chunks.append(delta.content)
+                yield AgentEvent("text", delta.content)
+            if delta.tool_calls:
+                for fragment in buffer.feed(delta.tool_calls):
+                    yield AgentEvent("tool_call_delta", fragment)
+
+        content = "".join(chunks)
+        if not buffer:
+            messages.append({"role": "assistant", "content": content})
+            yield AgentEvent("done", LoopResult(content, True, iteration, records))
+            return
+
+        calls = buffer.calls(prefix=f"call_{iteration}")
+        messages.append(
+            {
+                "role": "assistant",
+                "content": content or None,
+                "tool_calls": [
+                    {
+                        "id": call_id,
+                        "type": "function",
+                        "function": {"name": name, "arguments": args},
+                    }
+                    for call_id, name, args in calls
+                ],
+            }
+        )
+
+        parsed = [_parse_arguments(name, args, parameters.get(name)) for _, name, args in calls]
+        runnable = [
+            ToolCall(name, arguments)
+            for (_, name, _), arguments in zip(calls, parsed)
+            if isinstance(arguments, dict)
+        ]
+        for call in runnable:
+            yield AgentEvent("tool_call", call)
+        results = iter(await tools.execute_many(runnable))
+
+        for (call_id, name, _), arguments in zip(calls, parsed):
+            if isinstance(arguments, dict):
+                result = next(results)
+            else:
+                result, arguments = arguments, {}
+            records.append(ToolCallRecord(call_id, name, arguments, result))
+            yield AgentEvent("tool_result", records[-1])
+            messages.append(
+                {"role": "tool", "tool_call_id": call_id, "content": compact_result(result)}
+            )
+
+    logger.warning("Tool loop stopped after %d iterations", max_iterations)
+    yield AgentEvent("done", LoopResult(content, False, max_iterations, records))
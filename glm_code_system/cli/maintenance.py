@@ -0,0 +1,97 @@
+"""Offline knowledge base maintenance command.
+
+Run with ``python -m glm_code_system.cli.maintenance`` or ``glm-code-maintenance``.
+"""
+
+import argparse
+import asyncio
+from typing import Any
+
+from rich.console import Console
+from rich.table import Table
+
+from config.settings import settings
+from glm_code_system.learning.embeddings import HashingEmbedder
+from glm_code_system.learning.knowledge_base import KnowledgeBase
+from glm_code_system.learning.maintenance import KnowledgeMaintenance, RetentionPolicy
+
+console = Console()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line options; retention defaults come from settings."""
+    policy = RetentionPolicy.from_settings()
+    parser = argparse.ArgumentParser(
+        prog="glm-code-maintenance",
+        description="Apply knowledge base retention and compact the database.",
+    )
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--dry-run", action="store_true", help="report without deleting")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip VACUUM")
+    parser.add_argument("--no-analyze", action="store_true", help="skip ANALYZE")
+    parser.add_argument("--max-rows-per-type", type=int, default=policy.max_rows_per_type)
+    parser.add_argument("--min-success-rate", type=float, default=policy.min_success_rate)
+    parser.add_argument("--min-uses", type=int, default=policy.min_uses)
+    parser.add_argument("--max-age-days", type=float, default=policy.max_age_days)
+    return parser.parse_args(argv)
+
+
+def format_bytes(size: int) -> str:
+    """Human readable byte count."""
+    value = float(size)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024 or unit == "GiB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
+
+
+def display_report(report: dict[str, Any]) -> None:
+    """Print the rows removed per rule and the space reclaimed."""
+    title = "Knowledge Base Maintenance" + (" (dry run)" if report["dry_run"] else "")
+    table = Table(title=title)
+    table.add_column("Table", style="cyan")
+    table.add_column("Rule")
+    table.add_column("Rows removed", justify="right")
+
+    for name, reasons in report["deleted"].items():
+        for reason, count in reasons.items():
+            table.add_row(name, reason, str(count))
+
+    console.print(table)
+    console.print(
+        f"Size: {format_bytes(report['bytes_before'])} -> {format_bytes(report['bytes_after'])} "
+        f"([green]{format_bytes(report['bytes_reclaimed'])} reclaimed[/green]) "
+        f"in {report['duration']:.2f}s"
+    )
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Run maintenance against the configured database."""
+    # Indexes are not loaded, so the embedder is never used.
+    kb = KnowledgeBase(args.database_url, embedder=HashingEmbedder())
+    await kb.initialize(load_indexes=False)
+
+    policy = RetentionPolicy(
+        max_rows_per_type=args.max_rows_per_type,
+        min_success_rate=args.min_success_rate,
+        min_uses=args.min_uses,
+        max_age_days=args.max_age_days,
+    )
+    try:
+        return await KnowledgeMaintenance(kb, policy).run(
+            dry_run=args.dry_run,
+            vacuum=not args.no_vacuum,
+            analyze=not args.no_analyze,
+        )
+    finally:
+        await kb.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Entry point for ``glm-code-maintenance``."""
+    display_report(asyncio.run(run(parse_args(argv))))
+
+
+if __name__ == "__main__":
+    main()
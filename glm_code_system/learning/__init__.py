@@ -1,3 +1,15 @@
+from .embeddings import HashingEmbedder, get_embedder
 from .knowledge_base import KnowledgeBase
+from .maintenance import KnowledgeMaintenance, RetentionPolicy
+from .plan_cache import PlanCache
+from .vector_index import VectorIndex
 
-__all__ = ["KnowledgeBase"]
+__all__ = [
+    "KnowledgeBase",
+    "KnowledgeMaintenance",
+    "RetentionPolicy",
+    "PlanCache",
+    "VectorIndex",
+    "HashingEmbedder",
+    "get_embedder",
+]
@@ -0,0 +1,133 @@
+"""Exact and near-duplicate detection for learned code patterns."""
+
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+from config.settings import settings
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+SHINGLE_SIZE = 3
+
+
+def normalize_code(code: str) -> str:
+    """Collapse whitespace so formatting-only changes hash identically."""
+    lines = (" ".join(line.split()) for line in code.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def content_hash(code: str) -> str:
+    """SHA-256 of the normalized code."""
+    return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+
+class DuplicateIndex:
+    """Finds existing patterns identical or nearly identical to new code.
+
+    Exact duplicates are found by normalized content hash. Near duplicates
+    use MinHash signatures over token shingles, bucketed with LSH banding so
+    a lookup only compares against candidates sharing at least one band,
+    then confirmed by estimated Jaccard similarity. Matches are restricted
+    to the same pattern type.
+    """
+
+    def __init__(
+        self,
+        threshold: float | None = None,
+        num_perm: int | None = None,
+        bands: int | None = None,
+    ) -> None:
+        """Initialize duplicate index."""
+        self.threshold = settings.kb_near_duplicate_threshold if threshold is None else threshold
+        self.num_perm = num_perm or settings.kb_minhash_permutations
+        self.bands = bands or settings.kb_lsh_bands
+        self.rows_per_band = self.num_perm // self.bands
+
+        rng = np.random.default_rng(seed=1)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=self.num_perm, dtype=np.uint64)
+
+        self._by_hash: dict[tuple[str, str], int] = {}
+        self._signatures: dict[int, tuple[str, str, np.ndarray]] = {}
+        self._buckets: dict[tuple[int, bytes], set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, code: str) -> np.ndarray:
+        """MinHash signature of the code's token shingles."""
+        tokens = _TOKEN_RE.findall(normalize_code(code))
+        if len(tokens) < SHINGLE_SIZE:
+            shingles = {" ".join(tokens)}
+        else:
+            starts = range(len(tokens) - SHINGLE_SIZE + 1)
+            shingles = {" ".join(tokens[i : i + SHINGLE_SIZE]) for i in starts}
+
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def decode_signature(self, blob: bytes | None) -> np.ndarray | None:
+        """Decode a stored signature, ignoring ones with a different size."""
+        if blob is None or len(blob) != self.num_perm * 8:
+            return None
+        return np.frombuffer(blob, dtype=np.uint64)
+
+    def _band_keys(self, signature: np.ndarray) -> list[tuple[int, bytes]]:
+        """LSH bucket keys for a signature."""
+        blob = signature.tobytes()
+        width = self.rows_per_band * signature.itemsize
+        return [(band, blob[band * width : (band + 1) * width]) for band in range(self.bands)]
+
+    def find(self, pattern_type: str, digest: str, signature: np.ndarray) -> int | None:
+        """Return the id of an existing duplicate, or None."""
+        exact = self._by_hash.get((pattern_type, digest))
+        if exact is not None:
+            return exact
+
+        best_id, best_score = None, self.threshold
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        for candidate in candidates:
+            candidate_type, _, candidate_signature = self._signatures[candidate]
+            if candidate_type != pattern_type:
+                continue
+            score = float(np.mean(candidate_signature == signature))
+            if score >= best_score:
+                best_id, best_score = candidate, score
+
+        return best_id
+
+    def add(self, pattern_id: int, pattern_type: str, digest: str, signature: np.ndarray) -> None:
+        """Register a canonical pattern."""
+        self._by_hash.setdefault((pattern_type, digest), pattern_id)
+        self._signatures[pattern_id] = (pattern_type, digest, signature)
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(pattern_id)
+
+    def remove(self, pattern_id: int) -> None:
+        """Forget a pattern."""
+        entry = self._signatures.pop(pattern_id, None)
+        if entry is None:
+            return
+
+        pattern_type, digest, signature = entry
+        if self._by_hash.get((pattern_type, digest)) == pattern_id:
+            del self._by_hash[(pattern_type, digest)]
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(pattern_id)
+                if not bucket:
+                    del self._buckets[key]
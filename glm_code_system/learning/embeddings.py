@@ -0,0 +1,114 @@
+"""Text embedders for semantic knowledge retrieval."""
+
+import hashlib
+import logging
+import re
+from typing import Protocol
+
+import numpy as np
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[A-Za-z]+|\d+|[^\x00-\x7f]")
+_CAMEL_RE = re.compile(r"(?<=[a-z])(?=[A-Z])")
+
+_default_embedder: "Embedder | None" = None
+
+
+class Embedder(Protocol):
+    """Turns texts into L2-normalized float32 vectors."""
+
+    dimension: int
+    # Backend and model, stored with each vector so vectors from different
+    # embedders (even of equal dimension) are never compared.
+    identity: str
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed texts into a ``(len(texts), dimension)`` matrix."""
+        ...
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, leaving zero rows untouched."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder.
+
+    Needs no model download, so it is used offline and in tests. Words
+    (with camelCase/snake_case identifiers split, and CJK characters taken
+    individually) and word bigrams are hashed into signed buckets.
+    """
+
+    def __init__(self, dimension: int | None = None) -> None:
+        """Initialize hashing embedder."""
+        self.dimension = dimension or settings.embedding_dimension
+        self.identity = f"hashing/{self.dimension}"
+
+    def _features(self, text: str) -> list[str]:
+        """Extract hashed features from text."""
+        words = [word.lower() for word in _WORD_RE.findall(_CAMEL_RE.sub(" ", text))]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed texts."""
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dimension] += sign
+
+        return normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """Embedder backed by ``sentence-transformers``."""
+
+    def __init__(self, model_name: str | None = None) -> None:
+        """Load the sentence-transformers model."""
+        from sentence_transformers import SentenceTransformer
+
+        model_name = model_name or settings.embedding_model
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.identity = f"sentence-transformers/{model_name}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed texts."""
+        vectors = self.model.encode(
+            texts,
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return vectors.astype(np.float32, copy=False)
+
+
+def get_embedder() -> Embedder:
+    """Get the configured embedder, falling back to hashing when unavailable."""
+    global _default_embedder
+
+    if _default_embedder is None:
+        if settings.embedding_backend == "sentence-transformers":
+            try:
+                _default_embedder = SentenceTransformerEmbedder()
+            except Exception:
+                logger.warning(
+                    "Could not load sentence-transformers model %s; using hashing embeddings",
+                    settings.embedding_model,
+                    exc_info=True,
+                )
+                _default_embedder = HashingEmbedder()
+        else:
+            _default_embedder = HashingEmbedder()
+
+    return _default_embedder
@@ -0,0 +1,67 @@
+"""Database engine construction with SQLite tuning for the knowledge base."""
+
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from config.settings import settings
+
+
+def sqlite_pragmas(read_only: bool = False) -> list[str]:
+    """PRAGMA statements applied to every new SQLite connection."""
+    pragmas = [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}",
+        f"PRAGMA cache_size={int(settings.sqlite_cache_size)}",
+        f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def is_sqlite_memory(db_url: str) -> bool:
+    """Check if a URL points at a private in-memory SQLite database."""
+    url = make_url(db_url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def create_kb_engine(db_url: str, read_only: bool = False, **kwargs: Any) -> AsyncEngine:
+    """Create an async engine, applying the SQLite tuning profile on connect.
+
+    WAL journaling lets the read-only pool query while the writer commits.
+    """
+    engine = create_async_engine(db_url, echo=False, **kwargs)
+
+    if engine.dialect.name == "sqlite":
+        pragmas = sqlite_pragmas(read_only)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _apply_pragmas(dbapi_connection: Any, _: Any) -> None:
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return engine
+
+
+def create_read_engine(db_url: str, write_engine: AsyncEngine) -> AsyncEngine:
+    """Create a separate read-only SQLite pool.
+
+    Other databases already pool concurrent connections, and a private
+    in-memory SQLite database cannot be shared, so both reuse the writer.
+    """
+    if write_engine.dialect.name != "sqlite" or is_sqlite_memory(db_url):
+        return write_engine
+
+    return create_kb_engine(
+        db_url,
+        read_only=True,
+        pool_size=settings.kb_read_pool_size,
+        max_overflow=settings.kb_read_pool_size,
+    )
@@ -0,0 +1,131 @@
+"""SQLite FTS5 full-text indexes over patterns and solutions."""
+
+import re
+from typing import NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class FTSTable(NamedTuple):
+    """An external-content FTS5 table mirroring text columns of a base table."""
+
+    name: str
+    source: str
+    columns: tuple[str, ...]
+    weights: tuple[float, ...]
+
+
+FTS_TABLES: dict[str, FTSTable] = {
+    "pattern": FTSTable(
+        "code_patterns_fts", "code_patterns", ("code", "description", "context"), (1.0, 2.0, 1.0)
+    ),
+    "solution": FTSTable(
+        "solutions_fts", "solutions", ("solution", "description"), (1.0, 2.0)
+    ),
+}
+
+
+def _triggers(table: FTSTable) -> dict[str, str]:
+    """Triggers keeping an FTS table in sync with its source, by name."""
+    columns = ", ".join(table.columns)
+    new_values = ", ".join(f"new.{c}" for c in table.columns)
+    old_values = ", ".join(f"old.{c}" for c in table.columns)
+    delete_old = (
+        f"INSERT INTO {table.name}({table.name}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {table.name}(rowid, {columns}) VALUES (new.id, {new_values});"
+
+    return {
+        f"{table.source}_fts_ai": f"CREATE TRIGGER IF NOT EXISTS {table.source}_fts_ai "
+        f"AFTER INSERT ON {table.source} BEGIN {insert_new} END",
+        f"{table.source}_fts_ad": f"CREATE TRIGGER IF NOT EXISTS {table.source}_fts_ad "
+        f"AFTER DELETE ON {table.source} BEGIN {delete_old} END",
+        f"{table.source}_fts_au": f"CREATE TRIGGER IF NOT EXISTS {table.source}_fts_au "
+        f"AFTER UPDATE OF {columns} ON {table.source} BEGIN {delete_old} {insert_new} END",
+    }
+
+
+async def _exists(conn: AsyncConnection, kind: str, name: str) -> bool:
+    result = await conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = :kind AND name = :name"),
+        {"kind": kind, "name": name},
+    )
+    return result.first() is not None
+
+
+async def _rebuild(conn: AsyncConnection, table: FTSTable) -> None:
+    await conn.execute(text(f"INSERT INTO {table.name}({table.name}) VALUES ('rebuild')"))
+
+
+async def ensure_fts(conn: AsyncConnection) -> bool:
+    """Create missing FTS tables and triggers, backfilling from existing rows.
+
+    Missing triggers (e.g. after an interrupted bulk import) are recreated
+    and the table rebuilt. Returns False when the SQLite build lacks FTS5.
+    """
+    for table in FTS_TABLES.values():
+        if not await _exists(conn, "table", table.name):
+            try:
+                await conn.execute(
+                    text(
+                        f"CREATE VIRTUAL TABLE {table.name} USING fts5("
+                        f"{', '.join(table.columns)}, content='{table.source}', "
+                        f"content_rowid='id', tokenize='porter unicode61')"
+                    )
+                )
+            except OperationalError:
+                return False
+        elif all([await _exists(conn, "trigger", name) for name in _triggers(table)]):
+            continue
+
+        for statement in _triggers(table).values():
+            await conn.execute(text(statement))
+        await _rebuild(conn, table)
+
+    return True
+
+
+async def suspend_fts(conn: AsyncConnection, kinds: tuple[str, ...]) -> None:
+    """Drop sync triggers ahead of a bulk load; pair with :func:`resume_fts`."""
+    for kind in kinds:
+        for name in _triggers(FTS_TABLES[kind]):
+            await conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+
+
+async def resume_fts(conn: AsyncConnection, kinds: tuple[str, ...]) -> None:
+    """Recreate sync triggers and rebuild the FTS tables in one pass."""
+    for kind in kinds:
+        table = FTS_TABLES[kind]
+        for statement in _triggers(table).values():
+            await conn.execute(text(statement))
+        await _rebuild(conn, table)
+
+
+def build_match_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching any of its terms.
+
+    Terms are quoted so user input can never be parsed as FTS5 syntax; BM25
+    ranks rows matching more (and rarer) terms first.
+    """
+    terms = dict.fromkeys(term.lower() for term in _TERM_RE.findall(query))
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def search_sql(kind: str) -> str:
+    """BM25-ranked search with snippet extraction for one FTS table."""
+    table = FTS_TABLES[kind]
+    weights = ", ".join(str(w) for w in table.weights)
+    label = "pattern_type" if kind == "pattern" else "problem_type"
+
+    return (
+        f"SELECT s.id, s.{label} AS type, s.description, "
+        f"bm25({table.name}, {weights}) AS rank, "
+        f"snippet({table.name}, -1, '[', ']', '...', :snippet_tokens) AS snippet "
+        f"FROM {table.name} JOIN {table.source} s ON s.id = {table.name}.rowid "
+        f"WHERE {table.name} MATCH :query ORDER BY rank LIMIT :limit"
+    )
@@ -1,12 +1,37 @@
 """Knowledge base for storing and retrieving learned patterns."""
 
+import asyncio
+import time
 from typing import Any
 
-from sqlalchemy import Column, Integer, String, Float, Text, JSON
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import numpy as np
+from sqlalchemy import (
+    Column,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Float,
+    Text,
+    JSON,
+    bindparam,
+    func,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from config.settings import settings
+from glm_code_system.learning.dedup import DuplicateIndex, content_hash
+from glm_code_system.learning.embeddings import Embedder, get_embedder
+from glm_code_system.learning.engine import create_kb_engine, create_read_engine
+from glm_code_system.learning.maintenance import KnowledgeMaintenance
+from glm_code_system.learning.pattern_cache import PatternCache, PatternSummary
+from glm_code_system.learning.fts import FTS_TABLES, build_match_query, ensure_fts, search_sql
+from glm_code_system.learning.vector_index import VectorIndex
+from glm_code_system.learning.write_behind import WriteBehindQueue
 
 Base = declarative_base()
 
@@ -15,6 +40,12 @@ class CodePattern(Base):
     """Stored code patterns learned from successful executions."""
 
     __tablename__ = "code_patterns"
+    __table_args__ = (
+        Index("ix_code_patterns_rank", "success_rate", "usage_count"),
+        Index("ix_code_patterns_type_rank", "pattern_type", "success_rate", "usage_count"),
+        Index("ix_code_patterns_decayed", "decayed_score"),
+        Index("ix_code_patterns_content_hash", "content_hash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     pattern_type = Column(String(100), nullable=False, index=True)
@@ -22,14 +53,28 @@ class CodePattern(Base):
     description = Column(Text)
     usage_count = Column(Integer, default=0)
     success_rate = Column(Float, default=1.0)
-    metadata = Column(JSON, default={})
+    metadata_ = Column("metadata", JSON, default=dict)
     context = Column(Text)  # Context where this pattern is useful
+    embedding = Column(LargeBinary)  # float32 vector from the configured embedder
+    decayed_score = Column(Float, default=0.0)  # see decay_weight()
+    last_used_at = Column(Float)
+    created_at = Column(Float, default=time.time)
+    content_hash = Column(String(64))  # SHA-256 of whitespace-normalized code
+    minhash = Column(LargeBinary)  # MinHash signature for near-duplicate detection
+    duplicate_count = Column(Integer, default=0)  # Duplicates folded into this pattern
+    embedder = Column(String(200))  # Identity of the embedder that produced ``embedding``
 
 
 class Solution(Base):
     """Stored solutions to common problems."""
 
     __tablename__ = "solutions"
+    __table_args__ = (
+        Index("ix_solutions_rank", "effectiveness_score", "usage_count"),
+        Index("ix_solutions_type_rank", "problem_type", "effectiveness_score", "usage_count"),
+        Index("ix_solutions_decayed", "decayed_score"),
+        Index("ix_solutions_content_hash", "content_hash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     problem_type = Column(String(100), nullable=False, index=True)
@@ -37,38 +82,304 @@ class Solution(Base):
     description = Column(Text)
     effectiveness_score = Column(Float, default=1.0)
     usage_count = Column(Integer, default=0)
-    metadata = Column(JSON, default={})
+    metadata_ = Column("metadata", JSON, default=dict)
+    embedding = Column(LargeBinary)
+    decayed_score = Column(Float, default=0.0)
+    last_used_at = Column(Float)
+    created_at = Column(Float, default=time.time)
+    content_hash = Column(String(64))
+    embedder = Column(String(200))
 
 
 class UserPreference(Base):
     """User preferences learned from interactions."""
 
     __tablename__ = "user_preferences"
+    __table_args__ = (
+        Index("ix_user_preferences_type_confidence", "preference_type", "confidence"),
+        Index("ix_user_preferences_type_value", "preference_type", "value"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     preference_type = Column(String(100), nullable=False, index=True)
     value = Column(String(500), nullable=False)
     confidence = Column(Float, default=0.5)
-    metadata = Column(JSON, default={})
+    metadata_ = Column("metadata", JSON, default=dict)
+
+
+# Columns added after the initial schema, applied to existing databases.
+MIGRATION_COLUMNS: dict[str, dict[str, str]] = {
+    "code_patterns": {
+        "embedding": "BLOB",
+        "decayed_score": "FLOAT DEFAULT 0",
+        "last_used_at": "FLOAT",
+        "created_at": "FLOAT",
+        "content_hash": "VARCHAR(64)",
+        "minhash": "BLOB",
+        "duplicate_count": "INTEGER DEFAULT 0",
+        "embedder": "VARCHAR(200)",
+    },
+    "solutions": {
+        "embedding": "BLOB",
+        "decayed_score": "FLOAT DEFAULT 0",
+        "last_used_at": "FLOAT",
+        "created_at": "FLOAT",
+        "content_hash": "VARCHAR(64)",
+        "embedder": "VARCHAR(200)",
+    },
+}
+
+# Reference time for decayed scores (2024-01-01 UTC).
+DECAY_EPOCH = 1704067200.0
+
+
+def decay_weight(timestamp: float) -> float:
+    """Weight of an outcome recorded at ``timestamp``.
+
+    Weights grow by 2x every half-life, so ``decayed_score`` (the sum of the
+    weights of successful outcomes) ranks rows exactly as if every score
+    were decayed to the present, without rewriting old rows. Divide by
+    ``decay_weight(now)`` to get the current decayed value. Changing the
+    half-life invalidates stored scores.
+    """
+    half_life = settings.kb_decay_half_life_days * 86400.0
+    return 2.0 ** ((timestamp - DECAY_EPOCH) / half_life)
+
+
+def pattern_text(pattern: CodePattern) -> str:
+    """Text embedded for a code pattern."""
+    parts = [pattern.pattern_type, pattern.description, pattern.context, pattern.code[:2000]]
+    return "\n".join(filter(None, parts))
+
+
+def solution_text(solution: Solution) -> str:
+    """Text embedded for a solution."""
+    return "\n".join(
+        filter(None, [solution.problem_type, solution.description, solution.solution[:2000]])
+    )
 
 
 class KnowledgeBase:
     """Knowledge base for storing and retrieving learned information."""
 
-    def __init__(self, db_url: str | None = None) -> None:
-        """Initialize knowledge base."""
-        self.engine = create_async_engine(
-            db_url or settings.database_url,
-            echo=False,
-        )
+    def __init__(
+        self,
+        db_url: str | None = None,
+        embedder: Embedder | None = None,
+    ) -> None:
+        """Initialize knowledge base.
+
+        Writes go through ``engine``; queries use ``read_engine``, a separate
+        read-only pool on SQLite so retrieval is not blocked by learning writes.
+        """
+        db_url = db_url or settings.database_url
+        self.engine = create_kb_engine(db_url)
+        self.read_engine = create_read_engine(db_url, self.engine)
         self.async_session = sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
-
-    async def initialize(self) -> None:
-        """Initialize database tables."""
+        self.read_session = sessionmaker(
+            self.read_engine, class_=AsyncSession, expire_on_commit=False
+        )
+        self.embedder = embedder or get_embedder()
+        self.pattern_index = VectorIndex(self.embedder.dimension)
+        self.solution_index = VectorIndex(self.embedder.dimension)
+        self.pattern_cache = PatternCache()
+        self.duplicates = DuplicateIndex()
+        self.fts_enabled = False
+        self.write_queue = WriteBehindQueue(self._write_batch)
+        self.maintenance = KnowledgeMaintenance(self)
+
+    async def initialize(self, load_indexes: bool = True) -> None:
+        """Initialize database tables and load the vector indexes.
+
+        Offline tools that only touch the database can skip ``load_indexes``.
+        """
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await self._migrate(conn)
+            if self.engine.dialect.name == "sqlite":
+                self.fts_enabled = await ensure_fts(conn)
+
+        if load_indexes:
+            await self._load_indexes()
+            self.maintenance.start()
+
+    async def _migrate(self, conn: Any) -> None:
+        """Add columns and indexes missing from databases created by older versions."""
+        for table, columns in MIGRATION_COLUMNS.items():
+            result = await conn.execute(text(f"PRAGMA table_info({table})"))
+            existing = {row[1] for row in result}
+            for name, ddl in columns.items():
+                if name not in existing:
+                    await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+        def create_indexes(sync_conn: Any) -> None:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(sync_conn, checkfirst=True)
+
+        await conn.run_sync(create_indexes)
+
+    async def _embed(self, texts: list[str]) -> np.ndarray:
+        """Embed texts off the event loop."""
+        return await asyncio.to_thread(self.embedder.embed, texts)
+
+    async def _embed_rows(self, rows: list[Any], to_text: Any) -> np.ndarray:
+        """Embed rows in one batch and attach the encoded vectors to them."""
+        if not rows:
+            return np.zeros((0, self.embedder.dimension), dtype=np.float32)
+
+        vectors = await self._embed([to_text(row) for row in rows])
+        for row, vector in zip(rows, vectors):
+            row.embedding = vector.tobytes()
+            row.embedder = self.embedder.identity
+        return vectors
+
+    def _decode_embedding(self, blob: bytes | None, embedder: str | None) -> np.ndarray | None:
+        """Decode a stored embedding, ignoring ones from a different embedder."""
+        if embedder != self.embedder.identity:
+            return None
+        if blob is None or len(blob) != self.embedder.dimension * 4:
+            return None
+        return np.frombuffer(blob, dtype=np.float32)
+
+    async def _load_indexes(self) -> None:
+        """Load stored embeddings into memory, backfilling rows that lack one."""
+        await self._load_index(
+            CodePattern,
+            self.pattern_index,
+            CodePattern.pattern_type,
+            CodePattern.success_rate,
+            pattern_text,
+        )
+        await self._load_index(
+            Solution,
+            self.solution_index,
+            Solution.problem_type,
+            Solution.effectiveness_score,
+            solution_text,
+        )
+        if settings.kb_dedup_enabled:
+            await self._load_duplicate_index()
+
+    async def reload_indexes(self) -> None:
+        """Rebuild the in-memory indexes and caches from the database."""
+        self.pattern_index = VectorIndex(self.embedder.dimension)
+        self.solution_index = VectorIndex(self.embedder.dimension)
+        self.duplicates = DuplicateIndex()
+        self.pattern_cache.clear()
+        await self._load_indexes()
+
+    async def _load_duplicate_index(self, batch_size: int = 512) -> None:
+        """Load content hashes and MinHash signatures, backfilling missing ones."""
+        columns = select(
+            CodePattern.id, CodePattern.pattern_type, CodePattern.content_hash, CodePattern.minhash
+        ).order_by(CodePattern.id)
+
+        async with self.async_session() as session:
+            rows = (await session.execute(columns)).all()
+            missing = [
+                row.id
+                for row in rows
+                if row.content_hash is None or self.duplicates.decode_signature(row.minhash) is None
+            ]
+
+            for start in range(0, len(missing), batch_size):
+                batch_ids = missing[start : start + batch_size]
+                patterns = (
+                    await session.execute(select(CodePattern).where(CodePattern.id.in_(batch_ids)))
+                ).scalars().all()
+                for pattern in patterns:
+                    self._fingerprint(pattern)
+                await session.commit()
+
+            if missing:
+                rows = (await session.execute(columns)).all()
+
+        # Existing duplicates stay in place; the oldest row becomes canonical.
+        for row in rows:
+            self.duplicates.add(
+                row.id,
+                row.pattern_type,
+                row.content_hash,
+                self.duplicates.decode_signature(row.minhash),
+            )
+
+    def _fingerprint(self, pattern: CodePattern) -> np.ndarray:
+        """Compute and attach the content hash and MinHash signature of a pattern."""
+        signature = self.duplicates.signature(pattern.code)
+        pattern.content_hash = content_hash(pattern.code)
+        pattern.minhash = signature.tobytes()
+        return signature
+
+    def _fold_duplicates(self, patterns: list[CodePattern]) -> dict[int, CodePattern | int]:
+        """Map ``id(row)`` of duplicate patterns to their canonical pattern.
+
+        The canonical pattern is an existing row id, or an earlier row of the
+        same batch.
+        """
+        folded: dict[int, CodePattern | int] = {}
+        batch_hashes: dict[tuple[str, str], CodePattern] = {}
+
+        for pattern in patterns:
+            signature = self._fingerprint(pattern)
+            key = (pattern.pattern_type, pattern.content_hash)
+
+            canonical = self.duplicates.find(pattern.pattern_type, pattern.content_hash, signature)
+            if canonical is not None:
+                folded[id(pattern)] = canonical
+            elif key in batch_hashes:
+                folded[id(pattern)] = batch_hashes[key]
+            else:
+                batch_hashes[key] = pattern
+
+        return folded
+
+    async def _load_index(
+        self,
+        model: Any,
+        index: VectorIndex,
+        label_column: Any,
+        score_column: Any,
+        to_text: Any,
+        batch_size: int = 512,
+    ) -> None:
+        """Load one table's embeddings into ``index``.
+
+        Rows without an embedding, or embedded by a different embedder than
+        the current one, are re-embedded first.
+        """
+        columns = select(
+            model.id, label_column, score_column, model.usage_count, model.embedding, model.embedder
+        )
+
+        async with self.async_session() as session:
+            rows = (await session.execute(columns)).all()
+            missing = [row[0] for row in rows if self._decode_embedding(row[4], row[5]) is None]
+
+            for start in range(0, len(missing), batch_size):
+                batch_ids = missing[start : start + batch_size]
+                items = (
+                    await session.execute(select(model).where(model.id.in_(batch_ids)))
+                ).scalars().all()
+                vectors = await self._embed([to_text(item) for item in items])
+                for item, vector in zip(items, vectors):
+                    item.embedding = vector.tobytes()
+                    item.embedder = self.embedder.identity
+                await session.commit()
+
+            if missing:
+                rows = (await session.execute(columns)).all()
+
+        if rows:
+            index.add(
+                [row[0] for row in rows],
+                np.stack([self._decode_embedding(row[4], row[5]) for row in rows]),
+                labels=[row[1] for row in rows],
+                success_rates=[row[2] for row in rows],
+                usage_counts=[row[3] for row in rows],
+            )
 
     async def add_pattern(
         self,
@@ -78,39 +389,373 @@ class KnowledgeBase:
         context: str | None = None,
         metadata: dict[str, Any] | None = None,
     ) -> CodePattern:
-        """Add a new code pattern to knowledge base."""
+        """Add a new code pattern to knowledge base.
+
+        If the code duplicates an existing pattern, that pattern is returned.
+        """
+        pattern = self._new_pattern(pattern_type, code, description, context, metadata)
+        (pattern_id,) = await self._write_batch([pattern])
+
+        if pattern.id != pattern_id:
+            async with self.async_session() as session:
+                pattern = await session.get(CodePattern, pattern_id)
+        return pattern
+
+    def enqueue_pattern(
+        self,
+        pattern_type: str,
+        code: str,
+        description: str,
+        context: str | None = None,
+        metadata: dict[str, Any] | None = None,
+    ) -> "asyncio.Future[int]":
+        """Queue a pattern for a batched write; the future resolves to its id."""
+        return self.write_queue.submit(
+            self._new_pattern(pattern_type, code, description, context, metadata)
+        )
+
+    def _new_pattern(
+        self,
+        pattern_type: str,
+        code: str,
+        description: str,
+        context: str | None,
+        metadata: dict[str, Any] | None,
+    ) -> CodePattern:
+        """Build an unsaved pattern row."""
+        return CodePattern(
+            pattern_type=pattern_type,
+            code=code,
+            description=description,
+            context=context,
+            metadata_=metadata or {},
+            usage_count=0,
+            success_rate=1.0,
+            duplicate_count=0,
+        )
+
+    async def _write_batch(self, rows: list[Any]) -> list[int]:
+        """Insert rows in one transaction and index their embeddings.
+
+        Patterns duplicating an existing (or earlier batched) pattern are not
+        inserted; the canonical pattern's ``duplicate_count`` is bumped instead
+        and its id is returned for the duplicate. Folding records no outcome,
+        so it leaves ``usage_count`` and ``success_rate`` alone. Preferences
+        are upserted by type and value.
+        """
+        patterns = [row for row in rows if isinstance(row, CodePattern)]
+        if settings.kb_dedup_enabled:
+            folded = self._fold_duplicates(patterns)
+        else:
+            # Still fingerprinted, so the duplicate index stays complete.
+            folded = {}
+            for pattern in patterns:
+                self._fingerprint(pattern)
+        preferences = [row for row in rows if isinstance(row, UserPreference)]
+
+        new_rows = [
+            row for row in rows if id(row) not in folded and not isinstance(row, UserPreference)
+        ]
+        patterns = [row for row in patterns if id(row) not in folded]
+        solutions = [row for row in new_rows if isinstance(row, Solution)]
+
+        merges: dict[int, int] = {}
+        for canonical in folded.values():
+            if isinstance(canonical, int):
+                merges[canonical] = merges.get(canonical, 0) + 1
+            else:
+                canonical.duplicate_count += 1
+
+        pattern_vectors = await self._embed_rows(patterns, pattern_text)
+        solution_vectors = await self._embed_rows(solutions, solution_text)
+
         async with self.async_session() as session:
-            pattern = CodePattern(
-                pattern_type=pattern_type,
-                code=code,
-                description=description,
-                context=context,
-                metadata=metadata or {},
-            )
-            session.add(pattern)
+            session.add_all(new_rows)
+            if preferences:
+                await self._upsert_preferences(session, preferences)
+            if merges:
+                await self._count_duplicates(session, merges)
             await session.commit()
-            await session.refresh(pattern)
-            return pattern
+
+        if patterns:
+            self.pattern_cache.invalidate_queries()
+            self.pattern_index.add(
+                [p.id for p in patterns],
+                pattern_vectors,
+                labels=[p.pattern_type for p in patterns],
+                usage_counts=[p.usage_count for p in patterns],
+            )
+            for pattern in patterns:
+                self.duplicates.add(
+                    pattern.id,
+                    pattern.pattern_type,
+                    pattern.content_hash,
+                    self.duplicates.decode_signature(pattern.minhash),
+                )
+        if solutions:
+            self.solution_index.add(
+                [s.id for s in solutions],
+                solution_vectors,
+                labels=[s.problem_type for s in solutions],
+            )
+
+        return [self._resolve_id(row, folded) for row in rows]
+
+    def _resolve_id(self, row: Any, folded: dict[int, CodePattern | int]) -> int:
+        """Id a written row ended up with, following duplicate folding."""
+        canonical = folded.get(id(row))
+        if canonical is None:
+            return row.id
+        return canonical if isinstance(canonical, int) else canonical.id
+
+    async def _count_duplicates(self, session: AsyncSession, merges: dict[int, int]) -> None:
+        """Add folded duplicates to their canonical patterns' duplicate counts."""
+        table = CodePattern.__table__
+        await session.execute(
+            update(table)
+            .where(table.c.id == bindparam("item_id"))
+            .values(
+                duplicate_count=func.coalesce(table.c.duplicate_count, 0) + bindparam("folds"),
+                last_used_at=time.time(),
+            ),
+            [{"item_id": item_id, "folds": folds} for item_id, folds in merges.items()],
+        )
+
+    async def _upsert_preferences(
+        self, session: AsyncSession, preferences: list[UserPreference]
+    ) -> None:
+        """Upsert preferences keyed by (type, value).
+
+        A type can hold several values; setting a value again updates its
+        confidence and metadata instead of adding a row. Later rows in a
+        batch win. Each row ends up carrying the id of the stored preference.
+        """
+        types = list(dict.fromkeys(pref.preference_type for pref in preferences))
+        columns = (UserPreference.preference_type, UserPreference.value)
+        result = await session.execute(
+            select(*columns, func.max(UserPreference.id))
+            .where(UserPreference.preference_type.in_(types))
+            .group_by(*columns)
+        )
+        existing: dict[tuple[str, str], int] = {
+            (pref_type, value): pref_id for pref_type, value, pref_id in result.all()
+        }
+
+        latest = {(pref.preference_type, pref.value): pref for pref in preferences}
+        for key, pref in latest.items():
+            pref.id = existing.get(key)
+            if pref.id is None:
+                session.add(pref)
+            else:
+                await session.merge(pref)
+        await session.flush()
+
+        for pref in preferences:
+            pref.id = latest[(pref.preference_type, pref.value)].id
+
+    async def export_to(self, path: str, layout: str = "rows") -> dict[str, int]:
+        """Stream the knowledge base to a JSONL file; see ``transfer.export_jsonl``."""
+        from glm_code_system.learning.transfer import export_jsonl
+
+        await self.flush()
+        return await export_jsonl(self, path, layout=layout)
+
+    async def import_from(self, path: str, conflict: str = "skip") -> dict[str, dict[str, int]]:
+        """Bulk load a file written by ``export_to``; see ``transfer.import_jsonl``."""
+        from glm_code_system.learning.transfer import import_jsonl
+
+        await self.flush()
+        return await import_jsonl(self, path, conflict=conflict)
+
+    async def flush(self) -> None:
+        """Wait until all queued writes are committed."""
+        await self.write_queue.flush()
+
+    async def close(self) -> None:
+        """Flush queued writes and release database connections."""
+        await self.maintenance.stop()
+        await self.write_queue.close()
+        if self.read_engine is not self.engine:
+            await self.read_engine.dispose()
+        await self.engine.dispose()
 
     async def search_patterns(
         self,
         pattern_type: str | None = None,
         min_success_rate: float = 0.0,
         limit: int = 10,
+        rank_by: str = "success_rate",
     ) -> list[CodePattern]:
-        """Search for patterns matching criteria."""
-        async with self.async_session() as session:
-            query = session.query(CodePattern)
+        """Search for patterns matching criteria.
 
-            if pattern_type:
-                query = query.filter(CodePattern.pattern_type == pattern_type)
+        ``rank_by="decayed"`` ranks by recency-weighted successes instead.
+        """
+        async with self.read_session() as session:
+            query = select(CodePattern)
 
-            query = query.filter(CodePattern.success_rate >= min_success_rate)
-            query = query.order_by(CodePattern.success_rate.desc(), CodePattern.usage_count.desc())
+            if pattern_type:
+                query = query.where(CodePattern.pattern_type == pattern_type)
+
+            query = query.where(CodePattern.success_rate >= min_success_rate)
+            if rank_by == "decayed":
+                query = query.order_by(CodePattern.decayed_score.desc())
+            else:
+                query = query.order_by(
+                    CodePattern.success_rate.desc(), CodePattern.usage_count.desc()
+                )
             query = query.limit(limit)
 
             result = await session.execute(query)
-            return result.scalars().all()
+            return list(result.scalars().all())
+
+    async def semantic_search_patterns(
+        self,
+        query: str,
+        pattern_type: str | None = None,
+        limit: int = 10,
+    ) -> list[tuple[CodePattern, float]]:
+        """Rank patterns by similarity to ``query`` blended with their success stats."""
+        vector = (await self._embed([query]))[0]
+        hits = self.pattern_index.search(vector, k=limit, label=pattern_type)
+        return await self._fetch_ranked(CodePattern, hits)
+
+    async def semantic_search_pattern_summaries(
+        self,
+        query: str,
+        pattern_type: str | None = None,
+        limit: int = 10,
+    ) -> list[tuple[PatternSummary, float]]:
+        """Like ``semantic_search_patterns`` but returns cached summaries without code."""
+        vector = (await self._embed([query]))[0]
+        hits = self.pattern_index.search(vector, k=limit, label=pattern_type)
+        summaries = {s.id: s for s in await self.get_pattern_summaries([i for i, _ in hits])}
+        return [(summaries[i], score) for i, score in hits if i in summaries]
+
+    async def top_patterns(
+        self,
+        pattern_type: str | None = None,
+        min_success_rate: float = 0.0,
+        limit: int = 10,
+    ) -> list[PatternSummary]:
+        """Top patterns by success rate, served from the pattern cache when possible."""
+        key = (pattern_type, min_success_rate, limit)
+        ids = self.pattern_cache.get_query(key)
+
+        if ids is None:
+            generation = self.pattern_cache.generation
+            query = select(CodePattern.id).where(CodePattern.success_rate >= min_success_rate)
+            if pattern_type:
+                query = query.where(CodePattern.pattern_type == pattern_type)
+            query = query.order_by(
+                CodePattern.success_rate.desc(), CodePattern.usage_count.desc()
+            ).limit(limit)
+
+            async with self.read_session() as session:
+                ids = list((await session.execute(query)).scalars().all())
+            self.pattern_cache.put_query(key, ids, generation)
+
+        return await self.get_pattern_summaries(ids)
+
+    async def get_pattern_summaries(self, ids: list[int]) -> list[PatternSummary]:
+        """Get summaries by id, loading only the light columns of uncached rows."""
+        found, missing = self.pattern_cache.get_many(ids)
+
+        if missing:
+            async with self.read_session() as session:
+                rows = (
+                    await session.execute(
+                        select(
+                            CodePattern.id,
+                            CodePattern.pattern_type,
+                            CodePattern.description,
+                            CodePattern.context,
+                            CodePattern.success_rate,
+                            CodePattern.usage_count,
+                        ).where(CodePattern.id.in_(missing))
+                    )
+                ).all()
+            loaded = [PatternSummary(*row) for row in rows]
+            self.pattern_cache.put(loaded)
+            found.update((summary.id, summary) for summary in loaded)
+
+        return [found[i] for i in ids if i in found]
+
+    async def get_pattern_code(self, pattern_id: int) -> str | None:
+        """Load the code body of one pattern."""
+        async with self.read_session() as session:
+            result = await session.execute(
+                select(CodePattern.code).where(CodePattern.id == pattern_id)
+            )
+            return result.scalar_one_or_none()
+
+    async def semantic_search_solutions(
+        self,
+        query: str,
+        problem_type: str | None = None,
+        limit: int = 10,
+    ) -> list[tuple[Solution, float]]:
+        """Rank solutions by similarity to ``query`` blended with their effectiveness."""
+        vector = (await self._embed([query]))[0]
+        hits = self.solution_index.search(vector, k=limit, label=problem_type)
+        return await self._fetch_ranked(Solution, hits)
+
+    async def search_text(
+        self,
+        query: str,
+        kinds: tuple[str, ...] = ("pattern", "solution"),
+        limit: int = 10,
+        snippet_tokens: int = 16,
+    ) -> list[dict[str, Any]]:
+        """Full-text search over pattern and solution text, ranked by BM25.
+
+        Returns dicts with ``kind``, ``id``, ``type``, ``description``,
+        ``score`` (higher is better) and a ``snippet`` with matches in brackets.
+        """
+        match = build_match_query(query)
+        if not self.fts_enabled or not match:
+            return []
+
+        results = []
+        async with self.read_engine.connect() as conn:
+            for kind in kinds:
+                if kind not in FTS_TABLES:
+                    raise ValueError(f"Unknown search kind: {kind}")
+
+                rows = await conn.execute(
+                    text(search_sql(kind)),
+                    {"query": match, "limit": limit, "snippet_tokens": snippet_tokens},
+                )
+                results.extend(
+                    {
+                        "kind": kind,
+                        "id": row.id,
+                        "type": row.type,
+                        "description": row.description,
+                        "score": -row.rank,
+                        "snippet": row.snippet,
+                    }
+                    for row in rows
+                )
+
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:limit]
+
+    async def _fetch_ranked(
+        self,
+        model: Any,
+        hits: list[tuple[int, float]],
+    ) -> list[tuple[Any, float]]:
+        """Load rows for index hits, preserving rank order."""
+        if not hits:
+            return []
+
+        async with self.read_session() as session:
+            result = await session.execute(
+                select(model).where(model.id.in_([item_id for item_id, _ in hits]))
+            )
+            rows = {row.id: row for row in result.scalars().all()}
+
+        return [(rows[item_id], score) for item_id, score in hits if item_id in rows]
 
     async def update_pattern_success(
         self,
@@ -118,13 +763,76 @@ class KnowledgeBase:
         success: bool,
     ) -> None:
         """Update pattern success statistics."""
+        await self.record_pattern_outcomes([(pattern_id, success)])
+
+    async def record_pattern_outcomes(self, events: list[tuple[int, bool]]) -> None:
+        """Apply many ``(pattern_id, success)`` outcomes in one transaction."""
+        await self._record_outcomes(CodePattern, "success_rate", self.pattern_index, events)
+
+    async def _record_outcomes(
+        self,
+        model: Any,
+        score_column: str,
+        index: VectorIndex,
+        events: list[tuple[int, bool]],
+    ) -> None:
+        """Update usage counters and running averages with SQL-side arithmetic.
+
+        Outcomes are aggregated per row and applied as one executemany UPDATE,
+        so concurrent writers never lose increments.
+        """
+        if not events:
+            return
+
+        totals: dict[int, list[int]] = {}
+        for item_id, success in events:
+            counts = totals.setdefault(item_id, [0, 0])
+            counts[0] += 1
+            counts[1] += 1 if success else 0
+
+        now = time.time()
+        table = model.__table__
+        usage = func.coalesce(table.c.usage_count, 0)
+        score = func.coalesce(table.c[score_column], 1.0)
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("item_id"))
+            .values(
+                {
+                    "usage_count": usage + bindparam("uses"),
+                    score_column: (score * usage + bindparam("successes"))
+                    / (usage + bindparam("uses")),
+                    "decayed_score": func.coalesce(table.c.decayed_score, 0.0)
+                    + bindparam("successes") * decay_weight(now),
+                    "last_used_at": now,
+                }
+            )
+        )
+
         async with self.async_session() as session:
-            pattern = await session.get(CodePattern, pattern_id)
-            if pattern:
-                pattern.usage_count += 1
-                total_score = pattern.success_rate * (pattern.usage_count - 1)
-                pattern.success_rate = (total_score + (1 if success else 0)) / pattern.usage_count
-                await session.commit()
+            await session.execute(
+                statement,
+                [
+                    {"item_id": item_id, "uses": uses, "successes": successes}
+                    for item_id, (uses, successes) in totals.items()
+                ],
+            )
+            rows = (
+                await session.execute(
+                    select(table.c.id, table.c[score_column], table.c.usage_count).where(
+                        table.c.id.in_(list(totals))
+                    )
+                )
+            ).all()
+            await session.commit()
+
+        for item_id, score_value, usage_count in rows:
+            index.update_stats(item_id, score_value, usage_count)
+
+        if model is CodePattern:
+            for item_id, score_value, usage_count in rows:
+                self.pattern_cache.update_stats(item_id, score_value, usage_count)
+            self.pattern_cache.invalidate_queries()
 
     async def add_solution(
         self,
@@ -134,37 +842,66 @@ class KnowledgeBase:
         metadata: dict[str, Any] | None = None,
     ) -> Solution:
         """Add a new solution to knowledge base."""
-        async with self.async_session() as session:
-            sol = Solution(
-                problem_type=problem_type,
-                solution=solution,
-                description=description,
-                metadata=metadata or {},
-            )
-            session.add(sol)
-            await session.commit()
-            await session.refresh(sol)
-            return sol
+        sol = self._new_solution(problem_type, solution, description, metadata)
+        await self._write_batch([sol])
+        return sol
+
+    def enqueue_solution(
+        self,
+        problem_type: str,
+        solution: str,
+        description: str,
+        metadata: dict[str, Any] | None = None,
+    ) -> "asyncio.Future[int]":
+        """Queue a solution for a batched write; the future resolves to its id."""
+        return self.write_queue.submit(
+            self._new_solution(problem_type, solution, description, metadata)
+        )
+
+    def _new_solution(
+        self,
+        problem_type: str,
+        solution: str,
+        description: str,
+        metadata: dict[str, Any] | None,
+    ) -> Solution:
+        """Build an unsaved solution row."""
+        return Solution(
+            problem_type=problem_type,
+            solution=solution,
+            description=description,
+            metadata_=metadata or {},
+            usage_count=0,
+            effectiveness_score=1.0,
+            content_hash=content_hash(solution),
+        )
 
     async def search_solutions(
         self,
         problem_type: str | None = None,
         limit: int = 10,
+        rank_by: str = "effectiveness",
     ) -> list[Solution]:
-        """Search for solutions."""
-        async with self.async_session() as session:
-            query = session.query(Solution)
+        """Search for solutions.
 
-            if problem_type:
-                query = query.filter(Solution.problem_type == problem_type)
+        ``rank_by="decayed"`` ranks by recency-weighted helpful outcomes instead.
+        """
+        async with self.read_session() as session:
+            query = select(Solution)
 
-            query = query.order_by(
-                Solution.effectiveness_score.desc(), Solution.usage_count.desc()
-            )
+            if problem_type:
+                query = query.where(Solution.problem_type == problem_type)
+
+            if rank_by == "decayed":
+                query = query.order_by(Solution.decayed_score.desc())
+            else:
+                query = query.order_by(
+                    Solution.effectiveness_score.desc(), Solution.usage_count.desc()
+                )
             query = query.limit(limit)
 
             result = await session.execute(query)
-            return result.scalars().all()
+            return list(result.scalars().all())
 
     async def update_solution_effectiveness(
         self,
@@ -172,15 +909,11 @@ class KnowledgeBase:
         was_helpful: bool,
     ) -> None:
         """Update solution effectiveness."""
-        async with self.async_session() as session:
-            solution = await session.get(Solution, solution_id)
-            if solution:
-                solution.usage_count += 1
-                total_score = solution.effectiveness_score * (solution.usage_count - 1)
-                solution.effectiveness_score = (
-                    total_score + (1 if was_helpful else 0)
-                ) / solution.usage_count
-                await session.commit()
+        await self.record_solution_outcomes([(solution_id, was_helpful)])
+
+    async def record_solution_outcomes(self, events: list[tuple[int, bool]]) -> None:
+        """Apply many ``(solution_id, was_helpful)`` outcomes in one transaction."""
+        await self._record_outcomes(Solution, "effectiveness_score", self.solution_index, events)
 
     async def set_preference(
         self,
@@ -190,30 +923,49 @@ class KnowledgeBase:
         metadata: dict[str, Any] | None = None,
     ) -> UserPreference:
         """Set a user preference."""
-        async with self.async_session() as session:
-            pref = UserPreference(
-                preference_type=preference_type,
-                value=value,
-                confidence=confidence,
-                metadata=metadata or {},
-            )
-            session.add(pref)
-            await session.commit()
-            await session.refresh(pref)
-            return pref
+        pref = self._new_preference(preference_type, value, confidence, metadata)
+        await self._write_batch([pref])
+        return pref
+
+    def enqueue_preference(
+        self,
+        preference_type: str,
+        value: str,
+        confidence: float = 0.5,
+        metadata: dict[str, Any] | None = None,
+    ) -> "asyncio.Future[int]":
+        """Queue a preference for a batched write; the future resolves to its id."""
+        return self.write_queue.submit(
+            self._new_preference(preference_type, value, confidence, metadata)
+        )
+
+    def _new_preference(
+        self,
+        preference_type: str,
+        value: str,
+        confidence: float,
+        metadata: dict[str, Any] | None,
+    ) -> UserPreference:
+        """Build an unsaved preference row."""
+        return UserPreference(
+            preference_type=preference_type,
+            value=value,
+            confidence=confidence,
+            metadata_=metadata or {},
+        )
 
     async def get_preferences(
         self,
         preference_type: str | None = None,
     ) -> list[UserPreference]:
         """Get user preferences."""
-        async with self.async_session() as session:
-            query = session.query(UserPreference)
+        async with self.read_session() as session:
+            query = select(UserPreference)
 
             if preference_type:
-                query = query.filter(UserPreference.preference_type == preference_type)
+                query = query.where(UserPreference.preference_type == preference_type)
 
             query = query.order_by(UserPreference.confidence.desc())
 
             result = await session.execute(query)
-            return result.scalars().all()
+            return list(result.scalars().all())
@@ -0,0 +1,263 @@
+"""Retention, eviction and compaction for the knowledge base."""
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from sqlalchemy import bindparam, text
+
+from config.settings import settings
+from glm_code_system.learning.fts import FTS_TABLES
+
+if TYPE_CHECKING:
+    from glm_code_system.learning.knowledge_base import KnowledgeBase
+
+logger = logging.getLogger(__name__)
+
+DELETE_CHUNK_SIZE = 500
+
+
+class RetentionPolicy(NamedTuple):
+    """Rules deciding which learned rows are kept. A zero disables a rule."""
+
+    max_rows_per_type: int
+    min_success_rate: float
+    min_uses: int
+    max_age_days: float
+
+    @classmethod
+    def from_settings(cls) -> "RetentionPolicy":
+        """Policy configured in settings."""
+        return cls(
+            max_rows_per_type=settings.kb_retention_max_rows_per_type,
+            min_success_rate=settings.kb_retention_min_success_rate,
+            min_uses=settings.kb_retention_min_uses,
+            max_age_days=settings.kb_retention_max_age_days,
+        )
+
+
+class RetentionTarget(NamedTuple):
+    """A table subject to retention and the columns its rules read."""
+
+    kind: str
+    table: str
+    label: str
+    score: str
+
+
+RETENTION_TARGETS = (
+    RetentionTarget("pattern", "code_patterns", "pattern_type", "success_rate"),
+    RetentionTarget("solution", "solutions", "problem_type", "effectiveness_score"),
+)
+
+
+def _retention_queries(target: RetentionTarget, policy: RetentionPolicy) -> dict[str, str]:
+    """SELECT statements returning the ids each enabled rule evicts."""
+    table, score = target.table, target.score
+    queries = {}
+
+    if policy.min_success_rate > 0 and policy.min_uses > 0:
+        queries["low_success"] = (
+            f"SELECT id FROM {table} WHERE COALESCE(usage_count, 0) >= :min_uses "
+            f"AND COALESCE({score}, 1.0) < :min_success_rate"
+        )
+    if policy.max_age_days > 0:
+        queries["stale"] = (
+            f"SELECT id FROM {table} WHERE COALESCE(last_used_at, created_at) < :cutoff"
+        )
+    if policy.max_rows_per_type > 0:
+        queries["over_capacity"] = (
+            f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+            f"PARTITION BY {target.label} ORDER BY {score} DESC, usage_count DESC, id DESC"
+            f") AS position FROM {table}) WHERE position > :max_rows"
+        )
+
+    return queries
+
+
+class KnowledgeMaintenance:
+    """Applies a retention policy to a knowledge base and compacts its storage.
+
+    Retention evicts rows that were used enough to judge and kept failing,
+    rows unused for ``max_age_days``, and the weakest rows of any type over
+    ``max_rows_per_type``. Repeated (type, value) preference rows left by
+    older versions are collapsed to the newest one. Compaction runs ANALYZE
+    and VACUUM.
+    """
+
+    def __init__(self, kb: "KnowledgeBase", policy: RetentionPolicy | None = None) -> None:
+        """Initialize maintenance for ``kb``."""
+        self.kb = kb
+        self.policy = policy or RetentionPolicy.from_settings()
+        self._task: asyncio.Task[None] | None = None
+
+    async def run(
+        self,
+        dry_run: bool = False,
+        vacuum: bool = True,
+        analyze: bool = True,
+    ) -> dict[str, Any]:
+        """Apply retention, then compact. Returns a report of what changed.
+
+        With ``dry_run`` nothing is deleted or compacted; the report lists
+        what would be evicted.
+        """
+        started = time.perf_counter()
+        await self.kb.flush()
+
+        size_before = await self.database_size()
+        deleted = await self.apply_retention(dry_run=dry_run)
+        if not dry_run and (vacuum or analyze):
+            await self.compact(vacuum=vacuum, analyze=analyze)
+        size_after = await self.database_size()
+
+        report = {
+            "dry_run": dry_run,
+            "deleted": deleted,
+            "bytes_before": size_before,
+            "bytes_after": size_after,
+            "bytes_reclaimed": max(size_before - size_after, 0),
+            "duration": time.perf_counter() - started,
+        }
+        logger.info(
+            "Knowledge base maintenance removed %d rows and reclaimed %d bytes",
+            sum(sum(reasons.values()) for reasons in deleted.values()),
+            report["bytes_reclaimed"],
+        )
+        return report
+
+    async def apply_retention(self, dry_run: bool = False) -> dict[str, dict[str, int]]:
+        """Delete rows the policy evicts; returns counts per table and rule."""
+        policy = self.policy
+        params = {
+            "min_uses": policy.min_uses,
+            "min_success_rate": policy.min_success_rate,
+            "cutoff": time.time() - policy.max_age_days * 86400.0,
+            "max_rows": policy.max_rows_per_type,
+        }
+        deleted: dict[str, dict[str, int]] = {}
+        evicted: dict[str, list[int]] = {}
+
+        async with self.kb.engine.connect() as conn:
+            transaction = await conn.begin()
+            # Rows written before created_at existed start aging now.
+            for target in RETENTION_TARGETS:
+                await conn.execute(
+                    text(f"UPDATE {target.table} SET created_at = :now WHERE created_at IS NULL"),
+                    {"now": time.time()},
+                )
+
+            for target in RETENTION_TARGETS:
+                counts = deleted.setdefault(target.table, {})
+                evicted[target.kind] = []
+                # Rules run in order, so later rules only see surviving rows.
+                for reason, query in _retention_queries(target, policy).items():
+                    ids = [row[0] for row in await conn.execute(text(query), params)]
+                    await self._delete(conn, target.table, ids)
+                    counts[reason] = len(ids)
+                    evicted[target.kind].extend(ids)
+
+            preference_ids = [
+                row[0]
+                for row in await conn.execute(
+                    text(
+                        "SELECT id FROM user_preferences WHERE id NOT IN "
+                        "(SELECT MAX(id) FROM user_preferences GROUP BY preference_type, value)"
+                    )
+                )
+            ]
+            await self._delete(conn, "user_preferences", preference_ids)
+            deleted["user_preferences"] = {"superseded": len(preference_ids)}
+
+            # A dry run computes exact counts, then discards every change.
+            if dry_run:
+                await transaction.rollback()
+            else:
+                await transaction.commit()
+
+        if not dry_run:
+            self._forget(evicted)
+        return deleted
+
+    async def _delete(self, conn: Any, table: str, ids: list[int]) -> None:
+        """Delete rows by id in bounded chunks."""
+        for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+            statement = text(f"DELETE FROM {table} WHERE id IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            )
+            await conn.execute(statement, {"ids": ids[start : start + DELETE_CHUNK_SIZE]})
+
+    def _forget(self, evicted: dict[str, list[int]]) -> None:
+        """Drop evicted rows from the in-memory indexes and caches."""
+        for pattern_id in evicted.get("pattern", []):
+            self.kb.pattern_index.remove(pattern_id)
+            self.kb.duplicates.remove(pattern_id)
+            self.kb.pattern_cache.remove(pattern_id)
+        for solution_id in evicted.get("solution", []):
+            self.kb.solution_index.remove(solution_id)
+
+        if evicted.get("pattern"):
+            self.kb.pattern_cache.invalidate_queries()
+
+    async def compact(self, vacuum: bool = True, analyze: bool = True) -> None:
+        """Refresh planner statistics and rebuild the database file."""
+        engine = self.kb.engine
+        if engine.dialect.name != "sqlite":
+            if analyze:
+                async with engine.connect() as conn:
+                    conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                    await conn.execute(text("ANALYZE"))
+            return
+
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if self.kb.fts_enabled:
+                for table in FTS_TABLES.values():
+                    await conn.execute(
+                        text(f"INSERT INTO {table.name}({table.name}) VALUES ('optimize')")
+                    )
+            if analyze:
+                await conn.execute(text("ANALYZE"))
+                await conn.execute(text("PRAGMA optimize"))
+            if vacuum:
+                await conn.execute(text("VACUUM"))
+                await conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+    async def database_size(self) -> int:
+        """Bytes used by the database, or 0 when the backend cannot tell."""
+        if self.kb.engine.dialect.name != "sqlite":
+            return 0
+
+        async with self.kb.engine.connect() as conn:
+            page_count = (await conn.execute(text("PRAGMA page_count"))).scalar() or 0
+            page_size = (await conn.execute(text("PRAGMA page_size"))).scalar() or 0
+        return int(page_count * page_size)
+
+    def start(self, interval: float | None = None) -> None:
+        """Run maintenance every ``interval`` seconds in the background."""
+        interval = interval or settings.kb_maintenance_interval_hours * 3600.0
+        if interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.ensure_future(self._run_periodically(interval))
+
+    async def _run_periodically(self, interval: float) -> None:
+        """Maintenance loop; failures are logged and retried next interval."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("Scheduled knowledge base maintenance failed")
+
+    async def stop(self) -> None:
+        """Cancel scheduled maintenance."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,129 @@
+"""In-memory cache of lightweight pattern summaries."""
+
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from config.settings import settings
+
+
+class PatternSummary:
+    """Pattern fields needed for ranking and display, without the code body."""
+
+    __slots__ = ("id", "pattern_type", "description", "context", "success_rate", "usage_count")
+
+    def __init__(
+        self,
+        id: int,
+        pattern_type: str,
+        description: str | None,
+        context: str | None,
+        success_rate: float | None,
+        usage_count: int | None,
+    ) -> None:
+        self.id = id
+        self.pattern_type = pattern_type
+        self.description = description
+        self.context = context
+        self.success_rate = success_rate if success_rate is not None else 1.0
+        self.usage_count = usage_count or 0
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert to the dict shape agents pass around."""
+        return {
+            "id": self.id,
+            "type": self.pattern_type,
+            "description": self.description,
+            "context": self.context,
+            "success_rate": self.success_rate,
+            "usage_count": self.usage_count,
+        }
+
+
+class PatternCache:
+    """Read-through LRU of pattern summaries plus cached top-k query results.
+
+    Summaries are keyed by id and patched in place when statistics change.
+    Query results are stored as id lists and dropped whenever patterns are
+    added or their statistics change, since either can reorder a top-k.
+    """
+
+    def __init__(self, capacity: int | None = None, query_capacity: int = 256) -> None:
+        """Initialize pattern cache."""
+        self.capacity = capacity or settings.kb_pattern_cache_size
+        self.query_capacity = query_capacity
+        self._summaries: OrderedDict[int, PatternSummary] = OrderedDict()
+        self._queries: OrderedDict[Hashable, list[int]] = OrderedDict()
+        self.generation = 0
+        self.stats: dict[str, int] = {"hits": 0, "misses": 0, "query_hits": 0, "query_misses": 0}
+
+    def get_many(self, ids: list[int]) -> tuple[dict[int, PatternSummary], list[int]]:
+        """Split ids into cached summaries and ids that must be loaded."""
+        found: dict[int, PatternSummary] = {}
+        missing: list[int] = []
+
+        for pattern_id in ids:
+            summary = self._summaries.get(pattern_id)
+            if summary is None:
+                missing.append(pattern_id)
+            else:
+                self._summaries.move_to_end(pattern_id)
+                found[pattern_id] = summary
+
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(missing)
+        return found, missing
+
+    def put(self, summaries: list[PatternSummary]) -> None:
+        """Insert summaries, evicting least recently used ones."""
+        for summary in summaries:
+            self._summaries[summary.id] = summary
+            self._summaries.move_to_end(summary.id)
+
+        while len(self._summaries) > self.capacity:
+            self._summaries.popitem(last=False)
+
+    def get_query(self, key: Hashable) -> list[int] | None:
+        """Get cached result ids for a query."""
+        ids = self._queries.get(key)
+        if ids is None:
+            self.stats["query_misses"] += 1
+            return None
+
+        self._queries.move_to_end(key)
+        self.stats["query_hits"] += 1
+        return ids
+
+    def put_query(self, key: Hashable, ids: list[int], generation: int) -> None:
+        """Cache result ids for a query started at ``generation``.
+
+        Results computed before the latest invalidation are discarded.
+        """
+        if generation != self.generation:
+            return
+
+        self._queries[key] = ids
+        self._queries.move_to_end(key)
+
+        while len(self._queries) > self.query_capacity:
+            self._queries.popitem(last=False)
+
+    def update_stats(self, pattern_id: int, success_rate: float, usage_count: int) -> None:
+        """Patch a cached summary after its statistics changed."""
+        summary = self._summaries.get(pattern_id)
+        if summary is not None:
+            summary.success_rate = success_rate
+            summary.usage_count = usage_count
+
+    def invalidate_queries(self) -> None:
+        """Drop cached query results."""
+        self.generation += 1
+        self._queries.clear()
+
+    def remove(self, pattern_id: int) -> None:
+        """Drop one summary."""
+        self._summaries.pop(pattern_id, None)
+
+    def clear(self) -> None:
+        """Drop everything."""
+        self._summaries.clear()
+        self.invalidate_queries()
@@ -0,0 +1,227 @@
+"""Cache of successful plans, looked up by request similarity."""
+
+import asyncio
+import difflib
+import re
+from typing import Any, NamedTuple
+
+from sqlalchemy import delete, select
+
+from config.settings import settings
+from glm_code_system.learning.knowledge_base import Solution
+from glm_code_system.learning.vector_index import VectorIndex
+
+# Problem type under which plan templates are stored as solutions.
+PLAN_TEMPLATE_TYPE = "plan_template"
+
+# Longest phrase (in tokens) treated as a request parameter.
+MAX_PARAMETER_TOKENS = 4
+
+_TOKEN_RE = re.compile(r"[\w./-]+|[^\w\s]")
+
+
+class TemplateMatch(NamedTuple):
+    """The cached plan closest to a request."""
+
+    id: int
+    request: str
+    plan: str
+    similarity: float
+    # The plan rewritten for the new request, if it can be reused as is.
+    adapted: str | None
+
+
+def request_parameters(template_request: str, request: str) -> dict[str, str] | None:
+    """Phrases of ``template_request`` that ``request`` replaces.
+
+    "add CRUD endpoint for users" vs "add CRUD endpoint for orders" gives
+    ``{"users": "orders"}``. Returns None if the requests differ by more
+    than short one-for-one substitutions.
+    """
+    old = _TOKEN_RE.findall(template_request)
+    new = _TOKEN_RE.findall(request)
+    matcher = difflib.SequenceMatcher(
+        None, [t.lower() for t in old], [t.lower() for t in new], autojunk=False
+    )
+
+    parameters: dict[str, str] = {}
+    shared = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            shared += i2 - i1
+            continue
+        if tag != "replace" or max(i2 - i1, j2 - j1) > MAX_PARAMETER_TOKENS:
+            return None
+        parameters[" ".join(old[i1:i2])] = " ".join(new[j1:j2])
+
+    # Most of the request must be shared wording, not parameters.
+    if len(parameters) > settings.plan_cache_max_parameters or 2 * shared < max(len(old), len(new)):
+        return None
+    return parameters
+
+
+def fill_template(plan: str, parameters: dict[str, str]) -> str:
+    """Substitute request parameters into a cached plan, matching leading case."""
+    if not parameters:
+        return plan
+
+    longest_first = sorted(parameters, key=len, reverse=True)
+    pattern = re.compile(
+        "|".join(rf"(?<!\w){re.escape(old)}(?!\w)" for old in longest_first), re.IGNORECASE
+    )
+    lowered = {old.lower(): new for old, new in parameters.items()}
+
+    def replace(match: re.Match[str]) -> str:
+        new = lowered[match.group(0).lower()]
+        if match.group(0)[:1].isupper():
+            return new[:1].upper() + new[1:]
+        return new
+
+    return pattern.sub(replace, plan)
+
+
+class PlanCache:
+    """Plan templates stored as ``plan_template`` solutions in the knowledge base.
+
+    Templates are indexed by the embedding of the request alone (not the
+    plan text), so similarity compares requests with requests. A match
+    above ``reuse_threshold`` whose request differs only by short
+    substitutions is returned ready to use; a match above
+    ``seed_threshold`` is offered as a worked example for the planner.
+    Plan outcomes update the template's effectiveness score, and templates
+    that keep failing are deleted.
+    """
+
+    def __init__(
+        self,
+        knowledge_base: Any,
+        reuse_threshold: float | None = None,
+        seed_threshold: float | None = None,
+    ) -> None:
+        """Initialize plan cache."""
+        self.kb = knowledge_base
+        self.reuse_threshold = reuse_threshold or settings.plan_cache_reuse_threshold
+        self.seed_threshold = seed_threshold or settings.plan_cache_seed_threshold
+        self.index = VectorIndex(knowledge_base.embedder.dimension)
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self.stats: dict[str, int] = {
+            "hits": 0,
+            "seeded": 0,
+            "misses": 0,
+            "stored": 0,
+            "evicted": 0,
+        }
+
+    async def _ensure_loaded(self) -> None:
+        """Index the stored templates on first use."""
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            async with self.kb.read_session() as session:
+                rows = (
+                    await session.execute(
+                        select(
+                            Solution.id,
+                            Solution.description,
+                            Solution.effectiveness_score,
+                            Solution.usage_count,
+                        ).where(Solution.problem_type == PLAN_TEMPLATE_TYPE)
+                    )
+                ).all()
+            if rows:
+                self.index.add(
+                    [row[0] for row in rows],
+                    await self.kb._embed([row[1] or "" for row in rows]),
+                    labels=[PLAN_TEMPLATE_TYPE] * len(rows),
+                    success_rates=[row[2] for row in rows],
+                    usage_counts=[row[3] for row in rows],
+                )
+            self._loaded = True
+
+    async def _nearest(self, request: str) -> tuple[int, float] | None:
+        """Closest template id and its cosine similarity to ``request``."""
+        await self._ensure_loaded()
+        if not len(self.index):
+            return None
+        vector = (await self.kb._embed([request]))[0]
+        hits = self.index.search(
+            vector, k=1, similarity_weight=1.0, success_weight=0.0, usage_weight=0.0
+        )
+        return hits[0] if hits else None
+
+    async def lookup(self, request: str) -> TemplateMatch | None:
+        """Best template for ``request``, or None below the seed threshold."""
+        nearest = await self._nearest(request)
+        if nearest is None or nearest[1] < self.seed_threshold:
+            self.stats["misses"] += 1
+            return None
+
+        template_id, similarity = nearest
+        async with self.kb.read_session() as session:
+            template = await session.get(Solution, template_id)
+        if template is None:
+            # Deleted elsewhere, e.g. by retention maintenance.
+            self.index.remove(template_id)
+            self.stats["misses"] += 1
+            return None
+
+        adapted = None
+        if similarity >= self.reuse_threshold:
+            parameters = request_parameters(template.description or "", request)
+            if parameters is not None:
+                adapted = fill_template(template.solution, parameters)
+
+        self.stats["hits" if adapted is not None else "seeded"] += 1
+        return TemplateMatch(
+            template.id, template.description or "", template.solution, similarity, adapted
+        )
+
+    async def store(self, request: str, plan: str) -> int | None:
+        """Save a plan that succeeded; returns its id, or None if one like it exists."""
+        nearest = await self._nearest(request)
+        if nearest is not None and nearest[1] >= self.reuse_threshold:
+            return None
+
+        template = await self.kb.add_solution(PLAN_TEMPLATE_TYPE, plan, request)
+        vector = await self.kb._embed([request])
+        self.index.add([template.id], vector, labels=[PLAN_TEMPLATE_TYPE])
+        self.stats["stored"] += 1
+        # The run that produced the plan counts as its first success.
+        await self.record_outcome(template.id, True)
+        return template.id
+
+    async def record_outcome(self, template_id: int, success: bool) -> bool:
+        """Score a template by how its plan went; returns True if it was evicted."""
+        await self.kb.record_solution_outcomes([(template_id, success)])
+
+        async with self.kb.async_session() as session:
+            row = (
+                await session.execute(
+                    select(Solution.effectiveness_score, Solution.usage_count).where(
+                        Solution.id == template_id
+                    )
+                )
+            ).first()
+            if row is None:
+                self.index.remove(template_id)
+                return False
+
+            score, usage = row
+            self.index.update_stats(template_id, score, usage)
+            if usage < settings.plan_cache_min_uses or score >= settings.plan_cache_min_success:
+                return False
+
+            await session.execute(delete(Solution).where(Solution.id == template_id))
+            await session.commit()
+
+        self.index.remove(template_id)
+        self.kb.solution_index.remove(template_id)
+        self.stats["evicted"] += 1
+        return True
+
+    def get_stats(self) -> dict[str, int]:
+        """Counters plus the number of templates."""
+        return {**self.stats, "templates": len(self.index)}
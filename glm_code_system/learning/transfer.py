@@ -0,0 +1,462 @@
+"""Streaming bulk export and import of knowledge base contents.
+
+Files are JSON lines, gzip-compressed when the path ends in ``.gz``. The
+first line is a header. In the ``rows`` layout every following line is one
+row; in the ``columnar`` layout every line holds a chunk of rows as column
+lists, with binary columns packed into one base64 blob per chunk.
+"""
+
+import base64
+import gzip
+import json
+import time
+from typing import IO, TYPE_CHECKING, Any, Iterator, NamedTuple
+
+from sqlalchemy import Table, bindparam, case, func, insert, select, update
+
+from glm_code_system.learning.dedup import content_hash
+from glm_code_system.learning.fts import FTS_TABLES, resume_fts, suspend_fts
+from glm_code_system.learning.knowledge_base import CodePattern, Solution, UserPreference
+from glm_code_system.utils.sse import json_loads
+
+if TYPE_CHECKING:
+    from glm_code_system.learning.knowledge_base import KnowledgeBase
+
+try:
+    import orjson
+
+    def json_dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+
+except ImportError:  # pragma: no cover - optional speedup
+
+    def json_dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+FORMAT_NAME = "glm-kb"
+FORMAT_VERSION = 1
+LAYOUTS = ("rows", "columnar")
+CONFLICT_POLICIES = ("skip", "merge", "replace")
+
+
+class TransferTable(NamedTuple):
+    """How one table is exported and matched on import."""
+
+    table: Table
+    key: tuple[str, ...]
+    hashed: str | None
+    score: str | None
+    binary: tuple[str, ...]
+
+    @property
+    def columns(self) -> list[str]:
+        """Columns carried in exports; ids are reassigned on import."""
+        return [str(column.name) for column in self.table.columns if column.name != "id"]
+
+
+TRANSFER_TABLES: dict[str, TransferTable] = {
+    "pattern": TransferTable(
+        CodePattern.__table__,
+        ("pattern_type", "content_hash"),
+        "code",
+        "success_rate",
+        ("embedding", "minhash"),
+    ),
+    "solution": TransferTable(
+        Solution.__table__,
+        ("problem_type", "content_hash"),
+        "solution",
+        "effectiveness_score",
+        ("embedding",),
+    ),
+    "preference": TransferTable(
+        UserPreference.__table__, ("preference_type", "value"), None, None, ()
+    ),
+}
+
+
+def _open(path: str, mode: str) -> IO[bytes]:
+    """Open a binary stream, gzip-compressed for ``.gz`` paths."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "b", compresslevel=5)
+    return open(path, mode + "b")
+
+
+def _b64(blob: bytes | None) -> str | None:
+    return None if blob is None else base64.b64encode(blob).decode("ascii")
+
+
+def _unb64(value: str | None) -> bytes | None:
+    return None if value is None else base64.b64decode(value)
+
+
+def _encode_columns(spec: TransferTable, rows: list[dict[str, Any]]) -> dict[str, Any]:
+    """Pack a chunk of rows column by column.
+
+    Each binary column becomes ``{"width", "present", "data"}``; values whose
+    size differs from the first one are dropped and rebuilt on import.
+    """
+    columns: dict[str, Any] = {}
+    for name in spec.columns:
+        values = [row[name] for row in rows]
+        if name not in spec.binary:
+            columns[name] = values
+            continue
+
+        width = next((len(v) for v in values if v is not None), 0)
+        present = [v is not None and len(v) == width for v in values]
+        data = b"".join(v for v, keep in zip(values, present) if keep)
+        columns[name] = {"width": width, "present": present, "data": _b64(data)}
+    return columns
+
+
+def _decode_columns(spec: TransferTable, chunk: dict[str, Any]) -> list[dict[str, Any]]:
+    """Unpack a columnar chunk into row dicts."""
+    count = chunk["count"]
+    columns = chunk["columns"]
+    decoded: dict[str, list[Any]] = {}
+
+    for name in spec.columns:
+        value = columns.get(name)
+        if name not in spec.binary:
+            decoded[name] = value if value is not None else [None] * count
+            continue
+
+        blobs: list[bytes | None] = [None] * count
+        if value is not None:
+            data, width, offset = _unb64(value["data"]) or b"", value["width"], 0
+            for i, keep in enumerate(value["present"]):
+                if keep:
+                    blobs[i] = data[offset : offset + width]
+                    offset += width
+        decoded[name] = blobs
+
+    return [{name: decoded[name][i] for name in spec.columns} for i in range(count)]
+
+
+def _header(kb: "KnowledgeBase", layout: str) -> dict[str, Any]:
+    return {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "layout": layout,
+        "embedder": kb.embedder.identity,
+        "embedding_dimension": kb.embedder.dimension,
+        "minhash_permutations": kb.duplicates.num_perm,
+        "exported_at": time.time(),
+    }
+
+
+async def export_jsonl(
+    kb: "KnowledgeBase",
+    path: str,
+    kinds: tuple[str, ...] = ("pattern", "solution", "preference"),
+    layout: str = "rows",
+    chunk_size: int = 1000,
+) -> dict[str, int]:
+    """Write the knowledge base to ``path`` and return rows exported per kind.
+
+    Rows are streamed from the read pool in chunks of ``chunk_size`` as plain
+    column tuples, so memory stays flat regardless of table size.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown export layout: {layout}")
+
+    counts = {kind: 0 for kind in kinds}
+    with _open(path, "w") as out:
+        out.write(json_dumps(_header(kb, layout)) + b"\n")
+
+        async with kb.read_engine.connect() as conn:
+            for kind in kinds:
+                spec = TRANSFER_TABLES[kind]
+                names = spec.columns
+                query = select(*(spec.table.c[name] for name in names)).order_by(spec.table.c.id)
+                result = await conn.stream(query.execution_options(yield_per=chunk_size))
+
+                async for partition in result.mappings().partitions(chunk_size):
+                    rows = [{name: row[name] for name in names} for row in partition]
+                    if layout == "columnar":
+                        columns = _encode_columns(spec, rows)
+                        chunk = {"kind": kind, "count": len(rows), "columns": columns}
+                        out.write(json_dumps(chunk) + b"\n")
+                    else:
+                        lines = (json_dumps(_row_line(kind, spec, row)) for row in rows)
+                        out.write(b"\n".join(lines) + b"\n")
+                    counts[kind] += len(rows)
+
+    return counts
+
+
+def _row_line(kind: str, spec: TransferTable, row: dict[str, Any]) -> dict[str, Any]:
+    line = {"kind": kind, **row}
+    for name in spec.binary:
+        line[name] = _b64(row[name])
+    return line
+
+
+def _read_chunks(
+    lines: Iterator[bytes], layout: str, chunk_size: int
+) -> Iterator[tuple[str, list[dict[str, Any]]]]:
+    """Yield ``(kind, rows)`` chunks from the body of an export file."""
+    pending: dict[str, list[dict[str, Any]]] = {}
+
+    columns = {kind: spec.columns for kind, spec in TRANSFER_TABLES.items()}
+
+    for raw in lines:
+        if not raw.strip():
+            continue
+        line = json_loads(raw)
+        kind = line.pop("kind")
+        spec = TRANSFER_TABLES[kind]
+
+        if layout == "columnar":
+            yield kind, _decode_columns(spec, line)
+            continue
+
+        for name in spec.binary:
+            line[name] = _unb64(line.get(name))
+        buffer = pending.setdefault(kind, [])
+        buffer.append({name: line.get(name) for name in columns[kind]})
+        if len(buffer) >= chunk_size:
+            yield kind, buffer
+            pending[kind] = []
+
+    for kind, buffer in pending.items():
+        if buffer:
+            yield kind, buffer
+
+
+async def import_jsonl(
+    kb: "KnowledgeBase",
+    path: str,
+    conflict: str = "skip",
+    chunk_size: int = 1000,
+) -> dict[str, dict[str, int]]:
+    """Load a file written by :func:`export_jsonl` into ``kb``.
+
+    Rows are matched against existing ones by content hash (within the same
+    pattern or problem type) and preferences by type and value. On a match,
+    ``conflict`` decides: ``skip`` keeps the existing row, ``merge`` adds the
+    incoming usage to it and blends the success scores, ``replace``
+    overwrites it. Each chunk is one transaction of executemany statements.
+    Embeddings from a different embedder are dropped and recomputed when the
+    in-memory indexes are rebuilt at the end.
+    """
+    if conflict not in CONFLICT_POLICIES:
+        raise ValueError(f"Unknown conflict policy: {conflict}")
+
+    await _backfill_hashes(kb, chunk_size)
+    stats: dict[str, dict[str, int]] = {}
+
+    # Indexing every row through triggers is slower than one FTS rebuild.
+    fts_kinds = tuple(kind for kind in TRANSFER_TABLES if kind in FTS_TABLES)
+    if kb.fts_enabled:
+        async with kb.engine.begin() as conn:
+            await suspend_fts(conn, fts_kinds)
+    try:
+        await _import_file(kb, path, conflict, chunk_size, stats)
+    finally:
+        if kb.fts_enabled:
+            async with kb.engine.begin() as conn:
+                await resume_fts(conn, fts_kinds)
+
+    await kb.reload_indexes()
+    return stats
+
+
+async def _import_file(
+    kb: "KnowledgeBase",
+    path: str,
+    conflict: str,
+    chunk_size: int,
+    stats: dict[str, dict[str, int]],
+) -> None:
+    """Read the export file and import it chunk by chunk."""
+    with _open(path, "r") as source:
+        header = json_loads(source.readline())
+        if header.get("format") != FORMAT_NAME:
+            raise ValueError(f"{path} is not a knowledge base export")
+
+        layout = header.get("layout", "rows")
+        # Rows also carry their own embedder identity, checked again when indexed.
+        keep_embeddings = (
+            header.get("embedder") == kb.embedder.identity
+            and header.get("embedding_dimension") == kb.embedder.dimension
+        )
+        keep_minhash = header.get("minhash_permutations") == kb.duplicates.num_perm
+
+        for kind, rows in _read_chunks(source, layout, chunk_size):
+            for row in rows:
+                if not keep_embeddings and "embedding" in row:
+                    row["embedding"] = None
+                    row["embedder"] = None
+                if not keep_minhash and "minhash" in row:
+                    row["minhash"] = None
+
+            counts = stats.setdefault(
+                kind, {"inserted": 0, "skipped": 0, "merged": 0, "replaced": 0}
+            )
+            await _import_chunk(kb, TRANSFER_TABLES[kind], rows, conflict, counts)
+
+
+async def _backfill_hashes(kb: "KnowledgeBase", chunk_size: int) -> None:
+    """Hash existing rows that predate the content_hash column."""
+    for spec in TRANSFER_TABLES.values():
+        if spec.hashed is None:
+            continue
+
+        table = spec.table
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("item_id"))
+            .values(content_hash=bindparam("digest"))
+        )
+        while True:
+            async with kb.engine.begin() as conn:
+                rows = (
+                    await conn.execute(
+                        select(table.c.id, table.c[spec.hashed])
+                        .where(table.c.content_hash.is_(None))
+                        .limit(chunk_size)
+                    )
+                ).all()
+                if not rows:
+                    break
+                await conn.execute(
+                    statement,
+                    [{"item_id": row[0], "digest": content_hash(row[1])} for row in rows],
+                )
+
+
+def _row_key(spec: TransferTable, row: dict[str, Any]) -> tuple[Any, ...]:
+    return tuple(row[name] for name in spec.key)
+
+
+async def _existing_ids(conn: Any, spec: TransferTable, keys: list[tuple[Any, ...]]) -> dict:
+    """Map conflict keys to the id of a stored row with that key."""
+    if not keys:
+        return {}
+
+    # Filter on the indexed last key column only; SQLite cannot use an
+    # index for a row-value IN list.
+    key_columns = [spec.table.c[name] for name in spec.key]
+    wanted = set(keys)
+    result = await conn.execute(
+        select(func.min(spec.table.c.id), *key_columns)
+        .where(key_columns[-1].in_({key[-1] for key in keys}))
+        .group_by(*key_columns)
+    )
+    return {key: row[0] for row in result if (key := tuple(row[1:])) in wanted}
+
+
+async def _import_chunk(
+    kb: "KnowledgeBase",
+    spec: TransferTable,
+    rows: list[dict[str, Any]],
+    conflict: str,
+    counts: dict[str, int],
+) -> None:
+    """Insert new rows and resolve conflicting ones in one transaction."""
+    now = time.time()
+    for row in rows:
+        if spec.hashed is not None and not row.get("content_hash"):
+            row["content_hash"] = content_hash(row[spec.hashed])
+        if "created_at" in row and row["created_at"] is None:
+            row["created_at"] = now
+        if row.get("metadata") is None:
+            row["metadata"] = {}
+
+    async with kb.engine.begin() as conn:
+        existing = await _existing_ids(
+            conn, spec, list(dict.fromkeys(_row_key(spec, row) for row in rows))
+        )
+
+        # The first row of each new key is inserted; repeats become conflicts.
+        fresh: dict[tuple[Any, ...], dict[str, Any]] = {}
+        conflicts: list[dict[str, Any]] = []
+        for row in rows:
+            key = _row_key(spec, row)
+            if key in existing or key in fresh:
+                conflicts.append(row)
+            else:
+                fresh[key] = row
+
+        if fresh:
+            await conn.execute(insert(spec.table), list(fresh.values()))
+            counts["inserted"] += len(fresh)
+
+        if not conflicts or conflict == "skip":
+            counts["skipped"] += len(conflicts)
+            return
+
+        existing = await _existing_ids(
+            conn, spec, list(dict.fromkeys(_row_key(spec, row) for row in conflicts))
+        )
+        params = [
+            {"item_id": existing[_row_key(spec, row)], **{f"new_{k}": v for k, v in row.items()}}
+            for row in conflicts
+        ]
+
+        if conflict == "replace":
+            await conn.execute(_replace_statement(spec), params)
+            counts["replaced"] += len(conflicts)
+        else:
+            await conn.execute(_merge_statement(spec), params)
+            counts["merged"] += len(conflicts)
+
+
+def _incoming(spec: TransferTable, name: str) -> Any:
+    """Bound value of an incoming column, typed like the stored column."""
+    return bindparam(f"new_{name}", type_=spec.table.c[name].type)
+
+
+def _greatest(a: Any, b: Any) -> Any:
+    return case((b > a, b), else_=a)
+
+
+def _replace_statement(spec: TransferTable) -> Any:
+    """Overwrite every transferred column of a matched row."""
+    table = spec.table
+    return (
+        update(table)
+        .where(table.c.id == bindparam("item_id"))
+        .values({name: _incoming(spec, name) for name in spec.columns})
+    )
+
+
+def _merge_statement(spec: TransferTable) -> Any:
+    """Fold incoming statistics into a matched row with SQL-side arithmetic.
+
+    Usage counts and decayed scores add up, success scores are averaged
+    weighted by usage, and the latest ``last_used_at`` wins. Preferences are
+    matched on type and value, so they only keep the higher confidence.
+    """
+    table = spec.table
+    statement = update(table).where(table.c.id == bindparam("item_id"))
+
+    if spec.score is None:
+        confidence = func.coalesce(table.c.confidence, 0.0)
+        incoming_confidence = func.coalesce(_incoming(spec, "confidence"), 0.0)
+        return statement.values(confidence=_greatest(confidence, incoming_confidence))
+
+    usage = func.coalesce(table.c.usage_count, 0)
+    incoming_usage = func.coalesce(_incoming(spec, "usage_count"), 0)
+    score = func.coalesce(table.c[spec.score], 1.0)
+    incoming_score = func.coalesce(_incoming(spec, spec.score), 1.0)
+    total = usage + incoming_usage
+
+    return statement.values(
+        {
+            "usage_count": total,
+            spec.score: func.coalesce(
+                (score * usage + incoming_score * incoming_usage) / func.nullif(total, 0),
+                score,
+            ),
+            "decayed_score": func.coalesce(table.c.decayed_score, 0.0)
+            + func.coalesce(_incoming(spec, "decayed_score"), 0.0),
+            "last_used_at": _greatest(
+                func.coalesce(table.c.last_used_at, 0.0),
+                func.coalesce(_incoming(spec, "last_used_at"), 0.0),
+            ),
+        }
+    )
@@ -0,0 +1,177 @@
+"""In-memory NumPy vector index with hybrid similarity/quality ranking."""
+
+import math
+
+import numpy as np
+
+from config.settings import settings
+
+
+class VectorIndex:
+    """Normalized embedding matrix with cosine top-k search.
+
+    Rows live in preallocated arrays that grow geometrically, so incremental
+    adds are amortized O(1) and searches are a single matrix-vector product
+    plus ``argpartition`` even at hundreds of thousands of rows. Each row also
+    carries the quality signals used for hybrid ranking and a label used for
+    filtering (the pattern or problem type).
+    """
+
+    def __init__(self, dimension: int, initial_capacity: int = 1024) -> None:
+        """Initialize empty index."""
+        self.dimension = dimension
+        self.size = 0
+        self._vectors = np.zeros((initial_capacity, dimension), dtype=np.float32)
+        self._ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._labels = np.zeros(initial_capacity, dtype=np.int32)
+        self._success = np.zeros(initial_capacity, dtype=np.float32)
+        self._usage = np.zeros(initial_capacity, dtype=np.float32)
+        self._positions: dict[int, int] = {}
+        self._label_codes: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._positions
+
+    def _reserve(self, extra: int) -> None:
+        """Grow the backing arrays to fit ``extra`` more rows."""
+        needed = self.size + extra
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+
+        while capacity < needed:
+            capacity *= 2
+
+        for name in ("_vectors", "_ids", "_labels", "_success", "_usage"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, name, new)
+
+    def _label_code(self, label: str | None) -> int:
+        """Map a label to a small integer code (0 means unlabelled)."""
+        if label is None:
+            return 0
+        return self._label_codes.setdefault(label, len(self._label_codes) + 1)
+
+    def add(
+        self,
+        ids: list[int],
+        vectors: np.ndarray,
+        labels: list[str | None] | None = None,
+        success_rates: list[float] | None = None,
+        usage_counts: list[int] | None = None,
+    ) -> None:
+        """Add or replace rows in one batch."""
+        count = len(ids)
+        labels = labels or [None] * count
+        success_rates = success_rates or [1.0] * count
+        usage_counts = usage_counts or [0] * count
+
+        self._reserve(count)
+        for i, item_id in enumerate(ids):
+            position = self._positions.get(item_id)
+            if position is None:
+                position = self.size
+                self.size += 1
+                self._positions[item_id] = position
+                self._ids[position] = item_id
+
+            self._vectors[position] = vectors[i]
+            self._labels[position] = self._label_code(labels[i])
+            self._success[position] = success_rates[i] if success_rates[i] is not None else 1.0
+            self._usage[position] = usage_counts[i] or 0
+
+    def remove(self, item_id: int) -> None:
+        """Remove a row by swapping the last row into its slot."""
+        position = self._positions.pop(item_id, None)
+        if position is None:
+            return
+
+        last = self.size - 1
+        if position != last:
+            moved_id = int(self._ids[last])
+            for array in (self._vectors, self._ids, self._labels, self._success, self._usage):
+                array[position] = array[last]
+            self._positions[moved_id] = position
+        self.size = last
+
+    def update_stats(self, item_id: int, success_rate: float, usage_count: int) -> None:
+        """Update the quality signals of one row."""
+        position = self._positions.get(item_id)
+        if position is not None:
+            self._success[position] = success_rate
+            self._usage[position] = usage_count
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        label: str | None = None,
+        similarity_weight: float | None = None,
+        success_weight: float | None = None,
+        usage_weight: float | None = None,
+    ) -> list[tuple[int, float]]:
+        """Return the top-k ``(id, score)`` pairs for one query vector."""
+        return self.search_batch(
+            query.reshape(1, -1),
+            k,
+            label,
+            similarity_weight,
+            success_weight,
+            usage_weight,
+        )[0]
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        label: str | None = None,
+        similarity_weight: float | None = None,
+        success_weight: float | None = None,
+        usage_weight: float | None = None,
+    ) -> list[list[tuple[int, float]]]:
+        """Return the top-k ``(id, score)`` pairs for each query row.
+
+        Score is ``w_sim * cosine + w_success * success_rate + w_usage *
+        log-scaled usage``.
+        """
+        if similarity_weight is None:
+            similarity_weight = settings.retrieval_similarity_weight
+        if success_weight is None:
+            success_weight = settings.retrieval_success_weight
+        if usage_weight is None:
+            usage_weight = settings.retrieval_usage_weight
+
+        if self.size == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        n = self.size
+        scores = similarity_weight * (queries.astype(np.float32) @ self._vectors[:n].T)
+
+        usage = self._usage[:n]
+        max_usage = float(usage.max()) if n else 0.0
+        prior = success_weight * self._success[:n]
+        if max_usage > 0:
+            prior = prior + usage_weight * (np.log1p(usage) / math.log1p(max_usage))
+        scores += prior
+
+        if label is not None:
+            code = self._label_codes.get(label)
+            if code is None:
+                return [[] for _ in range(len(queries))]
+            scores[:, self._labels[:n] != code] = -np.inf
+
+        k = min(k, n)
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k] if k < n else np.arange(n)
+            top = top[np.argsort(-row[top])]
+            results.append(
+                [(int(self._ids[i]), float(row[i])) for i in top if np.isfinite(row[i])]
+            )
+
+        return results
@@ -0,0 +1,124 @@
+"""Write-behind queue that batches knowledge base inserts."""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Collects writes and hands them to ``writer`` in batches.
+
+    A batch is flushed when it reaches ``max_batch_size`` items or when
+    ``max_delay`` seconds have passed since the flusher woke up, whichever
+    comes first. ``writer`` receives a list of items and must return one
+    result per item; each result is delivered through the future returned by
+    :meth:`submit`. If the writer fails, every future in that batch fails.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[list[Any]], Awaitable[list[Any]]],
+        max_batch_size: int | None = None,
+        max_delay: float | None = None,
+    ) -> None:
+        """Initialize write-behind queue."""
+        self.writer = writer
+        self.max_batch_size = max_batch_size or settings.kb_write_batch_size
+        self.max_delay = settings.kb_write_max_delay if max_delay is None else max_delay
+
+        self._items: list[tuple[Any, asyncio.Future[Any]]] = []
+        self._unresolved: set[asyncio.Future[Any]] = set()
+        self._pending = asyncio.Event()
+        self._flush_now = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._closing = False
+        self.stats: dict[str, int] = {"submitted": 0, "written": 0, "batches": 0, "failed": 0}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def submit(self, item: Any) -> asyncio.Future[Any]:
+        """Queue an item and return a future for the writer's result."""
+        if self._closing:
+            raise RuntimeError("Write-behind queue is closed")
+
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        # Results are optional to await; keep unobserved failures out of the logs.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._items.append((item, future))
+        self._unresolved.add(future)
+        self.stats["submitted"] += 1
+
+        self._pending.set()
+        if len(self._items) >= self.max_batch_size:
+            self._flush_now.set()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+        return future
+
+    async def _run(self) -> None:
+        """Flush batches until closed and drained."""
+        while True:
+            await self._pending.wait()
+
+            if len(self._items) < self.max_batch_size and not self._closing:
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            self._flush_now.clear()
+            while self._items:
+                await self._write_batch()
+            self._pending.clear()
+
+            if self._closing:
+                return
+
+    async def _write_batch(self) -> None:
+        """Write up to one batch of queued items."""
+        batch = self._items[: self.max_batch_size]
+        del self._items[: self.max_batch_size]
+        items = [item for item, _ in batch]
+
+        try:
+            results = await self.writer(items)
+        except Exception as e:
+            logger.exception("Write-behind batch of %d items failed", len(batch))
+            self.stats["failed"] += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            for _, future in batch:
+                self._unresolved.discard(future)
+
+    async def flush(self) -> None:
+        """Write everything queued so far and wait for it to land."""
+        waiting = list(self._unresolved)
+        if not waiting:
+            return
+
+        self._flush_now.set()
+        await asyncio.gather(*waiting, return_exceptions=True)
+
+    async def close(self) -> None:
+        """Flush remaining writes and stop accepting new ones."""
+        self._closing = True
+        self._pending.set()
+        self._flush_now.set()
+
+        if self._task is not None:
+            await self._task
@@ -1,3 +1,3 @@
-from .registry import ToolRegistry, ToolResult, BaseTool
+from .registry import ToolRegistry, ToolResult, ToolCall, BaseTool
 
-__all__ = ["ToolRegistry", "ToolResult", "BaseTool"]
+__all__ = ["ToolRegistry", "ToolResult", "ToolCall", "BaseTool"]
@@ -0,0 +1,669 @@
+"""Trigram-indexed content search over the workspace."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+from config.settings import settings
+from glm_code_system.tools.workspace_index import WorkspaceIndex, get_workspace_index
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+BINARY_SNIFF_BYTES = 8192
+# Below this many files a scan runs in a thread; above it, in the process pool.
+PARALLEL_SCAN_THRESHOLD = 64
+MAX_MATCHES_PER_FILE = 20
+MAX_LINE_CHARS = 300
+# Compact the on-disk segment once this share of documents lives in the delta.
+COMPACT_RATIO = 0.2
+COMPACT_MIN_DOCS = 256
+
+# Document kinds recorded per path.
+BINARY = -1
+UNINDEXED = -2
+
+
+def file_trigrams(path: str, max_bytes: int) -> np.ndarray | int:
+    """Sorted unique case-folded byte trigrams of a file, or BINARY / UNINDEXED."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(max_bytes + 1)
+    except OSError:
+        return BINARY
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return BINARY
+    if len(data) > max_bytes:
+        return UNINDEXED
+    if len(data) < 3:
+        return np.empty(0, dtype=np.uint32)
+
+    codes = np.frombuffer(data.lower(), dtype=np.uint8).astype(np.uint32)
+    return np.unique((codes[:-2] << 16) | (codes[1:-1] << 8) | codes[2:])
+
+
+def _caseless_runs(literal: str) -> list[str]:
+    """``literal`` split at non-ASCII characters that have another case."""
+    runs: list[str] = []
+    current: list[str] = []
+    for char in literal:
+        if not char.isascii() and (char.lower() != char or char.upper() != char):
+            runs.append("".join(current))
+            current.clear()
+        else:
+            current.append(char)
+    runs.append("".join(current))
+    return runs
+
+
+def literal_trigrams(literals: list[str], case_sensitive: bool = True) -> np.ndarray:
+    """Trigrams every matching file must contain, from required literal runs.
+
+    Literals are folded like ``file_trigrams`` does, ASCII only. For a
+    case-insensitive search, runs are split at non-ASCII letters that have
+    another case, since a match may encode them differently.
+    """
+    found = [np.empty(0, dtype=np.uint32)]
+    for literal in literals:
+        for run in [literal] if case_sensitive else _caseless_runs(literal):
+            data = run.encode("utf-8").lower()
+            if len(data) >= 3:
+                codes = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+                found.append((codes[:-2] << 16) | (codes[1:-1] << 8) | codes[2:])
+    return np.unique(np.concatenate(found))
+
+
+_REGEX_META = set(".^$*+?{}[]\\|()")
+_OPTIONAL = set("?*{")
+
+
+def required_literals(pattern: str) -> list[str]:
+    """Literal runs that any match of regex ``pattern`` must contain.
+
+    Conservative: a top-level ``|`` yields nothing, groups and character
+    classes end a run, and a character made optional by ``?``, ``*`` or
+    ``{`` is dropped from its run.
+    """
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            end = pattern.find("]", i + 2)
+            i = len(pattern) if end < 0 else end + 1
+            continue
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            return []
+        i += 1
+
+    runs: list[str] = []
+    current: list[str] = []
+    depth = 0
+    i = 0
+
+    def close() -> None:
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    while i < len(pattern):
+        c = pattern[i]
+        if depth:
+            if c == "\\":
+                i += 1
+            elif c == "(":
+                depth += 1
+            elif c == ")":
+                depth -= 1
+            i += 1
+            continue
+
+        if c == "\\":
+            escaped = pattern[i + 1 : i + 2]
+            if escaped and not escaped.isalnum():
+                literal, i = escaped, i + 2
+            else:
+                close()
+                i += 2
+                continue
+        elif c in _REGEX_META:
+            close()
+            if c == "(":
+                depth = 1
+            elif c == "[":
+                end = pattern.find("]", i + 2)
+                i = len(pattern) if end < 0 else end
+            elif c == "{":
+                end = pattern.find("}", i)
+                i = len(pattern) if end < 0 else end
+            i += 1
+            continue
+        else:
+            literal, i = c, i + 1
+
+        following = pattern[i] if i < len(pattern) else ""
+        if following in _OPTIONAL:
+            close()
+        else:
+            current.append(literal)
+    close()
+    return runs
+
+
+class Match(NamedTuple):
+    """A matching line with its surrounding context."""
+
+    line: int
+    text: str
+    before: list[str]
+    after: list[str]
+
+
+class FileMatches(NamedTuple):
+    """Matches in one file and its ranking score."""
+
+    path: str
+    score: float
+    matches: list[Match]
+    total: int
+
+
+def _clip(line: str) -> str:
+    return line if len(line) <= MAX_LINE_CHARS else line[:MAX_LINE_CHARS] + "..."
+
+
+def scan_file(
+    path: str,
+    relpath: str,
+    pattern: str,
+    flags: int,
+    context: int,
+    needle: str | None,
+) -> FileMatches | None:
+    """Search one file; ``needle`` is the literal query, if any, used for ranking."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+
+    regex = re.compile(pattern, flags)
+    text = data.decode("utf-8", errors="replace")
+    if not regex.search(text):
+        return None
+
+    lines = text.splitlines()
+    word = re.compile(rf"\b(?:{pattern})\b", flags)
+    matches: list[Match] = []
+    total = 0
+    score = 0.0
+    for number, line in enumerate(lines):
+        found = regex.search(line)
+        if not found:
+            continue
+        total += 1
+        # Whole-word hits and exact-case hits of an insensitive search rank higher.
+        score += 1.0
+        if word.search(line):
+            score += 1.0
+        if needle is not None and needle in line:
+            score += 0.5
+        if len(matches) < MAX_MATCHES_PER_FILE:
+            matches.append(
+                Match(
+                    number + 1,
+                    _clip(line),
+                    [_clip(other) for other in lines[max(number - context, 0) : number]],
+                    [_clip(other) for other in lines[number + 1 : number + 1 + context]],
+                )
+            )
+
+    if needle is not None and needle.lower() in relpath.lower():
+        score += 2.0
+    # Dense matches in a short file beat scattered ones in a huge file.
+    score /= 1.0 + len(lines) / 2000
+    return FileMatches(relpath, score, matches, total)
+
+
+def scan_files(
+    items: list[tuple[str, str]],
+    pattern: str,
+    flags: int,
+    context: int,
+    needle: str | None,
+) -> list[FileMatches]:
+    """Search a batch of ``(path, relpath)`` pairs; runs in a worker process."""
+    results = []
+    for path, relpath in items:
+        found = scan_file(path, relpath, pattern, flags, context, needle)
+        if found is not None:
+            results.append(found)
+    return results
+
+
+def _trigram_batch(paths: list[str], max_bytes: int) -> list[np.ndarray | int]:
+    return [file_trigrams(path, max_bytes) for path in paths]
+
+
+_executor: Executor | None = None
+
+
+def get_search_executor() -> Executor:
+    """Process pool shared by index builds and parallel scans."""
+    global _executor
+    if _executor is None:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.content_search_workers or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context(method),
+        )
+    return _executor
+
+
+def shutdown_search_executor() -> None:
+    """Stop the shared process pool."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+def _chunks(items: list, count: int) -> list[list]:
+    size = max(len(items) // count + 1, 16)
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+class TrigramIndex:
+    """Trigram postings for the files of a :class:`WorkspaceIndex`.
+
+    Postings live in an on-disk segment of three ``.npy`` arrays (sorted
+    trigrams, offsets and document ids) opened with ``mmap_mode="r"``, so
+    a restart loads instantly and only touched pages are read. Files that
+    changed since the segment was written are tracked by (mtime, size)
+    and re-indexed into an in-memory delta; the segment is rewritten once
+    the delta grows past ``COMPACT_RATIO`` of the documents. Files larger
+    than ``max_file_bytes`` are left out and always scanned directly.
+    """
+
+    def __init__(
+        self,
+        workspace: WorkspaceIndex,
+        directory: str | None = None,
+        max_file_bytes: int | None = None,
+    ) -> None:
+        """Initialize trigram index; ``refresh`` loads or builds it."""
+        self.workspace = workspace
+        base = os.path.expanduser(directory or settings.content_search_index_dir)
+        digest = hashlib.sha1(workspace.root.encode()).hexdigest()[:16]
+        self.directory = os.path.join(base, digest)
+        self.max_file_bytes = max_file_bytes or settings.content_search_max_file_bytes
+
+        self._paths: list[str] = []
+        # path -> (mtime_ns, size, doc id or BINARY / UNINDEXED)
+        self._stamps: dict[str, tuple[int, int, int]] = {}
+        self._dead: set[int] = set()
+        # Documents indexed since the segment was written: (doc id, trigrams).
+        self._delta: list[tuple[int, np.ndarray]] = []
+        self._segment_docs = 0
+        self._trigrams = np.empty(0, dtype=np.uint32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.empty(0, dtype=np.uint32)
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self.stats: dict[str, int] = {"indexed": 0, "compactions": 0, "queries": 0}
+
+    def _load(self) -> None:
+        """Open the on-disk segment if it exists and matches this version."""
+        self._loaded = True
+        try:
+            with open(os.path.join(self.directory, "files.json")) as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_VERSION or meta.get("root") != self.workspace.root:
+                return
+            trigrams = np.load(os.path.join(self.directory, "trigrams.npy"), mmap_mode="r")
+            offsets = np.load(os.path.join(self.directory, "offsets.npy"), mmap_mode="r")
+            postings = np.load(os.path.join(self.directory, "postings.npy"), mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.debug("No usable search index in %s: %s", self.directory, e)
+            return
+
+        self._trigrams, self._offsets, self._postings = trigrams, offsets, postings
+        # Indexed documents come first in files.json, in doc-id order.
+        self._paths = [path for path, _, _, doc in meta["files"] if doc >= 0]
+        self._stamps = {path: (mtime, size, doc) for path, mtime, size, doc in meta["files"]}
+        self._segment_docs = len(self._paths)
+
+    def refresh(self, files: frozenset[str]) -> None:
+        """Re-index ``files`` (a workspace snapshot) added or changed since the last refresh."""
+        if not self._loaded:
+            self._load()
+
+        for path in set(self._stamps) - files:
+            self._forget(path)
+
+        changed: list[tuple[str, int, int]] = []
+        for path in files:
+            try:
+                st = os.stat(os.path.join(self.workspace.root, path))
+            except OSError:
+                continue
+            stamp = self._stamps.get(path)
+            if stamp is None or stamp[:2] != (st.st_mtime_ns, st.st_size):
+                changed.append((path, st.st_mtime_ns, st.st_size))
+        if changed:
+            self._index(changed)
+
+        live = len(self._paths) - len(self._dead)
+        if len(self._delta) > max(COMPACT_MIN_DOCS, COMPACT_RATIO * live) or (
+            changed and not len(self._trigrams)
+        ):
+            self._compact()
+
+    def _forget(self, path: str) -> None:
+        stamp = self._stamps.pop(path, None)
+        if stamp is not None and stamp[2] >= 0:
+            self._dead.add(stamp[2])
+
+    def _index(self, changed: list[tuple[str, int, int]]) -> None:
+        paths = [os.path.join(self.workspace.root, path) for path, _, _ in changed]
+        if len(paths) > PARALLEL_SCAN_THRESHOLD:
+            executor = get_search_executor()
+            batches = _chunks(paths, (os.cpu_count() or 1) * 4)
+            results = [
+                result
+                for batch in executor.map(
+                    _trigram_batch, batches, [self.max_file_bytes] * len(batches)
+                )
+                for result in batch
+            ]
+        else:
+            results = _trigram_batch(paths, self.max_file_bytes)
+
+        for (path, mtime, size), trigrams in zip(changed, results):
+            self._forget(path)
+            if isinstance(trigrams, int):
+                self._stamps[path] = (mtime, size, trigrams)
+                continue
+            doc = len(self._paths)
+            self._paths.append(path)
+            self._stamps[path] = (mtime, size, doc)
+            self._delta.append((doc, trigrams))
+        self.stats["indexed"] += len(changed)
+
+    def _compact(self) -> None:
+        """Merge segment and delta, dropping dead documents, and write it to disk."""
+        counts = np.diff(self._offsets)
+        seg_trigrams = np.repeat(np.asarray(self._trigrams), counts)
+        seg_docs = np.asarray(self._postings)
+        trigrams = np.concatenate(
+            [seg_trigrams, *(doc_trigrams for _, doc_trigrams in self._delta)]
+        ).astype(np.uint32)
+        docs = np.concatenate(
+            [seg_docs, *(np.full(len(t), doc, dtype=np.uint32) for doc, t in self._delta)]
+        ).astype(np.uint32)
+
+        # Renumber live documents densely.
+        remap = np.full(len(self._paths), -1, dtype=np.int64)
+        live = [doc for doc in range(len(self._paths)) if doc not in self._dead]
+        remap[live] = np.arange(len(live))
+        keep = remap[docs] >= 0
+        trigrams, docs = trigrams[keep], remap[docs[keep]].astype(np.uint32)
+
+        order = np.lexsort((docs, trigrams))
+        trigrams, docs = trigrams[order], docs[order]
+        unique, starts = np.unique(trigrams, return_index=True)
+        offsets = np.append(starts, len(trigrams)).astype(np.int64)
+
+        paths = [self._paths[doc] for doc in live]
+        new_doc = dict(zip(live, range(len(live))))
+        stamps = {
+            path: (mtime, size, new_doc[doc] if doc >= 0 else doc)
+            for path, (mtime, size, doc) in self._stamps.items()
+        }
+        self._trigrams, self._offsets, self._postings = unique, offsets, docs
+        self._paths, self._stamps = paths, stamps
+        self._segment_docs = len(paths)
+        self._dead.clear()
+        self._delta.clear()
+        self.stats["compactions"] += 1
+        self._save()
+
+    def _save(self) -> None:
+        """Write the segment atomically, then reopen it memory-mapped."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for name, array in (
+                ("trigrams", self._trigrams),
+                ("offsets", self._offsets),
+                ("postings", self._postings),
+            ):
+                temp = os.path.join(self.directory, f"{name}.tmp.npy")
+                np.save(temp, array)
+                os.replace(temp, os.path.join(self.directory, f"{name}.npy"))
+            meta = {
+                "version": INDEX_VERSION,
+                "root": self.workspace.root,
+                "files": [[path, *stamp] for path, stamp in self._stamps_by_doc()],
+            }
+            temp = os.path.join(self.directory, "files.tmp.json")
+            with open(temp, "w") as f:
+                json.dump(meta, f)
+            os.replace(temp, os.path.join(self.directory, "files.json"))
+        except OSError as e:
+            logger.warning("Could not persist search index to %s: %s", self.directory, e)
+            return
+
+        self._loaded = False
+        self._load()
+
+    def _stamps_by_doc(self) -> list[tuple[str, tuple[int, int, int]]]:
+        """Stamps ordered with indexed documents first, in doc-id order."""
+        indexed = [(path, self._stamps[path]) for path in self._paths]
+        others = [(path, stamp) for path, stamp in self._stamps.items() if stamp[2] < 0]
+        return indexed + others
+
+    def candidates(self, trigrams: np.ndarray) -> tuple[list[str], list[str]]:
+        """Indexed paths containing every trigram, plus unindexed (large) paths."""
+        self.stats["queries"] += 1
+        unindexed = [path for path, stamp in self._stamps.items() if stamp[2] == UNINDEXED]
+
+        if len(trigrams):
+            postings = []
+            for trigram in trigrams.tolist():
+                slot = int(np.searchsorted(self._trigrams, trigram))
+                if slot < len(self._trigrams) and self._trigrams[slot] == trigram:
+                    start, end = self._offsets[slot], self._offsets[slot + 1]
+                    postings.append(np.asarray(self._postings[start:end]))
+                else:
+                    postings.append(np.empty(0, dtype=np.uint32))
+            # Intersect the rarest lists first so the working set shrinks fastest.
+            postings.sort(key=len)
+            docs = postings[0]
+            for found in postings[1:]:
+                if not len(docs):
+                    break
+                docs = np.intersect1d(docs, found, assume_unique=True)
+            segment = docs.tolist()
+            delta = [
+                doc
+                for doc, doc_trigrams in self._delta
+                if np.isin(trigrams, doc_trigrams, assume_unique=True).all()
+            ]
+        else:
+            segment = list(range(self._segment_docs))
+            delta = [doc for doc, _ in self._delta]
+
+        indexed = [self._paths[doc] for doc in segment + delta if doc not in self._dead]
+        return indexed, unindexed
+
+    async def ensure_fresh(self) -> None:
+        """Refresh the workspace, then re-index its current snapshot off the event loop.
+
+        The workspace refresh goes through its own lock; only trigram work
+        runs in the thread, over a snapshot taken on the loop.
+        """
+        await self.workspace.ensure_fresh()
+        async with self._lock:
+            files = self.workspace.files
+            await asyncio.to_thread(self.refresh, files)
+
+    async def find(self, trigrams: np.ndarray) -> tuple[list[str], list[str]]:
+        """``candidates`` after a refresh, with no other refresh running in between."""
+        await self.workspace.ensure_fresh()
+        async with self._lock:
+            files = self.workspace.files
+            await asyncio.to_thread(self.refresh, files)
+            return self.candidates(trigrams)
+
+    def get_stats(self) -> dict[str, int]:
+        """Counters plus current size."""
+        return {
+            **self.stats,
+            "documents": len(self._paths) - len(self._dead),
+            "trigrams": len(self._trigrams),
+            "delta_documents": len(self._delta),
+        }
+
+
+_indexes: dict[str, TrigramIndex] = {}
+
+
+def get_trigram_index(workspace: WorkspaceIndex) -> TrigramIndex:
+    """Shared trigram index for a workspace index."""
+    index = _indexes.get(workspace.root)
+    if index is None or index.workspace is not workspace:
+        index = _indexes[workspace.root] = TrigramIndex(workspace)
+    return index
+
+
+class SearchResults(NamedTuple):
+    """Ranked results of a content search."""
+
+    files: list[FileMatches]
+    total_matches: int
+    files_scanned: int
+    truncated: bool
+
+
+async def search_content(
+    query: str,
+    path: str = ".",
+    regex: bool = False,
+    include: str | None = None,
+    case_sensitive: bool | None = None,
+    context: int | None = None,
+    max_matches: int | None = None,
+) -> SearchResults:
+    """Search file contents under ``path``; results are ranked and bounded.
+
+    Case sensitivity defaults to smart case: insensitive unless the query
+    has an uppercase letter.
+    """
+    context = settings.content_search_context_lines if context is None else context
+    max_matches = max_matches or settings.content_search_max_matches
+    if case_sensitive is None:
+        case_sensitive = query != query.lower()
+    pattern = query if regex else re.escape(query)
+    flags = 0 if case_sensitive else re.IGNORECASE
+    re.compile(pattern, flags)
+
+    workspace, base = get_workspace_index(path)
+    literals = required_literals(query) if regex else [query]
+    if settings.content_search_index:
+        trigram_index = get_trigram_index(workspace)
+        indexed, unindexed = await trigram_index.find(literal_trigrams(literals, case_sensitive))
+        paths = indexed + unindexed
+    else:
+        await workspace.ensure_fresh()
+        paths = list(workspace.files)
+
+    if base:
+        paths = [p for p in paths if p.startswith(base + "/")]
+    if include:
+        allowed = set(workspace.glob(include, base))
+        paths = [p for p in paths if p in allowed]
+
+    root = workspace.root
+    needle = query if not regex or literals == [query] else None
+    items = [(os.path.join(root, p), os.path.relpath(p, base or ".")) for p in sorted(paths)]
+    files = await _scan(items, pattern, flags, context, needle)
+
+    files.sort(key=lambda found: (-found.score, found.path))
+    total = sum(found.total for found in files)
+    kept: list[FileMatches] = []
+    budget = max_matches
+    for found in files:
+        if budget <= 0:
+            break
+        kept.append(found._replace(matches=found.matches[:budget]))
+        budget -= len(kept[-1].matches)
+    shown = sum(len(found.matches) for found in kept)
+    return SearchResults(kept, total, len(items), shown < total)
+
+
+async def _scan(
+    items: list[tuple[str, str]],
+    pattern: str,
+    flags: int,
+    context: int,
+    needle: str | None,
+) -> list[FileMatches]:
+    """Scan candidates in a thread, or across the process pool when there are many."""
+    if len(items) <= PARALLEL_SCAN_THRESHOLD:
+        return await asyncio.to_thread(scan_files, items, pattern, flags, context, needle)
+
+    loop = asyncio.get_running_loop()
+    executor = get_search_executor()
+    batches = _chunks(items, (os.cpu_count() or 1) * 4)
+    results = await asyncio.gather(
+        *(
+            loop.run_in_executor(executor, scan_files, batch, pattern, flags, context, needle)
+            for batch in batches
+        )
+    )
+    return [found for batch in results for found in batch]
+
+
+def format_results(results: SearchResults) -> str:
+    """Grep-style listing: ``path:line: text`` for matches, ``path-line- text`` for context.
+
+    Overlapping context is merged and gaps between groups are marked ``--``.
+    """
+    blocks = []
+    for found in results.files:
+        shown: dict[int, tuple[str, str]] = {}
+        for match in found.matches:
+            first = match.line - len(match.before)
+            for number, text in enumerate(match.before, first):
+                shown.setdefault(number, ("-", text))
+            for number, text in enumerate(match.after, match.line + 1):
+                shown.setdefault(number, ("-", text))
+            shown[match.line] = (":", match.text)
+
+        lines: list[str] = []
+        previous = None
+        for number in sorted(shown):
+            if previous is not None and number > previous + 1:
+                lines.append("--")
+            mark, text = shown[number]
+            lines.append(f"{found.path}{mark}{number}{mark} {text}")
+            previous = number
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
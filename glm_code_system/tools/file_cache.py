@@ -0,0 +1,247 @@
+"""Shared, stat-validated cache of file contents for the file tools."""
+
+import asyncio
+import mmap
+import os
+from collections import OrderedDict
+from typing import NamedTuple
+
+from config.settings import settings
+
+# Sparse line index granularity for large files.
+LINE_CHECKPOINT = 1024
+
+
+class FileStamp(NamedTuple):
+    """Identity of one version of a file."""
+
+    device: int
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def of(cls, path: str) -> "FileStamp":
+        st = os.stat(path)
+        return cls(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class LineWindow(NamedTuple):
+    """Lines ``start``..``end`` (1-based, inclusive) of a file."""
+
+    text: str
+    start: int
+    end: int
+    total_lines: int | None
+
+
+def _translate_newlines(text: str) -> str:
+    """Universal newlines, as text-mode ``open`` would return."""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _line_starts(data: bytes) -> list[int]:
+    """Byte offset of the start of every line."""
+    starts = [0]
+    index = data.find(b"\n")
+    while index >= 0:
+        starts.append(index + 1)
+        index = data.find(b"\n", index + 1)
+    if starts[-1] == len(data) and len(starts) > 1:
+        starts.pop()
+    return starts
+
+
+class _Entry:
+    """A cached file version."""
+
+    __slots__ = ("stamp", "data", "text", "line_starts", "checkpoints")
+
+    def __init__(self, stamp: FileStamp, data: bytes | None) -> None:
+        self.stamp = stamp
+        self.data = data
+        self.text: str | None = None
+        self.line_starts: list[int] | None = None
+        # For large files: byte offset of every LINE_CHECKPOINT-th line seen so far.
+        self.checkpoints: list[int] = [0]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) if self.data is not None else 0
+
+
+class FileCache:
+    """Byte-budgeted LRU of file contents keyed by real path.
+
+    Every lookup stats the file and reuses the cached copy only if device,
+    inode, size and mtime all match, so edits made outside the tools are
+    picked up. Files larger than ``mmap_threshold`` are never held in
+    memory; line windows into them are served from a memory map with a
+    sparse line index, so reading lines 400-500 of a 50MB log touches only
+    the pages it needs.
+    """
+
+    def __init__(self, max_bytes: int | None = None, mmap_threshold: int | None = None) -> None:
+        """Initialize file cache."""
+        self.max_bytes = max_bytes or settings.file_cache_max_bytes
+        self.mmap_threshold = mmap_threshold or settings.file_cache_mmap_threshold
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self.stats: dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _lookup(self, path: str) -> tuple[str, FileStamp, _Entry | None]:
+        key = os.path.realpath(path)
+        stamp = FileStamp.of(key)
+        entry = self._entries.get(key)
+        if entry is not None and entry.stamp == stamp:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return key, stamp, entry
+
+        if entry is not None:
+            self._drop(key)
+        self.stats["misses"] += 1
+        return key, stamp, None
+
+    async def _load(self, key: str, stamp: FileStamp) -> _Entry:
+        """Read a file in one thread hop and cache it if it fits."""
+        if stamp.size > self.mmap_threshold:
+            entry = _Entry(stamp, None)
+        else:
+            entry = _Entry(stamp, await asyncio.to_thread(_read_bytes, key))
+        self._store(key, entry)
+        return entry
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        if entry.nbytes > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    async def _entry(self, path: str) -> _Entry:
+        key, stamp, entry = self._lookup(path)
+        if entry is None:
+            entry = await self._load(key, stamp)
+        return entry
+
+    async def read(self, path: str) -> str:
+        """Whole file as text."""
+        entry = await self._entry(path)
+        if entry.data is None:
+            data = await asyncio.to_thread(_read_bytes, os.path.realpath(path))
+            return _translate_newlines(data.decode("utf-8"))
+
+        if entry.text is None:
+            entry.text = _translate_newlines(entry.data.decode("utf-8"))
+        return entry.text
+
+    async def read_bytes(self, path: str) -> bytes:
+        """Whole file as raw bytes."""
+        entry = await self._entry(path)
+        if entry.data is None:
+            return await asyncio.to_thread(_read_bytes, os.path.realpath(path))
+        return entry.data
+
+    async def read_lines(self, path: str, start: int, end: int | None = None) -> LineWindow:
+        """Lines ``start``..``end`` (1-based, inclusive; ``end=None`` reads to EOF)."""
+        start = max(start, 1)
+        entry = await self._entry(path)
+
+        if entry.data is not None:
+            if entry.line_starts is None:
+                entry.line_starts = _line_starts(entry.data)
+            starts = entry.line_starts
+            total = len(starts) if entry.data else 0
+            last = total if end is None else min(end, total)
+            if start > last:
+                return LineWindow("", start, start - 1, total)
+            stop = starts[last] if last < total else len(entry.data)
+            chunk = entry.data[starts[start - 1] : stop]
+            return LineWindow(_translate_newlines(chunk.decode("utf-8")), start, last, total)
+
+        return await asyncio.to_thread(_mapped_window, os.path.realpath(path), entry, start, end)
+
+    def invalidate(self, path: str) -> None:
+        """Forget a file, e.g. after the tools wrote to it."""
+        key = os.path.realpath(path)
+        if key in self._entries:
+            self._drop(key)
+            self.stats["invalidations"] += 1
+
+    def put(self, path: str, data: bytes) -> None:
+        """Cache content just written to ``path``, stamped with its new stat."""
+        key = os.path.realpath(path)
+        self._drop(key)
+        if len(data) <= self.mmap_threshold:
+            self._store(key, _Entry(FileStamp.of(key), data))
+
+    def clear(self) -> None:
+        """Drop everything."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_stats(self) -> dict[str, int]:
+        """Counters plus current size."""
+        return {**self.stats, "entries": len(self._entries), "bytes": self._bytes}
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _mapped_window(path: str, entry: _Entry, start: int, end: int | None) -> LineWindow:
+    """Line window of a large file via mmap, extending its sparse line index."""
+    with open(path, "rb") as f:
+        if entry.stamp.size == 0:
+            return LineWindow("", start, start - 1, 0)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+
+            # Jump to the nearest known checkpoint at or before the start line.
+            slot = min((start - 1) // LINE_CHECKPOINT, len(entry.checkpoints) - 1)
+            line = slot * LINE_CHECKPOINT + 1
+            offset = entry.checkpoints[slot]
+
+            def advance(offset: int, line: int) -> int:
+                index = mm.find(b"\n", offset)
+                next_offset = size if index < 0 else index + 1
+                checkpoint, remainder = divmod(line, LINE_CHECKPOINT)
+                if not remainder and checkpoint == len(entry.checkpoints):
+                    entry.checkpoints.append(next_offset)
+                return next_offset
+
+            while line < start and offset < size:
+                offset = advance(offset, line)
+                line += 1
+            if offset >= size:
+                return LineWindow("", start, start - 1, line - 1)
+
+            begin, first = offset, line
+            while (end is None or line <= end) and offset < size:
+                offset = advance(offset, line)
+                line += 1
+
+            text = _translate_newlines(mm[begin:offset].decode("utf-8"))
+            total = line - 1 if offset >= size else None
+            return LineWindow(text, first, line - 1, total)
+
+
+_shared_cache: FileCache | None = None
+
+
+def get_shared_file_cache() -> FileCache:
+    """Process-wide file cache shared by the file tools."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = FileCache()
+    return _shared_cache
@@ -0,0 +1,232 @@
+"""Atomic, transactional file writes for WriteFileTool."""
+
+import asyncio
+import difflib
+import os
+import secrets
+import stat
+from typing import Any, NamedTuple
+
+from glm_code_system.tools.file_cache import get_shared_file_cache
+from glm_code_system.tools.patch import Hunk, PatchError, apply_hunks, parse_patch
+
+MAX_DIFF_STAT_LINES = 20000
+
+
+class FileChange(NamedTuple):
+    """New content for one file, given in full or as diff hunks."""
+
+    path: str
+    content: str | None = None
+    hunks: list[Hunk] | None = None
+    create: bool = False
+    delete: bool = False
+
+
+class WriteOutcome(NamedTuple):
+    """What a batch did to one file."""
+
+    path: str
+    status: str
+    added: int
+    removed: int
+
+
+def build_changes(
+    path: str | None = None,
+    content: str | None = None,
+    diff: str | None = None,
+    files: list[dict[str, Any]] | None = None,
+) -> list[FileChange]:
+    """Changes described by WriteFileTool arguments.
+
+    ``diff`` may be hunks for ``path`` or a multi-file unified diff whose
+    ``---``/``+++`` headers name the files (``/dev/null`` creates or
+    deletes). ``files`` is a list of ``{"path", "content" | "diff"}``.
+    """
+    if files:
+        changes = []
+        for item in files:
+            changes.extend(build_changes(item.get("path"), item.get("content"), item.get("diff")))
+        return changes
+
+    if diff is not None:
+        patches = parse_patch(diff)
+        changes = []
+        for patch in patches:
+            headerless = patch.old_path is None and patch.new_path is None
+            if path is not None and len(patches) == 1:
+                target = path
+            elif headerless:
+                raise PatchError("A diff without ---/+++ headers needs a path")
+            else:
+                target = patch.path
+            changes.append(
+                FileChange(
+                    target,
+                    hunks=patch.hunks,
+                    create=not headerless and patch.old_path is None,
+                    delete=not headerless and patch.new_path is None,
+                )
+            )
+        return changes
+
+    if path is None or content is None:
+        raise ValueError("write_file needs a path with content or diff, a diff, or files")
+    return [FileChange(path, content=content)]
+
+
+def _patched(original: bytes | None, change: FileChange) -> bytes:
+    """Apply a change's hunks, keeping the file's CRLF line endings if it had them."""
+    if original is None and not change.create:
+        raise FileNotFoundError(f"Cannot patch missing file: {change.path}")
+    if original is not None and change.create:
+        raise FileExistsError(f"Cannot create file that exists: {change.path}")
+    text = (original or b"").decode("utf-8")
+    crlf = "\r\n" in text
+    if crlf:
+        text = text.replace("\r\n", "\n")
+    text = apply_hunks(text, change.hunks or [])
+    if crlf:
+        text = text.replace("\n", "\r\n")
+    return text.encode("utf-8")
+
+
+def _line_delta(old: bytes | None, new: bytes | None) -> tuple[int, int]:
+    """(added, removed) line counts for reporting; whole-file counts for huge files."""
+    old_lines = old.decode("utf-8", errors="replace").splitlines() if old else []
+    new_lines = new.decode("utf-8", errors="replace").splitlines() if new else []
+    if len(old_lines) + len(new_lines) > MAX_DIFF_STAT_LINES:
+        return len(new_lines), len(old_lines)
+    added = removed = 0
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            removed += i2 - i1
+            added += j2 - j1
+    return added, removed
+
+
+def _stage(path: str, data: bytes) -> str:
+    """Write ``data`` to a fsynced temp file beside ``path``; returns its name.
+
+    The temp file takes the target's permission bits, or the umask default
+    for new files.
+    """
+    directory = os.path.dirname(path)
+    temp = os.path.join(directory, f".{os.path.basename(path)}.{secrets.token_hex(4)}.tmp")
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(temp, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+    except BaseException:
+        os.unlink(temp)
+        raise
+    return temp
+
+
+def _sync_directories(paths: list[str]) -> None:
+    """Make renames durable by fsyncing the directories that hold them."""
+    if os.name != "posix":
+        return
+    for directory in {os.path.dirname(path) for path in paths}:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _commit(plan: list[tuple[str, bytes | None, bytes | None]]) -> None:
+    """Replace every file or none: stage all, rename all, roll back on failure."""
+    staged: list[tuple[str, bytes | None, str | None]] = []
+    try:
+        for path, original, new in plan:
+            if new is not None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            staged.append((path, original, _stage(path, new) if new is not None else None))
+    except BaseException:
+        for _, _, temp in staged:
+            if temp is not None:
+                os.unlink(temp)
+        raise
+
+    done: list[tuple[str, bytes | None]] = []
+    try:
+        for path, original, temp in staged:
+            if temp is None:
+                os.unlink(path)
+            else:
+                os.replace(temp, path)
+            done.append((path, original))
+        _sync_directories([path for path, _, _ in staged])
+    except BaseException:
+        for path, original in reversed(done):
+            if original is None:
+                os.unlink(path)
+            else:
+                os.replace(_stage(path, original), path)
+        for path, _, temp in staged[len(done) :]:
+            if temp is not None and os.path.exists(temp):
+                os.unlink(temp)
+        raise
+
+
+async def write_files(changes: list[FileChange]) -> list[WriteOutcome]:
+    """Apply changes as one transaction.
+
+    New content is computed in memory first (diffs against the shared file
+    cache), so a hunk that does not apply aborts the batch before anything
+    is touched. Files whose bytes would not change are left alone; the
+    rest are written to fsynced temp files and renamed into place, and if
+    any rename fails the files already replaced are restored.
+    """
+    cache = get_shared_file_cache()
+    originals: dict[str, bytes | None] = {}
+    current: dict[str, bytes | None] = {}
+    names: dict[str, str] = {}
+
+    for change in changes:
+        # Writing through a symlink updates its target rather than replacing the link.
+        real = os.path.realpath(change.path)
+        if real not in originals:
+            originals[real] = await cache.read_bytes(real) if os.path.isfile(real) else None
+            current[real] = originals[real]
+            names[real] = change.path
+
+        if change.delete:
+            if current[real] is None:
+                raise FileNotFoundError(f"Cannot delete missing file: {change.path}")
+            # A delete diff must remove exactly what the file holds.
+            if change.hunks and _patched(current[real], change).strip():
+                raise PatchError(f"Delete diff does not match the whole file: {change.path}")
+            current[real] = None
+        elif change.hunks is not None:
+            current[real] = _patched(current[real], change)
+        else:
+            current[real] = (change.content or "").encode("utf-8")
+
+    plan = [(path, originals[path], current[path]) for path in names]
+    changed = [item for item in plan if item[1] != item[2]]
+    if changed:
+        await asyncio.to_thread(_commit, changed)
+
+    outcomes = []
+    for path, original, new in plan:
+        if original == new:
+            outcomes.append(WriteOutcome(names[path], "unchanged", 0, 0))
+            continue
+        if new is None:
+            cache.invalidate(path)
+            status = "deleted"
+        else:
+            cache.put(path, new)
+            status = "created" if original is None else "written"
+        outcomes.append(WriteOutcome(names[path], status, *_line_delta(original, new)))
+    return outcomes
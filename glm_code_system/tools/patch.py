@@ -0,0 +1,199 @@
+"""Unified diff parsing and in-memory application."""
+
+import re
+from typing import NamedTuple
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+DEV_NULL = "/dev/null"
+
+
+class PatchError(ValueError):
+    """A diff is malformed or does not apply to the current file."""
+
+
+class Hunk(NamedTuple):
+    """One ``@@`` block: the lines it expects and the lines replacing them."""
+
+    start: int | None
+    old: list[str]
+    new: list[str]
+
+
+class FilePatch(NamedTuple):
+    """Hunks for one file of a (possibly multi-file) diff."""
+
+    old_path: str | None
+    new_path: str | None
+    hunks: list[Hunk]
+
+    @property
+    def path(self) -> str:
+        """The file this patch writes to (or deletes)."""
+        return self.new_path if self.new_path is not None else self.old_path or ""
+
+
+def _header_path(line: str) -> str | None:
+    """Path from a ``---``/``+++`` line, without ``a/``/``b/`` prefixes or timestamps."""
+    path = line[4:].split("\t", 1)[0].strip()
+    if path == DEV_NULL:
+        return None
+    if path[:2] in ("a/", "b/"):
+        path = path[2:]
+    return path
+
+
+def parse_hunks(lines: list[str]) -> list[Hunk]:
+    """Hunks from diff body lines (file headers already removed).
+
+    ``@@`` headers without line numbers are accepted; such hunks are
+    located by content alone.
+    """
+    hunks: list[Hunk] = []
+    start: int | None = None
+    old: list[str] = []
+    new: list[str] = []
+    in_hunk = False
+    line_kind = " "
+
+    def close() -> None:
+        if in_hunk and (old or new):
+            hunks.append(Hunk(start, list(old), list(new)))
+
+    for line in lines:
+        if line.startswith("@@"):
+            close()
+            match = _HUNK_HEADER.match(line)
+            start = int(match.group(1)) if match else None
+            old.clear()
+            new.clear()
+            in_hunk = True
+        elif not in_hunk:
+            continue
+        elif line.startswith("\\"):
+            # "\ No newline at end of file" applies to the previous line.
+            target = new if line_kind == "+" else old if line_kind == "-" else None
+            for side in (target,) if target is not None else (old, new):
+                if side and side[-1].endswith("\n"):
+                    side[-1] = side[-1][:-1]
+        elif line[:1] in (" ", "-", "+") or line == "\n":
+            # A bare newline is an unchanged blank line whose space was stripped.
+            line_kind = line[:1] if line != "\n" else " "
+            text = line[1:] if line != "\n" else line
+            if line_kind != "+":
+                old.append(text)
+            if line_kind != "-":
+                new.append(text)
+        else:
+            # Anything else (``diff --git``, ``index ...``) ends the hunk.
+            close()
+            old.clear()
+            new.clear()
+            in_hunk = False
+    close()
+    return hunks
+
+
+def parse_patch(diff: str) -> list[FilePatch]:
+    """Split a unified diff into per-file patches.
+
+    A diff with no ``---``/``+++`` headers yields one patch whose paths are
+    None, for the caller to apply to a file it names itself.
+    """
+    lines = diff.splitlines(keepends=True)
+    lines = [line if line.endswith("\n") else line + "\n" for line in lines]
+    patches: list[FilePatch] = []
+    body: list[str] = []
+    old_path: str | None = None
+    new_path: str | None = None
+
+    def close() -> None:
+        # Preambles such as ``diff --git``/``index`` lines carry no hunks.
+        hunks = parse_hunks(body)
+        if hunks:
+            patches.append(FilePatch(old_path, new_path, hunks))
+
+    def is_header(i: int) -> bool:
+        following = lines[i + 1] if i + 1 < len(lines) else ""
+        return lines[i].startswith("--- ") and following.startswith("+++ ")
+
+    # Lines still owed to the current hunk by its header counts. Inside a hunk a
+    # "--- "/"+++ " pair is a removal and an addition, unless a hunk header
+    # follows it (generated diffs often get their counts wrong).
+    old_left = new_left = 0
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if old_left > 0 or new_left > 0:
+            kind = " " if line == "\n" else line[:1]
+            next_file = is_header(i) and "".join(lines[i + 2 : i + 3]).startswith("@@")
+            if kind in (" ", "-", "+", "\\") and not next_file:
+                old_left -= kind in (" ", "-")
+                new_left -= kind in (" ", "+")
+                body.append(line)
+                i += 1
+                continue
+            # Shorter than its header claims; let parse_hunks end it.
+            old_left = new_left = 0
+        if is_header(i):
+            close()
+            old_path = _header_path(lines[i].rstrip("\n"))
+            new_path = _header_path(lines[i + 1].rstrip("\n"))
+            body = []
+            i += 2
+            continue
+        header = _HUNK_HEADER.match(line)
+        if header:
+            old_left = 1 if header.group(2) is None else int(header.group(2))
+            new_left = 1 if header.group(4) is None else int(header.group(4))
+        body.append(line)
+        i += 1
+    close()
+
+    if not patches:
+        raise PatchError("Diff contains no hunks")
+    return patches
+
+
+def _find(lines: list[str], old: list[str], expected: int, floor: int) -> int | None:
+    """Index where ``old`` occurs at or after ``floor``, nearest to ``expected``."""
+    if not old:
+        return min(max(expected, floor), len(lines))
+    last = len(lines) - len(old)
+    best: int | None = None
+    for index in range(floor, last + 1):
+        if lines[index] == old[0] and lines[index : index + len(old)] == old:
+            if best is None or abs(index - expected) < abs(best - expected):
+                best = index
+            elif index > expected:
+                break
+    return best
+
+
+def _loosely(lines: list[str]) -> list[str]:
+    return [line.rstrip() for line in lines]
+
+
+def apply_hunks(text: str, hunks: list[Hunk]) -> str:
+    """Apply hunks to ``text`` (``\\n`` line endings).
+
+    Each hunk is matched by its context and removed lines, at the stated
+    line if possible, else at the nearest occurrence after the previous
+    hunk. If no exact match exists, trailing whitespace is ignored. Raises
+    PatchError if a hunk cannot be placed.
+    """
+    lines = text.splitlines(keepends=True)
+    floor = 0
+    offset = 0
+    for number, hunk in enumerate(hunks, 1):
+        expected = hunk.start - 1 + offset if hunk.start else floor
+        index = _find(lines, hunk.old, expected, floor)
+        if index is None:
+            loose = _find(_loosely(lines), _loosely(hunk.old), expected, floor)
+            if loose is None:
+                preview = "".join(hunk.old[:3]).rstrip()
+                raise PatchError(f"Hunk {number} does not apply; expected:\n{preview}")
+            index = loose
+        lines[index : index + len(hunk.old)] = hunk.new
+        floor = index + len(hunk.new)
+        offset += len(hunk.new) - len(hunk.old)
+    return "".join(lines)
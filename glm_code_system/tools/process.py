@@ -0,0 +1,250 @@
+"""Subprocess execution with streaming output, timeouts and resource limits."""
+
+import asyncio
+import codecs
+import os
+import signal
+import time
+from typing import Any, AsyncIterator, Callable, NamedTuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
+
+from config.settings import settings
+
+KILL_GRACE_PERIOD = 2.0
+READ_CHUNK_SIZE = 65536
+
+
+class OutputChunk(NamedTuple):
+    """Decoded output from one stream, in arrival order."""
+
+    stream: str
+    text: str
+
+
+class OutputBuffer:
+    """Keeps the first and last bytes of an output stream within ``limit``.
+
+    Half the budget holds the head, half a rolling tail; whatever falls
+    between is dropped and reported as a marker in :meth:`getvalue`.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """Initialize output buffer."""
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self._head = bytearray()
+        self._tail = bytearray()
+        self.total = 0
+
+    @property
+    def dropped(self) -> int:
+        """Bytes discarded from the middle of the stream."""
+        return self.total - len(self._head) - len(self._tail)
+
+    def write(self, data: bytes) -> None:
+        """Append output."""
+        self.total += len(data)
+        room = self.head_limit - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+
+        if data:
+            self._tail += data
+            excess = len(self._tail) - self.tail_limit
+            if excess > 0:
+                del self._tail[:excess]
+
+    def getvalue(self) -> str:
+        """Retained output, with a marker where bytes were dropped."""
+        head = self._head.decode("utf-8", errors="replace")
+        tail = self._tail.decode("utf-8", errors="replace")
+        if self.dropped:
+            return f"{head}\n... [{self.dropped} bytes truncated] ...\n{tail}"
+        return head + tail
+
+
+def resource_limiter(cpu_seconds: int, memory_mb: int) -> Callable[[], None] | None:
+    """A ``preexec_fn`` applying CPU time and address-space limits, or None."""
+    if resource is None or (cpu_seconds <= 0 and memory_mb <= 0):
+        return None
+
+    def apply_limits() -> None:
+        if cpu_seconds > 0:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if memory_mb > 0:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    return apply_limits
+
+
+class ProcessRun:
+    """A shell command running in its own process group.
+
+    Iterate to receive :class:`OutputChunk` items as output arrives, or
+    ``await wait()`` to just collect it. The hard ``timeout`` bounds total
+    run time and ``idle_timeout`` the gap between outputs; either kills the
+    whole process group (SIGTERM, then SIGKILL after a grace period).
+    Retained output is capped per stream by ``max_output_bytes``. ``env``
+    entries are added to the inherited environment.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        cwd: str | None = None,
+        env: dict[str, str] | None = None,
+        timeout: float | None = None,
+        idle_timeout: float | None = None,
+        max_output_bytes: int | None = None,
+        cpu_seconds: int | None = None,
+        memory_mb: int | None = None,
+    ) -> None:
+        """Initialize process run; the process starts on first iteration."""
+        self.command = command
+        self.cwd = cwd
+        self.env = env
+        self.timeout = settings.bash_timeout if timeout is None else timeout
+        self.idle_timeout = settings.bash_idle_timeout if idle_timeout is None else idle_timeout
+        limit = max_output_bytes or settings.bash_max_output_bytes
+        self.cpu_seconds = settings.bash_cpu_time_limit if cpu_seconds is None else cpu_seconds
+        self.memory_mb = settings.bash_memory_limit_mb if memory_mb is None else memory_mb
+
+        self.stdout = OutputBuffer(limit)
+        self.stderr = OutputBuffer(limit)
+        self.returncode: int | None = None
+        self.timed_out: str | None = None
+        self.duration = 0.0
+        self._process: asyncio.subprocess.Process | None = None
+        self._started = False
+
+    async def _start(self) -> tuple[asyncio.StreamReader | None, asyncio.StreamReader | None]:
+        """Start the shell in a new session so it can be killed as a group.
+
+        Returns the stdout and stderr streams to read.
+        """
+        kwargs: dict[str, Any] = {}
+        if os.name == "posix":
+            kwargs["start_new_session"] = True
+            preexec_fn = resource_limiter(self.cpu_seconds, self.memory_mb)
+            if preexec_fn is not None:
+                kwargs["preexec_fn"] = preexec_fn
+
+        self._process = await asyncio.create_subprocess_shell(
+            self.command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+            env={**os.environ, **self.env} if self.env else None,
+            **kwargs,
+        )
+        return self._process.stdout, self._process.stderr
+
+    async def _finish(self) -> int | None:
+        """Exit status once both streams have ended."""
+        return await self._process.wait()
+
+    async def __aiter__(self) -> AsyncIterator[OutputChunk]:
+        if self._started:
+            raise RuntimeError("Process output can only be consumed once")
+        self._started = True
+
+        started = time.monotonic()
+        stdout, stderr = await self._start()
+        queue: asyncio.Queue[tuple[str, bytes]] = asyncio.Queue()
+        readers = [
+            asyncio.ensure_future(self._pump("stdout", stdout, queue)),
+            asyncio.ensure_future(self._pump("stderr", stderr, queue)),
+        ]
+        decoders = {
+            name: codecs.getincrementaldecoder("utf-8")(errors="replace")
+            for name in ("stdout", "stderr")
+        }
+        buffers = {"stdout": self.stdout, "stderr": self.stderr}
+        open_streams = 2
+
+        try:
+            while open_streams:
+                wait = self._next_wait(started)
+                try:
+                    name, data = await asyncio.wait_for(queue.get(), wait)
+                except asyncio.TimeoutError:
+                    elapsed = time.monotonic() - started
+                    self.timed_out = "hard" if self.timeout and elapsed >= self.timeout else "idle"
+                    await self._kill()
+                    break
+
+                if not data:
+                    open_streams -= 1
+                    text = decoders[name].decode(b"", final=True)
+                else:
+                    buffers[name].write(data)
+                    text = decoders[name].decode(data)
+                if text:
+                    yield OutputChunk(name, text)
+
+            if not self.timed_out:
+                self.returncode = await self._finish()
+        finally:
+            if self.returncode is None:
+                await self._kill()
+            for reader in readers:
+                reader.cancel()
+            self.duration = time.monotonic() - started
+
+    def _next_wait(self, started: float) -> float | None:
+        """Seconds until the nearest deadline, or None without timeouts."""
+        waits = []
+        if self.timeout:
+            waits.append(max(self.timeout - (time.monotonic() - started), 0.0))
+        if self.idle_timeout:
+            waits.append(self.idle_timeout)
+        return min(waits) if waits else None
+
+    async def _pump(
+        self,
+        name: str,
+        stream: asyncio.StreamReader | None,
+        queue: "asyncio.Queue[tuple[str, bytes]]",
+    ) -> None:
+        """Forward a pipe to the queue; an empty chunk marks end of stream."""
+        if stream is not None:
+            while data := await stream.read(READ_CHUNK_SIZE):
+                await queue.put((name, data))
+        await queue.put((name, b""))
+
+    async def _kill(self) -> None:
+        """Terminate the process group, escalating to SIGKILL."""
+        process = self._process
+        if process is None or process.returncode is not None:
+            return
+
+        self._signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), KILL_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            self._signal(signal.SIGKILL)
+            await process.wait()
+        self.returncode = process.returncode
+
+    def _signal(self, sig: int) -> None:
+        process = self._process
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, sig)
+            else:  # pragma: no cover
+                process.send_signal(sig)
+        except ProcessLookupError:
+            pass
+
+    async def wait(self) -> int | None:
+        """Run to completion, discarding streamed chunks."""
+        async for _ in self:
+            pass
+        return self.returncode
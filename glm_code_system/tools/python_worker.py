@@ -0,0 +1,106 @@
+"""Warm Python worker used by the shell pool.
+
+Runs as a standalone script (stdlib only). Modules named on the command
+line are imported once at startup. Each request is one JSON line on stdin:
+``{"token": ..., "argv": [...], "cwd": ..., "env": {...}, "cpu_seconds": ...,
+"memory_mb": ...}``, where ``argv`` is the argument list after the
+interpreter (``-c code``, ``-m module`` or a script path) and the limits
+(0 for none) are applied to the child with ``setrlimit``. The worker forks a
+child per request, so every run starts from the same preloaded state and
+cannot leak changes into later runs. The child writes to the worker's
+stdout/stderr; when it exits the worker writes ``\\n<token>:<exit code>\\n``
+to stdout and ``\\n<token>:\\n`` to stderr.
+"""
+
+import json
+import os
+import runpy
+import sys
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - non-POSIX
+    resource = None  # type: ignore[assignment]
+
+
+def apply_limits(cpu_seconds: int, memory_mb: int) -> None:
+    """CPU time and address-space limits, as ProcessRun sets for a fresh process."""
+    if resource is None:
+        return
+    if cpu_seconds > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def run_child(argv: list[str], cwd: str | None, env: dict[str, str]) -> int:
+    """Execute ``argv`` like ``python <argv>`` would; returns the exit code."""
+    if cwd:
+        os.chdir(cwd)
+    os.environ.update(env)
+
+    try:
+        if argv[:1] == ["-c"]:
+            sys.argv = ["-c", *argv[2:]]
+            sys.path.insert(0, "")
+            exec(compile(argv[1], "<string>", "exec"), {"__name__": "__main__"})
+        elif argv[:1] == ["-m"]:
+            sys.argv = [argv[1], *argv[2:]]
+            sys.path.insert(0, os.getcwd())
+            runpy.run_module(argv[1], run_name="__main__", alter_sys=True)
+        else:
+            sys.argv = list(argv)
+            sys.path.insert(0, os.path.dirname(os.path.abspath(argv[0])))
+            runpy.run_path(argv[0], run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def serve() -> None:
+    """Handle requests until stdin closes."""
+    for module in sys.argv[1:]:
+        try:
+            __import__(module)
+        except Exception:
+            pass
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        token = request["token"]
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+        if pid == 0:
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            apply_limits(request.get("cpu_seconds") or 0, request.get("memory_mb") or 0)
+            code = run_child(request["argv"], request.get("cwd"), request.get("env") or {})
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(code & 0xFF if isinstance(code, int) else 1)
+
+        _, status = os.waitpid(pid, 0)
+        code = os.waitstatus_to_exitcode(status)
+        os.write(1, f"\n{token}:{code}\n".encode())
+        os.write(2, f"\n{token}:\n".encode())
+
+
+if __name__ == "__main__":
+    serve()
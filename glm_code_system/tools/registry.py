@@ -1,11 +1,24 @@
 """Tool registry and execution system for agents."""
 
 import asyncio
-import subprocess
+import inspect
+import os
+import shlex
+import time
+import types
+import typing
+import weakref
 from abc import ABC, abstractmethod
-from typing import Any
+from contextlib import AsyncExitStack
+from typing import Any, NamedTuple
 
 from config.settings import settings
+from glm_code_system.tools.content_search import format_results, search_content
+from glm_code_system.tools.file_cache import get_shared_file_cache
+from glm_code_system.tools.file_writer import build_changes, write_files
+from glm_code_system.tools.process import ProcessRun
+from glm_code_system.tools.shell_pool import get_shared_shell_pool
+from glm_code_system.tools.workspace_index import get_workspace_index
 
 
 class ToolResult:
@@ -24,11 +37,46 @@ class ToolResult:
         self.metadata = metadata or {}
 
 
+class ToolCall(NamedTuple):
+    """A tool invocation queued for ``ToolRegistry.execute_many``."""
+
+    name: str
+    arguments: dict[str, Any]
+
+
+# Characters shlex splits out as operators: chaining, pipes, redirection and subshells.
+_SHELL_PUNCTUATION = "();<>|&"
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+def json_schema(annotation: Any) -> dict[str, Any]:
+    """JSON schema for a parameter annotation (optional types map to their inner type)."""
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        inner = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        return json_schema(inner[0]) if len(inner) == 1 else {}
+    if origin is list:
+        args = typing.get_args(annotation)
+        return {"type": "array", "items": json_schema(args[0]) if args else {}}
+    if origin is dict or annotation is dict:
+        return {"type": "object"}
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}
+    return {}
+
+
 class BaseTool(ABC):
     """Base class for all tools."""
 
     name: str
     description: str
+    # How execute_many schedules calls: "write" is serialised per resource key,
+    # "read" waits only on keys a write in the same batch holds, "process"
+    # shares a bounded pool.
+    concurrency: str = "read"
+    # Parameters of ``execute`` offered to the model; None offers them all.
+    model_parameters: tuple[str, ...] | None = None
 
     @abstractmethod
     async def execute(self, *args: Any, **kwargs: Any) -> ToolResult:
@@ -39,21 +87,72 @@ class BaseTool(ABC):
         """Check if tool is authorized to execute."""
         return True
 
+    def resource_keys(self, **kwargs: Any) -> list[str]:
+        """Resources a call uses, held exclusively while it runs if written."""
+        return []
+
+    def schema(self) -> dict[str, Any]:
+        """Function-calling schema built from the signature of ``execute``.
+
+        Only ``model_parameters`` are included when the tool sets them.
+        """
+        hints = typing.get_type_hints(self.execute)
+        properties: dict[str, Any] = {}
+        required = []
+        for name, parameter in inspect.signature(self.execute).parameters.items():
+            if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+                continue
+            if self.model_parameters is not None and name not in self.model_parameters:
+                continue
+            properties[name] = json_schema(hints.get(name, Any))
+            if parameter.default is parameter.empty:
+                required.append(name)
+
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": {"type": "object", "properties": properties, "required": required},
+            },
+        }
+
 
 class ReadFileTool(BaseTool):
     """Tool for reading file contents."""
 
     name = "read_file"
-    description = "Read contents of a file at the given path"
+    description = (
+        "Read contents of a file at the given path, optionally only lines "
+        "start_line..end_line (1-based, inclusive)"
+    )
+
+    def resource_keys(self, path: str | None = None, **kwargs: Any) -> list[str]:
+        """A read waits for writes to its file submitted before it."""
+        return [os.path.realpath(path)] if path else []
 
-    async def execute(self, path: str) -> ToolResult:
-        """Read file contents."""
+    async def execute(
+        self,
+        path: str,
+        start_line: int | None = None,
+        end_line: int | None = None,
+    ) -> ToolResult:
+        """Read file contents, or a window of lines, through the shared file cache."""
         try:
-            import aiofiles
+            cache = get_shared_file_cache()
+            if start_line is None and end_line is None:
+                return ToolResult(success=True, output=await cache.read(path))
 
-            async with aiofiles.open(path, "r") as f:
-                content = await f.read()
-            return ToolResult(success=True, output=content)
+            window = await cache.read_lines(path, start_line or 1, end_line)
+            return ToolResult(
+                success=True,
+                output=window.text,
+                metadata={
+                    "start_line": window.start,
+                    "end_line": window.end,
+                    "total_lines": window.total_lines,
+                },
+            )
         except Exception as e:
             return ToolResult(success=False, output="", error=str(e))
 
@@ -62,16 +161,62 @@ class WriteFileTool(BaseTool):
     """Tool for writing content to a file."""
 
     name = "write_file"
-    description = "Write content to a file at the given path"
-
-    async def execute(self, path: str, content: str) -> ToolResult:
-        """Write content to file."""
+    description = (
+        "Write files atomically: path+content writes a whole file, path+diff applies "
+        "unified-diff hunks to it, diff alone applies a multi-file unified diff, and "
+        "files=[{path, content|diff}] writes several files all-or-nothing. "
+        "Unchanged files are not rewritten"
+    )
+    concurrency = "write"
+
+    def resource_keys(
+        self,
+        path: str | None = None,
+        diff: str | None = None,
+        files: list[dict[str, Any]] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Writes to the same file never overlap; batches hold every file they touch."""
+        paths = [path] if path else []
+        patches = [diff] if diff is not None and not path else []
+        for item in files or []:
+            if item.get("path"):
+                paths.append(item["path"])
+            elif item.get("diff") is not None:
+                patches.append(item["diff"])
+        for patch in patches:
+            try:
+                paths.extend(change.path for change in build_changes(diff=patch))
+            except ValueError:
+                pass
+        return [os.path.realpath(p) for p in paths]
+
+    async def execute(
+        self,
+        path: str | None = None,
+        content: str | None = None,
+        diff: str | None = None,
+        files: list[dict[str, Any]] | None = None,
+    ) -> ToolResult:
+        """Write content or apply a diff, atomically, to one or more files."""
         try:
-            import aiofiles
+            outcomes = await write_files(build_changes(path, content, diff, files))
+            if path is not None and content is not None and len(outcomes) == 1:
+                if outcomes[0].status == "unchanged":
+                    output = f"{path} is unchanged"
+                else:
+                    output = f"Successfully wrote to {path}"
+            else:
+                output = "\n".join(
+                    f"{outcome.status} {outcome.path} (+{outcome.added} -{outcome.removed})"
+                    for outcome in outcomes
+                )
 
-            async with aiofiles.open(path, "w") as f:
-                await f.write(content)
-            return ToolResult(success=True, output=f"Successfully wrote to {path}")
+            metadata: dict[str, Any] = {"written": [], "unchanged": [], "deleted": []}
+            for outcome in outcomes:
+                key = {"created": "written"}.get(outcome.status, outcome.status)
+                metadata[key].append(outcome.path)
+            return ToolResult(success=True, output=output, metadata=metadata)
         except Exception as e:
             return ToolResult(success=False, output="", error=str(e))
 
@@ -81,8 +226,18 @@ class BashTool(BaseTool):
 
     name = "bash"
     description = "Execute a shell command (with safety restrictions)"
+    concurrency = "process"
+    # Time limits, working directory and environment stay under the caller's control.
+    model_parameters = ("command",)
 
-    async def execute(self, command: str) -> ToolResult:
+    async def execute(
+        self,
+        command: str,
+        timeout: float | None = None,
+        idle_timeout: float | None = None,
+        cwd: str | None = None,
+        env: dict[str, str] | None = None,
+    ) -> ToolResult:
         """Execute bash command with safety checks."""
         if not self._is_safe_command(command):
             return ToolResult(
@@ -92,56 +247,171 @@ class BashTool(BaseTool):
             )
 
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            stdout, stderr = await process.communicate()
-
-            if process.returncode == 0:
-                return ToolResult(
-                    success=True,
-                    output=stdout.decode(),
-                    metadata={"exit_code": process.returncode},
-                )
-            else:
-                return ToolResult(
-                    success=False,
-                    output=stdout.decode(),
-                    error=stderr.decode(),
-                    metadata={"exit_code": process.returncode},
-                )
+            run = self._new_run(command, timeout, idle_timeout, cwd, env)
+            await run.wait()
+            return self.result(run)
         except Exception as e:
             return ToolResult(success=False, output="", error=str(e))
 
+    def stream(
+        self,
+        command: str,
+        timeout: float | None = None,
+        idle_timeout: float | None = None,
+        cwd: str | None = None,
+        env: dict[str, str] | None = None,
+    ) -> ProcessRun:
+        """Start a command whose output is consumed with ``async for``.
+
+        Pass the finished run to :meth:`result` for the usual ToolResult.
+        """
+        if not self._is_safe_command(command):
+            raise PermissionError(f"Command not allowed: {command}")
+        return self._new_run(command, timeout, idle_timeout, cwd, env)
+
+    def _new_run(
+        self,
+        command: str,
+        timeout: float | None,
+        idle_timeout: float | None,
+        cwd: str | None,
+        env: dict[str, str] | None,
+    ) -> ProcessRun:
+        """Run on a warm pooled worker when enabled, else in a fresh process."""
+        options = {"timeout": timeout, "idle_timeout": idle_timeout, "cwd": cwd, "env": env}
+        if settings.bash_pool_enabled:
+            return get_shared_shell_pool().run(command, **options)
+        return ProcessRun(command, **options)
+
+    def result(self, run: ProcessRun) -> ToolResult:
+        """Summarise a finished run."""
+        metadata = {
+            "exit_code": run.returncode,
+            "duration": run.duration,
+            "timed_out": run.timed_out,
+            "truncated_bytes": run.stdout.dropped + run.stderr.dropped,
+        }
+        stdout, stderr = run.stdout.getvalue(), run.stderr.getvalue()
+
+        if run.timed_out:
+            limit = run.timeout if run.timed_out == "hard" else run.idle_timeout
+            reason = "timed out" if run.timed_out == "hard" else "produced no output"
+            return ToolResult(
+                success=False,
+                output=stdout,
+                error=f"Command {reason} for {limit}s and was killed\n{stderr}".rstrip(),
+                metadata=metadata,
+            )
+
+        if run.returncode == 0:
+            return ToolResult(success=True, output=stdout, metadata=metadata)
+
+        return ToolResult(success=False, output=stdout, error=stderr, metadata=metadata)
+
     def _is_safe_command(self, command: str) -> bool:
-        """Check if command is safe to execute."""
-        allowed = settings.allowed_commands_list
+        """Check that command runs one allowed program and nothing else.
+
+        Chaining, pipes, redirection, backgrounding and command substitution
+        are refused, so the allow-list covers everything the shell would run.
+        """
+        if any(marker in command for marker in ("`", "$(", "\n", "\r")):
+            return False
 
-        for allowed_cmd in allowed:
-            if command.strip().startswith(allowed_cmd):
-                return True
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=_SHELL_PUNCTUATION)
+        lexer.whitespace_split = True
+        try:
+            argv = list(lexer)
+        except ValueError:
+            return False
 
-        return False
+        if not argv or any(set(token) <= set(_SHELL_PUNCTUATION) for token in argv):
+            return False
+        return argv[0] in settings.allowed_commands_list
 
 
 class SearchFilesTool(BaseTool):
     """Tool for searching files by pattern."""
 
     name = "search_files"
-    description = "Search for files matching a pattern"
+    description = (
+        "Search for files matching a glob pattern (e.g. '*.py', 'tests/**/test_*.py'), "
+        "or by fuzzy path match with fuzzy=true"
+    )
 
-    async def execute(self, pattern: str, path: str = ".") -> ToolResult:
-        """Search for files."""
+    async def execute(
+        self,
+        pattern: str,
+        path: str = ".",
+        fuzzy: bool = False,
+        limit: int | None = None,
+    ) -> ToolResult:
+        """Search the workspace index for files."""
         try:
-            import glob
+            if not os.path.isdir(path):
+                raise NotADirectoryError(f"Not a directory: {path}")
+
+            index, base = get_workspace_index(path)
+            await index.ensure_fresh()
+            limit = limit or settings.search_max_results
+            # One extra result tells us whether the list was cut short.
+            if fuzzy:
+                found = index.fuzzy(pattern, base, limit + 1)
+            else:
+                found = index.glob(pattern, base, limit + 1)
 
-            matches = glob.glob(f"{path}/**/{pattern}", recursive=True)
+            matches = [os.path.join(path, os.path.relpath(p, base or ".")) for p in found[:limit]]
             return ToolResult(
                 success=True,
                 output="\n".join(matches),
-                metadata={"count": len(matches)},
+                metadata={"count": len(matches), "truncated": len(found) > limit},
+            )
+        except Exception as e:
+            return ToolResult(success=False, output="", error=str(e))
+
+
+class SearchContentTool(BaseTool):
+    """Tool for searching file contents."""
+
+    name = "search_content"
+    description = (
+        "Search file contents for a literal string (or a regex with regex=true), "
+        "optionally limited to files matching an include glob; returns ranked "
+        "matching lines with context"
+    )
+
+    async def execute(
+        self,
+        query: str,
+        path: str = ".",
+        regex: bool = False,
+        include: str | None = None,
+        case_sensitive: bool | None = None,
+        context: int | None = None,
+        max_matches: int | None = None,
+    ) -> ToolResult:
+        """Search file contents through the trigram index."""
+        try:
+            if not os.path.isdir(path):
+                raise NotADirectoryError(f"Not a directory: {path}")
+
+            results = await search_content(
+                query,
+                path,
+                regex=regex,
+                include=include,
+                case_sensitive=case_sensitive,
+                context=context,
+                max_matches=max_matches,
+            )
+            return ToolResult(
+                success=True,
+                output=format_results(results),
+                metadata={
+                    "files": len(results.files),
+                    "matches": results.total_matches,
+                    "files_scanned": results.files_scanned,
+                    "truncated": results.truncated,
+                },
             )
         except Exception as e:
             return ToolResult(success=False, output="", error=str(e))
@@ -153,6 +423,12 @@ class ToolRegistry:
     def __init__(self) -> None:
         """Initialize tool registry."""
         self.tools: dict[str, BaseTool] = {}
+        self._class_limits = {
+            "process": asyncio.Semaphore(settings.tool_process_concurrency),
+        }
+        self._resource_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
         self._register_default_tools()
 
     def _register_default_tools(self) -> None:
@@ -161,6 +437,7 @@ class ToolRegistry:
         self.register(WriteFileTool())
         self.register(BashTool())
         self.register(SearchFilesTool())
+        self.register(SearchContentTool())
 
     def register(self, tool: BaseTool) -> None:
         """Register a tool."""
@@ -186,6 +463,100 @@ class ToolRegistry:
 
         return await tool.execute(**kwargs)
 
+    async def execute_many(
+        self,
+        calls: list[ToolCall] | list[tuple[str, dict[str, Any]]],
+        max_concurrency: int | None = None,
+    ) -> list[ToolResult]:
+        """Execute independent tool calls concurrently.
+
+        At most ``max_concurrency`` calls run at once. Within that, "process"
+        tools share a smaller pool and "write" tools wait for other calls on
+        the same resource, so writes to one path, and reads of a path written
+        in the batch, keep their submission order.
+        Results come back in call order; each carries ``queued`` and
+        ``duration`` (seconds) in its metadata. A call that raises turns
+        into a failed result without affecting the others.
+        """
+        limit = asyncio.Semaphore(max_concurrency or settings.tool_max_concurrency)
+        # Locks are planned up front so same-resource calls queue in call order.
+        keys = [self._resource_keys(name, arguments) for name, arguments in calls]
+        written = {
+            key
+            for (name, _), call_keys in zip(calls, keys)
+            if self._concurrency(name) == "write"
+            for key in call_keys
+        }
+        plans = [
+            (name, arguments, self._locks([key for key in call_keys if key in written]))
+            for (name, arguments), call_keys in zip(calls, keys)
+        ]
+
+        return list(
+            await asyncio.gather(
+                *(self._run_call(name, arguments, locks, limit) for name, arguments, locks in plans)
+            )
+        )
+
+    async def _run_call(
+        self,
+        tool_name: str,
+        arguments: dict[str, Any],
+        locks: list[asyncio.Lock],
+        limit: asyncio.Semaphore,
+    ) -> ToolResult:
+        """Run one call of a batch once its locks and concurrency slots are free."""
+        submitted = time.perf_counter()
+        tool = self.tools.get(tool_name)
+        class_limit = self._class_limits.get(tool.concurrency) if tool is not None else None
+
+        async with AsyncExitStack() as stack:
+            for lock in locks:
+                await stack.enter_async_context(lock)
+            if class_limit is not None:
+                await stack.enter_async_context(class_limit)
+            await stack.enter_async_context(limit)
+
+            started = time.perf_counter()
+            try:
+                result = await self.execute(tool_name, **arguments)
+            except Exception as e:
+                result = ToolResult(success=False, output="", error=str(e))
+            finished = time.perf_counter()
+
+        result.metadata["queued"] = started - submitted
+        result.metadata["duration"] = finished - started
+        return result
+
+    def _concurrency(self, tool_name: str) -> str | None:
+        """How execute_many schedules the named tool, if it exists."""
+        tool = self.tools.get(tool_name)
+        return tool.concurrency if tool is not None else None
+
+    def _resource_keys(self, tool_name: str, arguments: dict[str, Any]) -> list[str]:
+        """Sorted resource keys of a call, a global order that prevents deadlock."""
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            return []
+        try:
+            return sorted(set(tool.resource_keys(**arguments)))
+        except TypeError:
+            return []
+
+    def _locks(self, keys: list[str]) -> list[asyncio.Lock]:
+        """The shared lock for each resource key."""
+        locks = []
+        for key in keys:
+            lock = self._resource_locks.get(key)
+            if lock is None:
+                lock = self._resource_locks[key] = asyncio.Lock()
+            locks.append(lock)
+        return locks
+
+    def get_tool_schemas(self) -> list[dict[str, Any]]:
+        """Function-calling schemas of all authorized tools."""
+        return [tool.schema() for tool in self.tools.values() if tool.is_authorized()]
+
     def get_tool_descriptions(self) -> list[dict[str, str]]:
         """Get descriptions of all available tools."""
         return [
@@ -0,0 +1,443 @@
+"""Pool of long-lived shell and Python workers for BashTool."""
+
+import asyncio
+import json
+import logging
+import os
+import secrets
+import shlex
+import shutil
+import signal
+import sys
+import time
+from typing import Any, Callable
+
+from config.settings import settings
+from glm_code_system.tools.process import KILL_GRACE_PERIOD, READ_CHUNK_SIZE, ProcessRun
+
+logger = logging.getLogger(__name__)
+
+PYTHON_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+HEALTH_CHECK_AFTER_IDLE = 30.0
+HEALTH_CHECK_TIMEOUT = 5.0
+
+
+def _marker_prefix_length(data: bytes, marker: bytes) -> int:
+    """Length of the longest suffix of ``data`` that is a proper prefix of ``marker``."""
+    start = max(len(data) - len(marker) + 1, 0)
+    index = data.find(marker[:1], start)
+    while index >= 0:
+        if marker.startswith(data[index:]):
+            return len(data) - index
+        index = data.find(marker[:1], index + 1)
+    return 0
+
+
+async def read_framed(
+    stream: asyncio.StreamReader,
+    marker: bytes,
+    emit: Callable[[bytes], None],
+) -> bytes | None:
+    """Pass output before ``marker`` to ``emit`` as it arrives.
+
+    Returns the bytes between the marker and the next newline, or None if
+    the stream ended first. A possible partial marker at the end of a read
+    is held back until the next read decides it.
+    """
+    pending = b""
+
+    while True:
+        data = await stream.read(READ_CHUNK_SIZE)
+        if not data:
+            if pending:
+                emit(pending)
+            return None
+
+        pending += data
+        index = pending.find(marker)
+        if index < 0:
+            keep = _marker_prefix_length(pending, marker)
+            if len(pending) > keep:
+                emit(pending[: len(pending) - keep])
+                pending = pending[len(pending) - keep :]
+            continue
+
+        if index:
+            emit(pending[:index])
+        rest = pending[index + len(marker) :]
+        while b"\n" not in rest:
+            data = await stream.read(READ_CHUNK_SIZE)
+            if not data:
+                return None
+            rest += data
+        return rest.split(b"\n", 1)[0]
+
+
+def python_argv(command: str) -> list[str] | None:
+    """Interpreter arguments for a plain ``python``/``pytest`` command, else None.
+
+    Anything that needs the shell (operators, redirection, expansion, globs,
+    env assignments) returns None.
+    """
+    if any(char in command for char in "$`*?[~"):
+        return None
+
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        argv = list(lexer)
+    except ValueError:
+        return None
+    if not argv or any(token and set(token) <= set(lexer.punctuation_chars) for token in argv):
+        return None
+
+    program = os.path.basename(argv[0])
+    if program == "pytest":
+        return ["-m", "pytest", *argv[1:]]
+    if program not in ("python", "python3") or len(argv) < 2:
+        return None
+    if argv[1] in ("-c", "-m"):
+        return argv[1:] if len(argv) > 2 else None
+    return None if argv[1].startswith("-") else argv[1:]
+
+
+class Worker:
+    """A long-lived shell that runs one command at a time.
+
+    Each command runs in a subshell, so ``cd``, exports and ulimits never
+    leak into later commands. Commands are framed with a random token:
+    when one finishes the worker prints ``\\n<token>:<exit code>`` on
+    stdout and ``\\n<token>:`` on stderr.
+    """
+
+    kind = "shell"
+    probe = "true"
+
+    def __init__(self) -> None:
+        """Initialize worker; call :meth:`start` before use."""
+        self.process: asyncio.subprocess.Process | None = None
+        self.uses = 0
+        self.last_used = time.monotonic()
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        return await asyncio.create_subprocess_exec(
+            shutil.which("bash") or "/bin/sh",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+
+    async def start(self) -> "Worker":
+        """Start the worker process."""
+        self.process = await self._spawn()
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def request(
+        self,
+        token: str,
+        command: str,
+        cwd: str | None,
+        env: dict[str, str],
+        cpu_seconds: int = 0,
+        memory_mb: int = 0,
+    ) -> bytes:
+        """Script running ``command`` in a subshell and printing the framing markers."""
+        lines = []
+        if cwd:
+            lines.append(f"cd -- {shlex.quote(cwd)} || exit 1")
+        lines.extend(f"export {shlex.quote(f'{k}={v}')}" for k, v in env.items())
+        if cpu_seconds > 0:
+            lines.append(f"ulimit -t {cpu_seconds}")
+        if memory_mb > 0:
+            lines.append(f"ulimit -v {memory_mb * 1024}")
+        lines.append(f"eval {shlex.quote(command)}")
+
+        body = "\n".join(lines)
+        return (
+            f"(\n{body}\n) </dev/null\n"
+            f"printf '\\n%s:%d\\n' {token} \"$?\"\n"
+            f"printf '\\n%s:\\n' {token} >&2\n"
+        ).encode()
+
+    async def send(
+        self,
+        command: str,
+        cwd: str | None = None,
+        env: dict[str, str] | None = None,
+        cpu_seconds: int = 0,
+        memory_mb: int = 0,
+    ) -> str:
+        """Submit a command and return its framing token.
+
+        ``cpu_seconds`` and ``memory_mb`` (0 for none) limit the run the same
+        way ProcessRun limits a fresh process.
+        """
+        token = f"__glm_{secrets.token_hex(8)}__"
+        request = self.request(token, command, cwd, env or {}, cpu_seconds, memory_mb)
+        self.process.stdin.write(request)
+        await self.process.stdin.drain()
+        return token
+
+    async def ping(self) -> bool:
+        """Round-trip a no-op command."""
+        try:
+            token = await self.send(self.probe)
+            marker = f"\n{token}:".encode()
+            out, err = await asyncio.wait_for(
+                asyncio.gather(
+                    read_framed(self.process.stdout, marker, lambda _: None),
+                    read_framed(self.process.stderr, marker, lambda _: None),
+                ),
+                HEALTH_CHECK_TIMEOUT,
+            )
+        except (asyncio.TimeoutError, OSError):
+            return False
+        return out == b"0" and err is not None
+
+    def kill(self) -> None:
+        """Kill the worker and anything it started."""
+        if not self.alive:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def close(self) -> None:
+        """Stop the worker."""
+        if self.alive:
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), KILL_GRACE_PERIOD)
+            except asyncio.TimeoutError:
+                self.kill()
+        if self.process is not None:
+            await self.process.wait()
+
+
+class PythonWorker(Worker):
+    """A warm interpreter that forks a child per command.
+
+    Modules listed in ``bash_python_preload`` are imported once, so runs
+    such as ``pytest`` skip interpreter startup and heavy imports. See
+    ``python_worker.py`` for the protocol.
+    """
+
+    kind = "python"
+    probe = "python -c pass"
+
+    def __init__(self, interpreter: str) -> None:
+        """Initialize worker for ``interpreter``."""
+        super().__init__()
+        self.interpreter = interpreter
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        preload = [m.strip() for m in settings.bash_python_preload.split(",") if m.strip()]
+        return await asyncio.create_subprocess_exec(
+            self.interpreter,
+            "-u",
+            PYTHON_WORKER_SCRIPT,
+            *preload,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+
+    def request(
+        self,
+        token: str,
+        command: str,
+        cwd: str | None,
+        env: dict[str, str],
+        cpu_seconds: int = 0,
+        memory_mb: int = 0,
+    ) -> bytes:
+        payload = {
+            "token": token,
+            "argv": python_argv(command),
+            "cwd": cwd,
+            "env": env,
+            "cpu_seconds": cpu_seconds,
+            "memory_mb": memory_mb,
+        }
+        return json.dumps(payload).encode() + b"\n"
+
+
+class PooledRun(ProcessRun):
+    """A :class:`ProcessRun` executed on a pooled worker.
+
+    Output is read up to the framing markers. On timeout the worker is
+    killed and replaced rather than reused.
+    """
+
+    def __init__(self, pool: "ShellPool", kind: str, command: str, **kwargs: Any) -> None:
+        """Initialize pooled run."""
+        super().__init__(command, **kwargs)
+        self.pool = pool
+        self.kind = kind
+        self.worker: Worker | None = None
+        self._marker = b""
+        self._exit_code: int | None = None
+        self._worker_lost = False
+
+    async def _start(self) -> tuple[asyncio.StreamReader | None, asyncio.StreamReader | None]:
+        self.worker = await self.pool.acquire(self.kind)
+        try:
+            token = await self.worker.send(
+                self.command, self.cwd, self.env, self.cpu_seconds, self.memory_mb
+            )
+        except OSError:
+            self.pool.discard(self.worker)
+            raise
+        self.worker.uses += 1
+        self._marker = f"\n{token}:".encode()
+        return self.worker.process.stdout, self.worker.process.stderr
+
+    async def _pump(
+        self,
+        name: str,
+        stream: asyncio.StreamReader | None,
+        queue: "asyncio.Queue[tuple[str, bytes]]",
+    ) -> None:
+        status = await read_framed(
+            stream, self._marker, lambda data: queue.put_nowait((name, data))
+        )
+        if status is None:
+            self._worker_lost = True
+        elif name == "stdout":
+            self._exit_code = int(status or 0)
+        await queue.put((name, b""))
+
+    async def _finish(self) -> int | None:
+        if self._worker_lost or self._exit_code is None:
+            self.pool.discard(self.worker)
+            return -1
+        self.pool.release(self.worker)
+        return self._exit_code
+
+    async def _kill(self) -> None:
+        if self.worker is None or self.returncode is not None:
+            return
+        self.pool.discard(self.worker)
+        self.returncode = -signal.SIGKILL
+
+
+class ShellPool:
+    """Up to ``size`` warm workers of each kind.
+
+    Workers start lazily, get a health check when reused after sitting
+    idle, and are recycled after ``max_uses`` commands. A plain ``python``
+    or ``pytest`` command goes to a warm Python worker; everything else
+    runs in a pooled shell.
+    """
+
+    def __init__(self, size: int | None = None, max_uses: int | None = None) -> None:
+        """Initialize shell pool."""
+        self.size = size or settings.bash_pool_size
+        self.max_uses = max_uses or settings.bash_pool_max_uses
+        self.interpreter = shutil.which("python") or shutil.which("python3") or sys.executable
+        self._idle: dict[str, list[Worker]] = {"shell": [], "python": []}
+        self._slots: dict[str, asyncio.Semaphore] = {}
+        self.stats: dict[str, int] = {
+            "started": 0,
+            "reused": 0,
+            "recycled": 0,
+            "discarded": 0,
+            "failed_health_checks": 0,
+        }
+
+    def run(self, command: str, **kwargs: Any) -> PooledRun:
+        """Prepare a run of ``command`` on a suitable worker."""
+        kind = "shell"
+        if settings.bash_python_worker and hasattr(os, "fork") and python_argv(command):
+            kind = "python"
+        return PooledRun(self, kind, command, **kwargs)
+
+    def _slot(self, kind: str) -> asyncio.Semaphore:
+        if kind not in self._slots:
+            self._slots[kind] = asyncio.Semaphore(self.size)
+        return self._slots[kind]
+
+    async def acquire(self, kind: str) -> Worker:
+        """Take an idle healthy worker, or start one, waiting while all are busy."""
+        slot = self._slot(kind)
+        await slot.acquire()
+        try:
+            while self._idle[kind]:
+                worker = self._idle[kind].pop()
+                if await self._healthy(worker):
+                    self.stats["reused"] += 1
+                    return worker
+                self.stats["failed_health_checks"] += 1
+                worker.kill()
+                asyncio.ensure_future(worker.close())
+
+            if kind == "python":
+                worker = await PythonWorker(self.interpreter).start()
+            else:
+                worker = await Worker().start()
+            self.stats["started"] += 1
+            return worker
+        except BaseException:
+            slot.release()
+            raise
+
+    async def _healthy(self, worker: Worker) -> bool:
+        """Check the worker is alive, round-tripping a no-op if it sat idle."""
+        if not worker.alive:
+            return False
+        if time.monotonic() - worker.last_used < HEALTH_CHECK_AFTER_IDLE:
+            return True
+        return await worker.ping()
+
+    def release(self, worker: Worker) -> None:
+        """Return a worker after a clean run, recycling worn-out ones."""
+        worker.last_used = time.monotonic()
+        if worker.alive and worker.uses < self.max_uses:
+            self._idle[worker.kind].append(worker)
+        else:
+            self.stats["recycled"] += 1
+            asyncio.ensure_future(worker.close())
+        self._slot(worker.kind).release()
+
+    def discard(self, worker: Worker) -> None:
+        """Kill a broken or timed-out worker and free its slot."""
+        self.stats["discarded"] += 1
+        worker.kill()
+        asyncio.ensure_future(worker.close())
+        self._slot(worker.kind).release()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Pool counters and idle worker counts."""
+        return {**self.stats, "idle": {kind: len(workers) for kind, workers in self._idle.items()}}
+
+    async def close(self) -> None:
+        """Stop idle workers."""
+        for workers in self._idle.values():
+            while workers:
+                await workers.pop().close()
+
+
+_shared_pool: ShellPool | None = None
+
+
+def get_shared_shell_pool() -> ShellPool:
+    """Process-wide shell pool used by BashTool."""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = ShellPool()
+    return _shared_pool
+
+
+async def close_shared_shell_pool() -> None:
+    """Stop the shared pool's workers."""
+    global _shared_pool
+    if _shared_pool is not None:
+        await _shared_pool.close()
+        _shared_pool = None
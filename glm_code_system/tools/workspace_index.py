@@ -0,0 +1,664 @@
+"""In-memory index of workspace file paths for fast glob and fuzzy search."""
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import heapq
+import logging
+import os
+import re
+import struct
+import time
+from typing import NamedTuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Segment boundaries that earn a fuzzy-match bonus.
+_SEPARATORS = "/_-. "
+
+
+class IgnoreRule(NamedTuple):
+    """One ``.gitignore`` line, relative to the directory it came from."""
+
+    base: str
+    regex: re.Pattern[str]
+    negate: bool
+    dir_only: bool
+    anchored: bool
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore-style glob (with ``**``) to a regex body."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end < 0:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1 : end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+def parse_gitignore(text: str, base: str) -> list[IgnoreRule]:
+    """Rules from a ``.gitignore`` located in directory ``base``."""
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            continue
+        regex = re.compile(_glob_to_regex(line) + r"\Z")
+        rules.append(IgnoreRule(base, regex, negate, dir_only, anchored))
+    return rules
+
+
+def _join(parent: str, name: str) -> str:
+    return f"{parent}/{name}" if parent else name
+
+
+def _relative_to(path: str, base: str) -> str | None:
+    if not base:
+        return path
+    if path.startswith(base + "/"):
+        return path[len(base) + 1 :]
+    return None
+
+
+def is_ignored(
+    rules: list[IgnoreRule], path: str, is_dir: bool, ignored: bool = False
+) -> bool:
+    """Whether ``path`` (relative to the rules' root) is ignored; last match wins.
+
+    ``ignored`` is the verdict of any rules applied before these.
+    """
+    name = path.rsplit("/", 1)[-1]
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            continue
+        relative = _relative_to(path, rule.base)
+        if relative is None:
+            continue
+        subject = relative if rule.anchored else name
+        if rule.regex.match(subject):
+            ignored = not rule.negate
+    return ignored
+
+
+def _default_exclude() -> set[str]:
+    """Directory names never indexed, from settings."""
+    return {name.strip() for name in settings.workspace_index_exclude.split(",")} - {""}
+
+
+def _read_rules(path: str, base: str) -> list[IgnoreRule]:
+    """Rules from the ignore file at ``path``, or none if it can't be read."""
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return parse_gitignore(f.read(), base)
+    except OSError:
+        return []
+
+
+def _inherited_rules(
+    root: str,
+    rel: str,
+    exclude: set[str],
+    inherited: list[IgnoreRule] | None = None,
+    prefix: str = "",
+) -> list[IgnoreRule] | None:
+    """Ignore rules from ``root`` that apply inside directory ``rel`` below it.
+
+    Returns None if ``rel`` itself lies in an excluded, ignored or
+    virtualenv directory. ``inherited`` and ``prefix`` are those of the
+    index rooted at ``root``, if any.
+    """
+    rules = _read_rules(os.path.join(root, ".git", "info", "exclude"), "")
+    current = ""
+    for name in rel.split("/") if rel else []:
+        rules += _read_rules(os.path.join(root, current, ".gitignore"), current)
+        current = _join(current, name)
+        ignored = bool(inherited) and is_ignored(inherited, _join(prefix, current), True)
+        if (
+            name in exclude
+            or is_ignored(rules, current, True, ignored)
+            or os.path.exists(os.path.join(root, current, "pyvenv.cfg"))
+        ):
+            return None
+    return rules
+
+
+class _Dir:
+    """Indexed state of one directory."""
+
+    __slots__ = ("mtime_ns", "files", "subdirs", "rules", "ignore_mtime_ns", "watch")
+
+    def __init__(self) -> None:
+        self.mtime_ns = 0
+        self.files: set[str] = set()
+        self.subdirs: set[str] = set()
+        self.rules: list[IgnoreRule] = []
+        self.ignore_mtime_ns: int | None = None
+        self.watch: int | None = None
+
+
+class _Inotify:
+    """Minimal ctypes binding for Linux inotify."""
+
+    CREATE = 0x100
+    DELETE = 0x200
+    MOVED_FROM = 0x40
+    MOVED_TO = 0x80
+    CLOSE_WRITE = 0x8
+    DELETE_SELF = 0x400
+    MOVE_SELF = 0x800
+    Q_OVERFLOW = 0x4000
+    IGNORED = 0x8000
+    ONLYDIR = 0x01000000
+    WATCH_MASK = CREATE | DELETE | MOVED_FROM | MOVED_TO | CLOSE_WRITE | DELETE_SELF | MOVE_SELF
+    _HEADER = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, path: str) -> int:
+        mask = self.WATCH_MASK | self.ONLYDIR
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def remove(self, wd: int) -> None:
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> list[tuple[int, int, str]]:
+        """Pending ``(watch, mask, name)`` events, without blocking."""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._HEADER.unpack_from(data, offset)
+                offset += self._HEADER.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class WorkspaceIndex:
+    """Paths of every non-ignored file under ``root``, kept current incrementally.
+
+    The tree is walked once with ``os.scandir``, pruning excluded directory
+    names, virtualenvs and anything matched by ``.gitignore`` files (and
+    ``.git/info/exclude``). Afterwards only changed directories are
+    rescanned: inotify reports them on Linux; elsewhere, or when the watch
+    limit is reached, each refresh stats the known directories (at most
+    once per ``poll_interval``) and rescans those whose mtime moved.
+
+    Refreshes work on a private set and publish ``files`` as a new frozenset
+    in one assignment, so readers on the event loop never see it change
+    while they iterate.
+
+    ``inherited`` holds ignore rules from above ``root`` (such as the
+    enclosing repository's ``.gitignore`` files); they are matched against
+    paths prefixed with ``prefix``, the root's location in that repository.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        exclude: set[str] | None = None,
+        use_inotify: bool | None = None,
+        poll_interval: float | None = None,
+        max_files: int | None = None,
+        inherited: list[IgnoreRule] | None = None,
+        prefix: str = "",
+    ) -> None:
+        """Initialize workspace index; call ``build`` or ``refresh`` to populate."""
+        self.root = os.path.realpath(root)
+        self.inherited = inherited or []
+        self.prefix = prefix
+        self.exclude = _default_exclude() if exclude is None else exclude - {""}
+        self.poll_interval = (
+            settings.workspace_index_poll_interval if poll_interval is None else poll_interval
+        )
+        self.max_files = max_files or settings.workspace_index_max_files
+        if use_inotify is None:
+            use_inotify = settings.workspace_index_use_inotify
+
+        self.files: frozenset[str] = frozenset()
+        self.truncated = False
+        self._files: set[str] = set()
+        self._dirty = False
+        self._dirs: dict[str, _Dir] = {}
+        self._watches: dict[int, str] = {}
+        self._inotify: _Inotify | None = None
+        self._built = False
+        self._last_poll = 0.0
+        self._lock = asyncio.Lock()
+        self.stats: dict[str, int] = {"builds": 0, "rescans": 0, "polls": 0, "events": 0}
+
+        if use_inotify and os.name == "posix" and hasattr(os, "O_CLOEXEC"):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                logger.debug("inotify unavailable, polling instead: %s", e)
+
+    @property
+    def mode(self) -> str:
+        """``"inotify"`` or ``"polling"``."""
+        return "inotify" if self._inotify is not None else "polling"
+
+    def _abs(self, rel: str) -> str:
+        return os.path.join(self.root, rel) if rel else self.root
+
+    def _rules_for(self, rel: str) -> list[IgnoreRule]:
+        """Effective ignore rules inside directory ``rel``."""
+        rules: list[IgnoreRule] = []
+        parts = rel.split("/") if rel else []
+        for depth in range(len(parts) + 1):
+            state = self._dirs.get("/".join(parts[:depth]))
+            if state is not None:
+                rules.extend(state.rules)
+        return rules
+
+    def _ignored(self, rules: list[IgnoreRule], path: str, is_dir: bool) -> bool:
+        """``is_ignored`` over the inherited rules followed by ``rules``."""
+        ignored = bool(self.inherited) and is_ignored(
+            self.inherited, _join(self.prefix, path), is_dir
+        )
+        return is_ignored(rules, path, is_dir, ignored)
+
+    def covers(self, rel: str) -> bool:
+        """Whether directory ``rel`` (relative to the root) is indexed rather than pruned."""
+        if not rel:
+            return True
+        rules = _inherited_rules(self.root, rel, self.exclude, self.inherited, self.prefix)
+        return rules is not None
+
+    def _load_rules(self, rel: str, state: _Dir) -> None:
+        path = os.path.join(self._abs(rel), ".gitignore")
+        state.rules = []
+        state.ignore_mtime_ns = None
+        try:
+            state.ignore_mtime_ns = os.stat(path).st_mtime_ns
+            with open(path, encoding="utf-8", errors="replace") as f:
+                state.rules = parse_gitignore(f.read(), rel)
+        except OSError:
+            pass
+        if not rel:
+            try:
+                with open(os.path.join(self.root, ".git", "info", "exclude")) as f:
+                    state.rules = parse_gitignore(f.read(), "") + state.rules
+            except OSError:
+                pass
+
+    def _watch(self, rel: str, state: _Dir) -> None:
+        if self._inotify is None:
+            return
+        try:
+            state.watch = self._inotify.add(self._abs(rel))
+            self._watches[state.watch] = rel
+        except OSError as e:
+            if e.errno in (errno.ENOSPC, errno.EMFILE):
+                logger.warning("inotify watch limit reached, falling back to polling")
+                self._stop_inotify()
+
+    def _stop_inotify(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+            self._watches.clear()
+            for state in self._dirs.values():
+                state.watch = None
+
+    def _scan(self, rel: str) -> None:
+        """Index directory ``rel`` and any subdirectories not yet indexed."""
+        stack = [rel]
+        while stack:
+            current = stack.pop()
+            state = self._dirs.get(current)
+            fresh = state is None
+            if fresh:
+                state = self._dirs[current] = _Dir()
+                self._watch(current, state)
+            self._load_rules(current, state)
+            rules = self._rules_for(current)
+
+            files: set[str] = set()
+            subdirs: set[str] = set()
+            try:
+                state.mtime_ns = os.stat(self._abs(current)).st_mtime_ns
+                with os.scandir(self._abs(current)) as entries:
+                    for entry in entries:
+                        child = _join(current, entry.name)
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if is_dir:
+                            if entry.name in self.exclude or self._ignored(rules, child, True):
+                                continue
+                            if os.path.exists(os.path.join(entry.path, "pyvenv.cfg")):
+                                continue
+                            subdirs.add(entry.name)
+                        elif not self._ignored(rules, child, False):
+                            files.add(entry.name)
+            except OSError:
+                pass
+
+            kept: set[str] = set()
+            for name in state.files - files:
+                self._files.discard(_join(current, name))
+                self._dirty = True
+            for name in files:
+                if name in state.files:
+                    kept.add(name)
+                elif len(self._files) < self.max_files:
+                    self._files.add(_join(current, name))
+                    self._dirty = True
+                    kept.add(name)
+                else:
+                    self.truncated = True
+            state.files = kept
+
+            for name in state.subdirs - subdirs:
+                self._prune(_join(current, name))
+            for name in subdirs - state.subdirs:
+                stack.append(_join(current, name))
+            state.subdirs = subdirs
+            self.stats["rescans"] += 1
+
+    def _rescan_tree(self, rel: str) -> None:
+        """Rescan ``rel`` and everything below it, e.g. after ignore rules changed."""
+        self._scan(rel)
+        state = self._dirs.get(rel)
+        if state is not None:
+            for name in list(state.subdirs):
+                self._rescan_tree(_join(rel, name))
+
+    def _prune(self, rel: str) -> None:
+        """Forget directory ``rel`` and its subtree."""
+        state = self._dirs.pop(rel, None)
+        if state is None:
+            return
+        for name in state.files:
+            self._files.discard(_join(rel, name))
+            self._dirty = True
+        for name in state.subdirs:
+            self._prune(_join(rel, name))
+        if state.watch is not None and self._inotify is not None:
+            self._watches.pop(state.watch, None)
+            self._inotify.remove(state.watch)
+
+    def build(self) -> None:
+        """Index the whole tree from scratch."""
+        for rel in list(self._dirs):
+            self._prune(rel)
+        self._files.clear()
+        self._dirty = True
+        self.truncated = False
+        self._scan("")
+        self._built = True
+        self._last_poll = time.monotonic()
+        self.stats["builds"] += 1
+        self._publish()
+
+    def refresh(self) -> None:
+        """Bring the index up to date with the filesystem."""
+        if not self._built:
+            self.build()
+        elif self._inotify is not None:
+            self._apply_events()
+        elif time.monotonic() - self._last_poll >= self.poll_interval:
+            self._poll()
+        self._publish()
+
+    def _publish(self) -> None:
+        """Swap in a snapshot of the working set if it changed."""
+        if self._dirty:
+            self.files = frozenset(self._files)
+            self._dirty = False
+
+    def _apply_events(self) -> None:
+        changed: set[str] = set()
+        ignore_changed: set[str] = set()
+        for wd, mask, name in self._inotify.read():
+            self.stats["events"] += 1
+            if mask & _Inotify.Q_OVERFLOW:
+                self._poll()
+                return
+            rel = self._watches.get(wd)
+            if rel is None or mask & _Inotify.IGNORED:
+                continue
+            if mask & (_Inotify.DELETE_SELF | _Inotify.MOVE_SELF):
+                changed.add(rel.rsplit("/", 1)[0] if "/" in rel else "")
+            elif name == ".gitignore":
+                ignore_changed.add(rel)
+            elif not mask & _Inotify.CLOSE_WRITE:
+                changed.add(rel)
+
+        for rel in sorted(ignore_changed):
+            if rel in self._dirs:
+                self._rescan_tree(rel)
+        for rel in sorted(changed - ignore_changed):
+            if rel in self._dirs:
+                self._scan(rel)
+
+    def _poll(self) -> None:
+        """Rescan directories whose mtime (or ``.gitignore``) changed."""
+        self.stats["polls"] += 1
+        for rel in sorted(self._dirs):
+            state = self._dirs.get(rel)
+            if state is None:
+                continue
+            try:
+                mtime_ns = os.stat(self._abs(rel)).st_mtime_ns
+            except OSError:
+                parent = rel.rsplit("/", 1)[0] if "/" in rel else ""
+                if rel and parent in self._dirs:
+                    self._scan(parent)
+                continue
+
+            ignore_mtime_ns = state.ignore_mtime_ns
+            if ignore_mtime_ns is not None:
+                ignore_path = os.path.join(self._abs(rel), ".gitignore")
+                try:
+                    ignore_mtime_ns = os.stat(ignore_path).st_mtime_ns
+                except OSError:
+                    ignore_mtime_ns = None
+            if ignore_mtime_ns != state.ignore_mtime_ns:
+                self._rescan_tree(rel)
+            elif mtime_ns != state.mtime_ns:
+                self._scan(rel)
+        self._last_poll = time.monotonic()
+
+    async def ensure_fresh(self) -> None:
+        """Refresh off the event loop; concurrent callers share one refresh."""
+        async with self._lock:
+            await asyncio.to_thread(self.refresh)
+
+    def _candidates(self, base: str) -> list[str]:
+        if not base:
+            return list(self.files)
+        prefix = base + "/"
+        return [path for path in self.files if path.startswith(prefix)]
+
+    def glob(self, pattern: str, base: str = "", limit: int | None = None) -> list[str]:
+        """Files under ``base`` matching ``pattern`` at any depth, sorted.
+
+        A pattern without ``/`` matches file names (``*.py``); one with ``/``
+        matches trailing path segments (``tests/**/test_*.py``).
+        """
+        if "/" in pattern:
+            regex = re.compile("(?:.*/)?" + _glob_to_regex(pattern.strip("/")) + r"\Z")
+            matches = [
+                path
+                for path in self._candidates(base)
+                if regex.match(_relative_to(path, base) or "")
+            ]
+        else:
+            regex = re.compile(fnmatch.translate(pattern))
+            matches = [
+                path for path in self._candidates(base) if regex.match(path.rsplit("/", 1)[-1])
+            ]
+        matches.sort()
+        return matches[:limit] if limit else matches
+
+    def fuzzy(self, query: str, base: str = "", limit: int | None = None) -> list[str]:
+        """Files whose path contains ``query``'s characters in order, best first."""
+        query = query.replace(" ", "").lower()
+        if not query:
+            return []
+        prefilter = re.compile(".*?".join(map(re.escape, query)), re.IGNORECASE)
+        scored = [
+            (fuzzy_score(query, path), path)
+            for path in self._candidates(base)
+            if prefilter.search(path)
+        ]
+        best = heapq.nlargest(
+            limit or len(scored), scored, key=lambda item: (item[0], -len(item[1]))
+        )
+        return [path for _, path in best]
+
+    def close(self) -> None:
+        """Release the inotify descriptor."""
+        self._stop_inotify()
+
+    def get_stats(self) -> dict[str, int | str]:
+        """Counters plus current size."""
+        return {
+            **self.stats,
+            "files": len(self.files),
+            "directories": len(self._dirs),
+            "mode": self.mode,
+        }
+
+
+def fuzzy_score(query: str, path: str) -> int:
+    """Subsequence match score rewarding runs, segment starts and file-name hits."""
+    lowered = path.lower()
+    name_start = path.rfind("/") + 1
+    score = run = 0
+    previous = -1
+    index = len(query) - 1
+    # Match right to left so characters land in the file name where possible.
+    for position in range(len(path) - 1, -1, -1):
+        if index < 0:
+            break
+        if lowered[position] != query[index]:
+            continue
+        bonus = 1
+        if position == 0 or path[position - 1] in _SEPARATORS:
+            bonus += 8
+        elif path[position - 1].islower() and path[position].isupper():
+            bonus += 6
+        if position >= name_start:
+            bonus += 2
+        run = run + 1 if previous == position + 1 else 1
+        score += bonus + 4 * (run - 1)
+        previous = position
+        index -= 1
+    return score - len(path) // 8
+
+
+_indexes: dict[str, WorkspaceIndex] = {}
+
+
+def _workspace_root(path: str) -> str:
+    """Enclosing git work tree of ``path``, or ``path`` itself."""
+    current = path
+    while True:
+        if os.path.exists(os.path.join(current, ".git")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return path
+        current = parent
+
+
+def _relative_base(path: str, root: str) -> str:
+    """``path`` relative to ``root`` with ``/`` separators; empty for the root."""
+    relative = os.path.relpath(path, root)
+    return "" if relative == os.curdir else relative.replace(os.sep, "/")
+
+
+def get_workspace_index(path: str = ".") -> tuple[WorkspaceIndex, str]:
+    """Shared index covering ``path``, and ``path`` relative to its root.
+
+    An existing index is reused when ``path`` lies in a part of it that is
+    indexed. Otherwise a new index is rooted at ``path`` itself, applying
+    the ignore rules of the enclosing git work tree; a path that the work
+    tree excludes or ignores (``node_modules``, a build directory) was asked
+    for explicitly, so it is walked without them.
+    """
+    real = os.path.realpath(path)
+    for root, index in _indexes.items():
+        if real == root or real.startswith(root + os.sep):
+            base = _relative_base(real, root)
+            if index.covers(base):
+                return index, base
+
+    workspace = _workspace_root(real)
+    base = _relative_base(real, workspace)
+    rules = _inherited_rules(workspace, base, _default_exclude()) if base else None
+    if rules is None:
+        index = WorkspaceIndex(real)
+    else:
+        index = WorkspaceIndex(real, inherited=rules, prefix=base)
+    _indexes[real] = index
+    return index, ""
+
+
+def close_workspace_indexes() -> None:
+    """Close and forget every shared index."""
+    for index in _indexes.values():
+        index.close()
+    _indexes.clear()
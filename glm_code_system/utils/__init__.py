@@ -1,3 +1,26 @@
 from .glm_client import GLMClient
+from .rate_limiter import RateLimiter, get_shared_rate_limiter
+from .response_cache import ResponseCache, get_shared_response_cache
+from .retry import RetryPolicy
+from .singleflight import SingleFlight, StreamFlight
+from .sse import SSEParser, StreamDelta
+from .tokenizer import ApproximateTokenizer, count_message_tokens, get_tokenizer
+from .transport import close_shared_client, get_shared_client
 
-__all__ = ["GLMClient"]
+__all__ = [
+    "ApproximateTokenizer",
+    "GLMClient",
+    "RateLimiter",
+    "ResponseCache",
+    "RetryPolicy",
+    "SingleFlight",
+    "SSEParser",
+    "StreamDelta",
+    "StreamFlight",
+    "get_shared_rate_limiter",
+    "get_shared_response_cache",
+    "get_shared_client",
+    "close_shared_client",
+    "count_message_tokens",
+    "get_tokenizer",
+]
@@ -1,10 +1,26 @@
 """GLM API client for interacting with GLM models."""
 
+import hashlib
+import logging
+import time
 
 import httpx
 from typing import Any, AsyncGenerator
 
 from config.settings import settings
+from glm_code_system.utils.rate_limiter import RateLimiter, get_shared_rate_limiter
+from glm_code_system.utils.response_cache import (
+    ResponseCache,
+    get_shared_response_cache,
+    make_cache_key,
+)
+from glm_code_system.utils.retry import RetryPolicy
+from glm_code_system.utils.singleflight import get_shared_single_flight, get_shared_stream_flight
+from glm_code_system.utils.sse import DONE, SSEParser, StreamDelta, parse_stream_delta
+from glm_code_system.utils.tokenizer import count_message_tokens
+from glm_code_system.utils.transport import create_http_client, get_shared_client
+
+logger = logging.getLogger(__name__)
 
 
 class GLMClient:
@@ -15,19 +31,52 @@ class GLMClient:
         api_key: str | None = None,
         model: str | None = None,
         base_url: str | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        cache: ResponseCache | None = None,
+        coalesce: bool | None = None,
     ) -> None:
-        """Initialize GLM client."""
+        """Initialize GLM client.
+
+        Unless an ``http_client`` or ``rate_limiter`` is given, all clients share
+        one process-wide connection pool (see ``settings.http_shared_pool``) and
+        one rate limiter. The response cache is opt-in via ``cache`` or
+        ``settings.response_cache_enabled``. Identical concurrent requests are
+        coalesced into one upstream call unless ``coalesce`` is disabled.
+        """
         self.api_key = api_key or settings.glm_api_key
         self.model = model or settings.glm_model
         self.base_url = base_url or settings.glm_base_url
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
 
-        self.client = httpx.AsyncClient(
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            },
-            timeout=60.0,
+        self._owns_client = http_client is None and not settings.http_shared_pool
+        if http_client is not None:
+            self.client = http_client
+        elif settings.http_shared_pool:
+            self.client = get_shared_client()
+        else:
+            self.client = create_http_client()
+
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+
+        if cache is None and settings.response_cache_enabled:
+            cache = get_shared_response_cache()
+        self.cache = cache
+
+        self.coalesce = settings.glm_coalesce_requests if coalesce is None else coalesce
+        # Coalesced requests are only shared between clients using the same credentials.
+        self._flight_scope = (
+            self.base_url,
+            hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:16],
         )
+        self.single_flight = get_shared_single_flight()
+        self.stream_flight = get_shared_stream_flight()
+        self.stream_stats: dict[str, int] = {"malformed_events": 0}
 
     async def generate(
         self,
@@ -35,8 +84,19 @@ class GLMClient:
         stream: bool = False,
         temperature: float = 0.7,
         max_tokens: int = 4096,
+        use_cache: bool = True,
     ) -> str:
         """Generate response from GLM model."""
+        request_key = make_cache_key(self.model, messages, temperature, max_tokens)
+
+        cache_key = None
+        if use_cache and not stream and self.cache is not None:
+            if self.cache.should_cache(temperature):
+                cache_key = request_key
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
         payload = {
             "model": self.model,
             "messages": messages,
@@ -45,15 +105,43 @@ class GLMClient:
             "stream": stream,
         }
 
-        response = await self.client.post(
-            f"{self.base_url}/chat/completions",
-            json=payload,
+        if not self.coalesce:
+            return await self._complete(payload, cache_key)
+
+        return await self.single_flight.do(
+            (*self._flight_scope, request_key),
+            lambda: self._complete(payload, cache_key),
         )
 
-        response.raise_for_status()
+    async def _complete(self, payload: dict[str, Any], cache_key: str | None) -> str:
+        """Send a completion request and cache the result."""
+
+        async def send() -> httpx.Response:
+            await self.rate_limiter.acquire(
+                self._estimate_tokens(payload["messages"], payload["max_tokens"])
+            )
+            response = await self.client.post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=self.headers,
+            )
+            response.raise_for_status()
+            return response
+
+        started = time.monotonic()
+        response = await self.retry_policy.call(send)
         data = response.json()
+        content = data["choices"][0]["message"]["content"]
+
+        if cache_key is not None:
+            await self.cache.set(
+                cache_key,
+                content,
+                latency=time.monotonic() - started,
+                tokens=data.get("usage", {}).get("total_tokens", 0),
+            )
 
-        return data["choices"][0]["message"]["content"]
+        return content
 
     async def generate_stream(
         self,
@@ -62,38 +150,116 @@ class GLMClient:
         max_tokens: int = 4096,
     ) -> AsyncGenerator[str, None]:
         """Generate streaming response from GLM model."""
-        payload = {
+        async for delta in self.generate_stream_deltas(messages, temperature, max_tokens):
+            if delta.content:
+                yield delta.content
+
+    async def generate_stream_deltas(
+        self,
+        messages: list[dict[str, Any]],
+        temperature: float = 0.7,
+        max_tokens: int = 4096,
+        tools: list[dict[str, Any]] | None = None,
+    ) -> AsyncGenerator[StreamDelta, None]:
+        """Generate streaming response including finish reason and usage metadata.
+
+        With ``tools`` (function schemas) the model may answer with tool
+        calls, streamed as ``StreamDelta.tool_calls`` fragments.
+        """
+        payload: dict[str, Any] = {
             "model": self.model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
             "stream": True,
         }
+        if tools:
+            payload["tools"] = tools
+            payload["tool_choice"] = "auto"
 
-        async with self.client.stream(
-            "POST",
-            f"{self.base_url}/chat/completions",
-            json=payload,
-        ) as response:
-            response.raise_for_status()
+        if not self.coalesce:
+            async for delta in self._stream(payload):
+                yield delta
+            return
 
-            async for line in response.aiter_lines():
-                if line.startswith("data: "):
-                    data_str = line[6:]
-                    if data_str == "[DONE]":
-                        break
+        request_key = make_cache_key(self.model, messages, temperature, max_tokens, tools)
+        async for delta in self.stream_flight.subscribe(
+            (*self._flight_scope, request_key),
+            lambda: self._stream(payload),
+        ):
+            yield delta
 
-                    import json
+    async def _stream(self, payload: dict[str, Any]) -> AsyncGenerator[StreamDelta, None]:
+        """Open a streaming completion and yield parsed deltas."""
+        # Retries are only safe until the first chunk has been handed out.
+        attempt = 0
+        yielded = False
+
+        while True:
+            await self.rate_limiter.acquire(
+                self._estimate_tokens(payload["messages"], payload["max_tokens"])
+            )
+            try:
+                async with self.client.stream(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    json=payload,
+                    headers=self.headers,
+                ) as response:
+                    response.raise_for_status()
+
+                    parser = SSEParser()
+                    async for raw in response.aiter_bytes():
+                        for event in parser.feed(raw):
+                            if event.data == DONE:
+                                return
+                            delta = self._parse_delta(event.data)
+                            if delta is not None:
+                                yielded = True
+                                yield delta
+
+                    for event in parser.flush():
+                        if event.data == DONE:
+                            return
+                        delta = self._parse_delta(event.data)
+                        if delta is not None:
+                            yielded = True
+                            yield delta
+                return
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                if yielded or not self.retry_policy.should_retry(e, attempt):
+                    raise
+                await self.retry_policy.backoff(attempt, e)
+                attempt += 1
+
+    def _parse_delta(self, data: bytes) -> StreamDelta | None:
+        """Parse an event payload, counting and logging malformed ones."""
+        try:
+            return parse_stream_delta(data)
+        except ValueError:
+            self.stream_stats["malformed_events"] += 1
+            logger.warning("Skipping malformed stream event: %r", data[:200])
+            return None
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get retry, rate limiter, response cache and coalescing counters."""
+        return {
+            "retry": dict(self.retry_policy.stats),
+            "rate_limiter": self.rate_limiter.get_stats(),
+            "cache": self.cache.get_stats() if self.cache is not None else None,
+            "coalescing": {
+                "completions": dict(self.single_flight.stats),
+                "streams": dict(self.stream_flight.stats),
+            },
+            "stream": dict(self.stream_stats),
+        }
 
-                    try:
-                        data = json.loads(data_str)
-                        if "choices" in data and len(data["choices"]) > 0:
-                            delta = data["choices"][0].get("delta", {})
-                            if "content" in delta:
-                                yield delta["content"]
-                    except json.JSONDecodeError:
-                        continue
+    @staticmethod
+    def _estimate_tokens(messages: list[dict[str, Any]], max_tokens: int) -> int:
+        """Roughly estimate the tokens a request counts against the quota."""
+        return count_message_tokens(messages) + max_tokens
 
     async def close(self) -> None:
-        """Close the HTTP client."""
-        await self.client.aclose()
+        """Close the HTTP client if it is not shared with other clients."""
+        if self._owns_client:
+            await self.client.aclose()
@@ -0,0 +1,139 @@
+"""Client-side token-bucket rate limiting for GLM API calls."""
+
+import asyncio
+import time
+from typing import Any
+
+from config.settings import settings
+
+_shared_limiter: "RateLimiter | None" = None
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float, capacity: float | None = None) -> None:
+        """Initialize token bucket."""
+        self.capacity = capacity or per_minute
+        self.fill_rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        """Add tokens accrued since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def time_until_available(self, amount: float) -> float:
+        """Seconds until ``amount`` tokens can be consumed."""
+        self._refill()
+        amount = min(amount, self.capacity)
+
+        if self.tokens >= amount:
+            return 0.0
+
+        return (amount - self.tokens) / self.fill_rate
+
+    def consume(self, amount: float) -> None:
+        """Consume tokens, allowing a single oversized request to drain the bucket."""
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter with FIFO queueing.
+
+    Callers that exceed the budget wait in line instead of failing, so bursts
+    of concurrent agents turn into queueing delay rather than 429 errors.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+    ) -> None:
+        """Initialize rate limiter. A limit of 0 disables that bucket."""
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._lock = asyncio.Lock()
+        self.queue_depth = 0
+        self.stats: dict[str, Any] = {
+            "acquired": 0,
+            "waited": 0,
+            "total_wait_time": 0.0,
+            "max_wait_time": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        """Check if any limit is configured."""
+        return self.request_bucket is not None or self.token_bucket is not None
+
+    def _time_until_available(self, tokens: int) -> float:
+        """Seconds until both buckets can admit the request."""
+        wait = 0.0
+
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.time_until_available(1))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.time_until_available(tokens))
+
+        return wait
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Wait for capacity for one request using ``tokens`` tokens.
+
+        Returns the time spent waiting in seconds.
+        """
+        if not self.enabled:
+            self.stats["acquired"] += 1
+            return 0.0
+
+        started = time.monotonic()
+        self.queue_depth += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth)
+
+        try:
+            async with self._lock:
+                while (wait := self._time_until_available(tokens)) > 0:
+                    await asyncio.sleep(wait)
+
+                if self.request_bucket is not None:
+                    self.request_bucket.consume(1)
+                if self.token_bucket is not None:
+                    self.token_bucket.consume(tokens)
+        finally:
+            self.queue_depth -= 1
+
+        waited = time.monotonic() - started
+        self.stats["acquired"] += 1
+        if waited > 0.001:
+            self.stats["waited"] += 1
+        self.stats["total_wait_time"] += waited
+        self.stats["max_wait_time"] = max(self.stats["max_wait_time"], waited)
+
+        return waited
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get limiter counters including the current queue depth."""
+        acquired = self.stats["acquired"]
+        return {
+            **self.stats,
+            "queue_depth": self.queue_depth,
+            "avg_wait_time": self.stats["total_wait_time"] / acquired if acquired else 0.0,
+        }
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Get the process-wide rate limiter shared by all agents."""
+    global _shared_limiter
+
+    if _shared_limiter is None:
+        _shared_limiter = RateLimiter(
+            requests_per_minute=settings.glm_requests_per_minute,
+            tokens_per_minute=settings.glm_tokens_per_minute,
+        )
+
+    return _shared_limiter
@@ -0,0 +1,285 @@
+"""Content-addressed cache for GLM completion responses."""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+import aiosqlite
+
+from config.settings import settings
+
+_shared_cache: "ResponseCache | None" = None
+
+
+class CacheEntry(NamedTuple):
+    """Cached response with the cost it took to produce it."""
+
+    content: str
+    expires_at: float
+    latency: float
+    tokens: int
+
+
+def make_cache_key(
+    model: str,
+    messages: list[dict[str, Any]],
+    temperature: float,
+    max_tokens: int,
+    tools: list[dict[str, Any]] | None = None,
+) -> str:
+    """Hash the request fields that determine a completion."""
+    fields: list[Any] = [model, messages, temperature, max_tokens]
+    if tools:
+        fields.append(tools)
+    canonical = json.dumps(
+        fields,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# Expired rows are swept at least once per this many disk writes.
+DISK_SWEEP_INTERVAL = 256
+
+# When the disk tier overflows it is trimmed to this fraction of its limit,
+# so the trimming query runs once per many writes rather than on each one.
+DISK_TRIM_RATIO = 0.9
+
+
+class ResponseCache:
+    """Two-tier response cache: an in-memory LRU in front of a SQLite table.
+
+    Requests with ``temperature > 0`` bypass the cache unless
+    ``allow_nondeterministic`` is set, since their responses are not meant
+    to be repeatable.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        ttl: float | None = None,
+        max_entries: int | None = None,
+        max_disk_entries: int | None = None,
+        allow_nondeterministic: bool | None = None,
+    ) -> None:
+        """Initialize response cache. An empty ``path`` keeps it memory-only."""
+        self.path = settings.response_cache_path if path is None else path
+        self.ttl = settings.response_cache_ttl if ttl is None else ttl
+        self.max_entries = (
+            settings.response_cache_max_entries if max_entries is None else max_entries
+        )
+        self.max_disk_entries = (
+            settings.response_cache_max_disk_entries
+            if max_disk_entries is None
+            else max_disk_entries
+        )
+        self.allow_nondeterministic = (
+            settings.response_cache_allow_nondeterministic
+            if allow_nondeterministic is None
+            else allow_nondeterministic
+        )
+
+        self._memory: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._db: aiosqlite.Connection | None = None
+        self._db_lock = asyncio.Lock()
+        # Upper bound on disk rows (replaced keys are counted twice until the next trim).
+        self._disk_rows = 0
+        self._writes_since_sweep = 0
+        self.stats: dict[str, Any] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_latency": 0.0,
+            "saved_tokens": 0,
+        }
+
+    def should_cache(self, temperature: float) -> bool:
+        """Check if a request at this temperature may use the cache."""
+        if temperature > 0 and not self.allow_nondeterministic:
+            self.stats["bypassed"] += 1
+            return False
+
+        return True
+
+    async def _connect(self) -> aiosqlite.Connection | None:
+        """Open the disk tier on first use."""
+        if not self.path:
+            return None
+
+        if self._db is None:
+            self._db = await aiosqlite.connect(self.path)
+            await self._db.execute("PRAGMA journal_mode=WAL")
+            await self._db.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    latency REAL NOT NULL DEFAULT 0,
+                    tokens INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            await self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)"
+            )
+            await self._db.commit()
+            self._disk_rows = await self._count_disk_rows(self._db)
+
+        return self._db
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        """Insert into the memory tier, evicting least recently used entries."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _record_hit(self, tier: str, entry: CacheEntry) -> str:
+        """Record a cache hit and return its content."""
+        self.stats[f"{tier}_hits"] += 1
+        self.stats["saved_latency"] += entry.latency
+        self.stats["saved_tokens"] += entry.tokens
+        return entry.content
+
+    async def get(self, key: str) -> str | None:
+        """Get a cached response, or None on a miss."""
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._memory.move_to_end(key)
+                return self._record_hit("memory", entry)
+            del self._memory[key]
+
+        async with self._db_lock:
+            db = await self._connect()
+            if db is not None:
+                async with db.execute(
+                    "SELECT content, expires_at, latency, tokens FROM responses WHERE key = ?",
+                    (key,),
+                ) as cursor:
+                    row = await cursor.fetchone()
+
+                if row is not None:
+                    entry = CacheEntry(*row)
+                    if entry.expires_at > now:
+                        await db.execute(
+                            "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        await db.commit()
+                        self._remember(key, entry)
+                        return self._record_hit("disk", entry)
+
+                    await db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    await db.commit()
+                    self._disk_rows -= 1
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(
+        self,
+        key: str,
+        content: str,
+        latency: float = 0.0,
+        tokens: int = 0,
+    ) -> None:
+        """Store a response in both tiers."""
+        now = time.time()
+        entry = CacheEntry(content, now + self.ttl, latency, tokens)
+        self._remember(key, entry)
+        self.stats["stores"] += 1
+
+        async with self._db_lock:
+            db = await self._connect()
+            if db is None:
+                return
+
+            await db.execute(
+                """INSERT OR REPLACE INTO responses
+                   (key, content, expires_at, accessed_at, latency, tokens)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (key, content, entry.expires_at, now, latency, tokens),
+            )
+            self._disk_rows += 1
+            self._writes_since_sweep += 1
+            if (
+                self._disk_rows > self.max_disk_entries
+                or self._writes_since_sweep >= DISK_SWEEP_INTERVAL
+            ):
+                await self._evict_disk(db, now)
+            await db.commit()
+
+    @staticmethod
+    async def _count_disk_rows(db: aiosqlite.Connection) -> int:
+        async with db.execute("SELECT COUNT(*) FROM responses") as cursor:
+            (count,) = await cursor.fetchone()
+        return count
+
+    async def _evict_disk(self, db: aiosqlite.Connection, now: float) -> None:
+        """Drop expired rows and, if over the limit, trim the disk tier below it."""
+        cursor = await db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        evicted = cursor.rowcount
+        self._writes_since_sweep = 0
+        self._disk_rows = await self._count_disk_rows(db)
+
+        if self._disk_rows > self.max_disk_entries:
+            cursor = await db.execute(
+                """DELETE FROM responses WHERE key IN (
+                       SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                   )""",
+                (int(self.max_disk_entries * DISK_TRIM_RATIO),),
+            )
+            evicted += cursor.rowcount
+            self._disk_rows = await self._count_disk_rows(db)
+
+        self.stats["evictions"] += max(evicted, 0)
+
+    async def clear(self) -> None:
+        """Remove all cached responses."""
+        self._memory.clear()
+
+        async with self._db_lock:
+            db = await self._connect()
+            if db is not None:
+                await db.execute("DELETE FROM responses")
+                await db.commit()
+                self._disk_rows = 0
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get hit/miss counters and the latency and tokens saved by hits."""
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    async def close(self) -> None:
+        """Close the disk tier."""
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+
+def get_shared_response_cache() -> ResponseCache:
+    """Get the process-wide response cache."""
+    global _shared_cache
+
+    if _shared_cache is None:
+        _shared_cache = ResponseCache()
+
+    return _shared_cache
@@ -0,0 +1,117 @@
+"""Retry policy with jittered exponential backoff for GLM API calls."""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, TypeVar
+
+import httpx
+
+from config.settings import settings
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a ``Retry-After`` header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Decides whether and how long to wait before retrying a failed request."""
+
+    def __init__(
+        self,
+        max_retries: int | None = None,
+        base_delay: float | None = None,
+        max_delay: float | None = None,
+        retry_statuses: frozenset[int] = RETRYABLE_STATUS_CODES,
+    ) -> None:
+        """Initialize retry policy."""
+        self.max_retries = settings.glm_max_retries if max_retries is None else max_retries
+        self.base_delay = settings.glm_retry_base_delay if base_delay is None else base_delay
+        self.max_delay = settings.glm_retry_max_delay if max_delay is None else max_delay
+        self.retry_statuses = retry_statuses
+        self.stats: dict[str, Any] = {
+            "retries": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "transport_errors": 0,
+            "gave_up": 0,
+            "backoff_time": 0.0,
+        }
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """Check if an error is worth retrying."""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in self.retry_statuses
+
+        return isinstance(error, httpx.TransportError)
+
+    def compute_delay(self, attempt: int, error: BaseException | None = None) -> float:
+        """Compute backoff delay for a zero-based retry attempt.
+
+        A server-supplied ``Retry-After`` wins, capped at ``max_delay`` so a
+        misbehaving server cannot stall a request indefinitely; otherwise
+        "full jitter" spreads concurrent retries uniformly over the
+        exponential window.
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = parse_retry_after(error.response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.max_delay)
+
+        window = min(self.max_delay, self.base_delay * (2**attempt))
+        return random.uniform(0, window)
+
+    def should_retry(self, error: BaseException, attempt: int) -> bool:
+        """Check if a request should be retried and record the failure."""
+        if isinstance(error, httpx.HTTPStatusError):
+            if error.response.status_code == 429:
+                self.stats["rate_limited"] += 1
+            elif error.response.status_code >= 500:
+                self.stats["server_errors"] += 1
+        elif isinstance(error, httpx.TransportError):
+            self.stats["transport_errors"] += 1
+
+        if attempt >= self.max_retries or not self.is_retryable(error):
+            self.stats["gave_up"] += 1
+            return False
+
+        return True
+
+    async def backoff(self, attempt: int, error: BaseException | None = None) -> None:
+        """Sleep before the next attempt."""
+        delay = self.compute_delay(attempt, error)
+        self.stats["retries"] += 1
+        self.stats["backoff_time"] += delay
+        await asyncio.sleep(delay)
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Call ``func`` until it succeeds or retries are exhausted."""
+        attempt = 0
+
+        while True:
+            try:
+                return await func()
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                await self.backoff(attempt, e)
+                attempt += 1
@@ -0,0 +1,162 @@
+"""Single-flight deduplication of identical in-flight requests."""
+
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Hashable
+
+_shared_flight: "SingleFlight | None" = None
+_shared_stream_flight: "StreamFlight | None" = None
+
+
+class SingleFlight:
+    """Run at most one call per key; concurrent callers share its result."""
+
+    def __init__(self) -> None:
+        """Initialize single-flight group."""
+        self._calls: dict[Hashable, asyncio.Task[Any]] = {}
+        self.stats: dict[str, int] = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Call ``func`` unless a call with the same key is already running.
+
+        Waiters are shielded, so one caller being cancelled does not cancel
+        the shared call for everybody else.
+        """
+        task = self._calls.get(key)
+
+        if task is None:
+            self.stats["calls"] += 1
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+
+        return await asyncio.shield(task)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently running."""
+        return len(self._calls)
+
+
+class _Broadcast:
+    """Buffers chunks from one source stream and replays them to subscribers."""
+
+    def __init__(self, source: AsyncIterator[Any], on_done: Callable[[], None]) -> None:
+        self.chunks: list[Any] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        self._on_done = on_done
+        self._task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]) -> None:
+        """Consume the source stream and wake subscribers on every chunk."""
+        try:
+            async for chunk in source:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._on_done()
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    def subscribe(self) -> AsyncGenerator[Any, None]:
+        """Yield every chunk of the stream, starting from the first one.
+
+        The subscriber counts from this call, not from its first read, so the
+        stream is not abandoned while a follower has yet to start reading.
+        """
+        self.subscribers += 1
+        return self._replay()
+
+    async def _replay(self) -> AsyncGenerator[Any, None]:
+        position = 0
+
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(
+                        lambda: position < len(self.chunks) or self.done
+                    )
+                    pending = self.chunks[position:]
+                    finished = self.done
+
+                for chunk in pending:
+                    yield chunk
+                position += len(pending)
+
+                if finished and position >= len(self.chunks):
+                    break
+
+            if isinstance(self.error, asyncio.CancelledError):
+                raise RuntimeError("Shared stream was cancelled before it finished")
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # Detach first so a caller arriving now starts a fresh stream.
+                self._on_done()
+                self._task.cancel()
+
+
+class StreamFlight:
+    """Fan a single upstream stream out to all concurrent subscribers with the same key."""
+
+    def __init__(self) -> None:
+        """Initialize stream single-flight group."""
+        self._streams: dict[Hashable, _Broadcast] = {}
+        self.stats: dict[str, int] = {"streams": 0, "coalesced": 0}
+
+    def subscribe(
+        self,
+        key: Hashable,
+        factory: Callable[[], AsyncIterator[Any]],
+    ) -> AsyncGenerator[Any, None]:
+        """Subscribe to the stream for ``key``, starting it if needed."""
+        broadcast = self._streams.get(key)
+
+        if broadcast is None:
+            self.stats["streams"] += 1
+            broadcast = _Broadcast(factory(), lambda: self._release(key, broadcast))
+            self._streams[key] = broadcast
+        else:
+            self.stats["coalesced"] += 1
+
+        return broadcast.subscribe()
+
+    def _release(self, key: Hashable, broadcast: _Broadcast) -> None:
+        """Forget ``broadcast``, unless a newer stream already took its key."""
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
+
+    @property
+    def in_flight(self) -> int:
+        """Number of streams currently running."""
+        return len(self._streams)
+
+
+def get_shared_single_flight() -> SingleFlight:
+    """Get the process-wide single-flight group for completions."""
+    global _shared_flight
+
+    if _shared_flight is None:
+        _shared_flight = SingleFlight()
+
+    return _shared_flight
+
+
+def get_shared_stream_flight() -> StreamFlight:
+    """Get the process-wide single-flight group for streams."""
+    global _shared_stream_flight
+
+    if _shared_stream_flight is None:
+        _shared_stream_flight = StreamFlight()
+
+    return _shared_stream_flight
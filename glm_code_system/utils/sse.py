@@ -0,0 +1,118 @@
+"""Incremental server-sent events parser for GLM streaming responses."""
+
+import json
+from typing import Any, NamedTuple
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:  # pragma: no cover - optional speedup
+    json_loads = json.loads
+
+DONE = b"[DONE]"
+
+
+class SSEEvent(NamedTuple):
+    """A single dispatched server-sent event."""
+
+    event: str | None
+    data: bytes
+
+
+class StreamDelta(NamedTuple):
+    """Content and metadata carried by one streamed completion chunk."""
+
+    content: str | None
+    finish_reason: str | None = None
+    usage: dict[str, Any] | None = None
+    # Tool-call fragments: ``{"index", "id", "function": {"name", "arguments"}}``,
+    # with ``arguments`` split across chunks.
+    tool_calls: list[dict[str, Any]] | None = None
+
+
+class SSEParser:
+    """Parses raw byte chunks into events.
+
+    Frames may be split across reads at any byte; ``data:`` fields of one
+    event are joined with newlines as the SSE spec requires. Lines may end
+    with LF or CRLF.
+    """
+
+    def __init__(self) -> None:
+        """Initialize parser."""
+        self._buffer = b""
+        self._data: list[bytes] = []
+        self._event: str | None = None
+
+    def feed(self, chunk: bytes) -> list[SSEEvent]:
+        """Feed raw bytes and return the events completed by them."""
+        buffer = self._buffer + chunk if self._buffer else chunk
+        events: list[SSEEvent] = []
+        start = 0
+
+        while (end := buffer.find(b"\n", start)) >= 0:
+            line = buffer[start:end]
+            start = end + 1
+
+            if line.endswith(b"\r"):
+                line = line[:-1]
+
+            if not line:
+                self._dispatch(events)
+            elif line.startswith(b"data:"):
+                value = line[5:]
+                self._data.append(value[1:] if value.startswith(b" ") else value)
+            elif not line.startswith(b":"):
+                field, _, value = line.partition(b":")
+                if field == b"event":
+                    self._event = value.strip().decode("utf-8")
+
+        self._buffer = buffer[start:]
+        return events
+
+    def flush(self) -> list[SSEEvent]:
+        """Return any event left unterminated when the stream ended."""
+        events = self.feed(b"\n") if self._buffer else []
+        self._dispatch(events)
+        return events
+
+    def _dispatch(self, events: list[SSEEvent]) -> None:
+        """Emit the pending event, if it carried any data."""
+        if self._data:
+            data = self._data[0] if len(self._data) == 1 else b"\n".join(self._data)
+            events.append(SSEEvent(self._event, data))
+        self._data = []
+        self._event = None
+
+
+def parse_stream_delta(data: bytes) -> StreamDelta | None:
+    """Decode a completion chunk payload into a delta.
+
+    Raises ``ValueError`` for malformed payloads so callers can decide how to
+    surface them.
+    """
+    payload = json_loads(data)
+    if not isinstance(payload, dict):
+        raise ValueError(f"Expected a JSON object, got {type(payload).__name__}")
+
+    choices = payload.get("choices")
+    usage = payload.get("usage")
+
+    if not choices:
+        return StreamDelta(None, None, usage) if usage else None
+
+    choice = choices[0] if isinstance(choices, list) else None
+    if not isinstance(choice, dict):
+        raise ValueError("Expected choices to be a list of objects")
+    delta = choice.get("delta") or {}
+    if not isinstance(delta, dict):
+        raise ValueError("Expected delta to be a JSON object")
+    content = delta.get("content")
+    tool_calls = delta.get("tool_calls") or None
+    finish_reason = choice.get("finish_reason")
+
+    if content is None and tool_calls is None and finish_reason is None and usage is None:
+        return None
+
+    return StreamDelta(content, finish_reason, usage, tool_calls)
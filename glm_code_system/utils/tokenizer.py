@@ -0,0 +1,89 @@
+"""Token counting for prompt budgeting."""
+
+import json
+from typing import Any, Protocol
+
+from config.settings import settings
+
+# Per-message framing overhead (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_default_tokenizer: "Tokenizer | None" = None
+
+
+class Tokenizer(Protocol):
+    """Anything that can count tokens in a string."""
+
+    def count(self, text: str) -> int:
+        """Count tokens in text."""
+        ...
+
+
+class ApproximateTokenizer:
+    """Fast heuristic tokenizer.
+
+    Counts roughly four ASCII characters per token and one token per
+    non-ASCII (typically CJK) character, which errs on the side of
+    over-counting for GLM's tokenizer.
+    """
+
+    def count(self, text: str) -> int:
+        """Estimate tokens in text."""
+        if not text:
+            return 0
+
+        if text.isascii():
+            return (len(text) + 3) // 4
+
+        # Non-ASCII characters take 2-4 UTF-8 bytes; CJK takes 3.
+        extra_bytes = len(text.encode("utf-8")) - len(text)
+        non_ascii = max(1, extra_bytes // 2)
+        return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+class TiktokenTokenizer:
+    """Tokenizer backed by ``tiktoken`` (optional dependency)."""
+
+    def __init__(self, encoding: str = "cl100k_base") -> None:
+        """Initialize tiktoken encoding."""
+        import tiktoken
+
+        self.encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        """Count tokens in text."""
+        if not text:
+            return 0
+
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+def get_tokenizer() -> Tokenizer:
+    """Get the configured tokenizer, falling back to the approximate one."""
+    global _default_tokenizer
+
+    if _default_tokenizer is None:
+        if settings.context_tokenizer == "tiktoken":
+            try:
+                _default_tokenizer = TiktokenTokenizer()
+            except ImportError:
+                _default_tokenizer = ApproximateTokenizer()
+        else:
+            _default_tokenizer = ApproximateTokenizer()
+
+    return _default_tokenizer
+
+
+def count_message_tokens(
+    messages: list[dict[str, Any]],
+    tokenizer: Tokenizer | None = None,
+) -> int:
+    """Count tokens in a list of chat messages including framing overhead."""
+    tokenizer = tokenizer or get_tokenizer()
+
+    return sum(
+        tokenizer.count(str(message.get("content") or ""))
+        + tokenizer.count(json.dumps(message["tool_calls"]) if message.get("tool_calls") else "")
+        + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
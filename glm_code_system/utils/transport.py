@@ -0,0 +1,72 @@
+"""Shared HTTP transport for GLM API clients."""
+
+import importlib.util
+
+import httpx
+
+from config.settings import settings
+
+_shared_client: httpx.AsyncClient | None = None
+
+
+def http2_available() -> bool:
+    """Check if the optional ``h2`` package needed for HTTP/2 is installed."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_limits() -> httpx.Limits:
+    """Build connection pool limits from settings."""
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+
+
+def build_timeout() -> httpx.Timeout:
+    """Build split connect/read/write/pool timeouts from settings."""
+    return httpx.Timeout(
+        connect=settings.http_connect_timeout,
+        read=settings.http_read_timeout,
+        write=settings.http_write_timeout,
+        pool=settings.http_pool_timeout,
+    )
+
+
+def create_http_client(
+    limits: httpx.Limits | None = None,
+    timeout: httpx.Timeout | None = None,
+    http2: bool | None = None,
+) -> httpx.AsyncClient:
+    """Create a pooled HTTP client.
+
+    HTTP/2 is only enabled when requested and the ``h2`` package is installed,
+    otherwise the client falls back to HTTP/1.1 keep-alive connections.
+    """
+    if http2 is None:
+        http2 = settings.http2_enabled
+
+    return httpx.AsyncClient(
+        limits=limits or build_limits(),
+        timeout=timeout or build_timeout(),
+        http2=http2 and http2_available(),
+    )
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Get the process-wide HTTP client, creating it on first use."""
+    global _shared_client
+
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = create_http_client()
+
+    return _shared_client
+
+
+async def close_shared_client() -> None:
+    """Close the process-wide HTTP client and release its connections."""
+    global _shared_client
+
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
@@ -0,0 +1,6 @@
+"""Shared test setup."""
+
+import os
+
+# Settings require an API key; tests never reach the API.
+os.environ.setdefault("GLM_API_KEY", "test-key")
@@ -0,0 +1,121 @@
+"""Tests for trigram-indexed content search."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from config.settings import settings
+from glm_code_system.tools import content_search, workspace_index
+from glm_code_system.tools.content_search import (
+    file_trigrams,
+    literal_trigrams,
+    required_literals,
+    search_content,
+)
+from glm_code_system.tools.registry import SearchFilesTool
+
+
+@pytest.fixture(autouse=True)
+def isolated_indexes(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "content_search_index_dir", str(tmp_path / "index"))
+    yield
+    content_search._indexes.clear()
+    workspace_index.close_workspace_indexes()
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "work"
+    root.mkdir()
+    (root / "accents.py").write_text('title = "Été"\n', encoding="utf-8")
+    (root / "shout.py").write_text('title = "ÉTÉ total"\n', encoding="utf-8")
+    (root / "main.py").write_text("def handle_request(request):\n    return request\n")
+    (root / "blob.bin").write_bytes(b"handle_request\0\1\2")
+    return root
+
+
+def paths(results) -> list[str]:
+    return [found.path for found in results.files]
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        ("handle_request", ["handle_request"]),
+        (r"def \w+_request\(", ["def ", "_request("]),
+        ("colou?r", ["colo", "r"]),
+        ("foo|bar", []),
+        ("(a|b)cdef", ["cdef"]),
+    ],
+)
+def test_required_literals(pattern, expected):
+    assert required_literals(pattern) == expected
+
+
+def test_query_trigrams_fold_like_file_trigrams(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_text("Été Total", encoding="utf-8")
+
+    indexed = file_trigrams(str(path), 1000)
+
+    assert np.isin(literal_trigrams(["Été Total"]), indexed).all()
+
+
+def test_case_insensitive_trigrams_skip_cased_non_ascii():
+    folded = literal_trigrams(["Été total"], case_sensitive=False)
+
+    assert not (folded >> 16 >= 0x80).any()
+    assert len(folded) == len(literal_trigrams([" total"]))
+
+
+@pytest.mark.parametrize("use_index", [True, False])
+@pytest.mark.parametrize(
+    "query, case_sensitive, expected",
+    [
+        ("Été", None, ["accents.py"]),
+        ("été", False, ["accents.py", "shout.py"]),
+        ("ÉTÉ tot", None, ["shout.py"]),
+        ("handle_request", None, ["main.py"]),
+    ],
+)
+async def test_search_matches_with_and_without_index(
+    workspace, monkeypatch, use_index, query, case_sensitive, expected
+):
+    monkeypatch.setattr(settings, "content_search_index", use_index)
+
+    results = await search_content(query, str(workspace), case_sensitive=case_sensitive)
+
+    assert sorted(paths(results)) == expected
+
+
+async def test_regex_search_reports_lines(workspace):
+    results = await search_content(r"return \w+", str(workspace), regex=True)
+
+    assert paths(results) == ["main.py"]
+    assert results.files[0].matches[0].line == 2
+
+
+async def test_index_sees_edited_files(workspace):
+    assert paths(await search_content("fresh_name", str(workspace))) == []
+
+    (workspace / "main.py").write_text("fresh_name = 1\n")
+
+    assert paths(await search_content("fresh_name", str(workspace))) == ["main.py"]
+
+
+async def test_concurrent_searches_and_globs(workspace):
+    for n in range(10):
+        sub = workspace / f"pkg{n}"
+        sub.mkdir()
+        for i in range(100):
+            (sub / f"m{i}.py").write_text(f"value_{i} = {n}\n")
+    tool = SearchFilesTool()
+
+    results = await asyncio.gather(
+        *(search_content(f"value_{i} =", str(workspace)) for i in range(10)),
+        *(tool.execute(pattern="m1*.py", path=str(workspace)) for _ in range(10)),
+    )
+
+    assert all(len(found.files) == 10 for found in results[:10])
+    assert all(found.success and found.metadata["count"] == 110 for found in results[10:])
@@ -0,0 +1,111 @@
+"""Tests for diff parsing and transactional file writes."""
+
+import os
+
+import pytest
+
+from glm_code_system.tools import file_writer
+from glm_code_system.tools.file_writer import build_changes, write_files
+from glm_code_system.tools.patch import PatchError, parse_patch
+
+
+async def apply(diff: str, path: str | None = None):
+    return await write_files(build_changes(path, diff=diff))
+
+
+async def test_patch_keeps_crlf_line_endings(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_bytes(b"one\r\ntwo\r\nthree\r\n")
+
+    await apply("@@ -2,1 +2,1 @@\n-two\n+TWO\n", str(target))
+
+    assert target.read_bytes() == b"one\r\nTWO\r\nthree\r\n"
+
+
+async def test_hunk_applies_at_nearest_offset(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_text("".join(f"line {n}\n" for n in range(1, 11)))
+
+    # The header is three lines off; the context still pins the hunk.
+    await apply("@@ -3,3 +3,3 @@\n line 5\n-line 6\n+line six\n line 7\n", str(target))
+
+    assert target.read_text().splitlines()[4:7] == ["line 5", "line six", "line 7"]
+
+
+async def test_create_and_delete_through_dev_null(tmp_path):
+    old = tmp_path / "old.txt"
+    old.write_text("bye\n")
+    new = tmp_path / "pkg" / "new.txt"
+    diff = (
+        f"--- /dev/null\n+++ {new}\n@@ -0,0 +1,1 @@\n+hello\n"
+        f"--- {old}\n+++ /dev/null\n@@ -1,1 +0,0 @@\n-bye\n"
+    )
+
+    outcomes = await apply(diff)
+
+    assert [o.status for o in outcomes] == ["created", "deleted"]
+    assert new.read_text() == "hello\n"
+    assert not old.exists()
+
+
+async def test_create_diff_refuses_existing_file(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_text("keep\n")
+
+    with pytest.raises(FileExistsError):
+        await apply(f"--- /dev/null\n+++ {target}\n@@ -0,0 +1,1 @@\n+new\n")
+    assert target.read_text() == "keep\n"
+
+
+async def test_delete_diff_must_match_file(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_text("actual\ncontent\n")
+
+    with pytest.raises(PatchError):
+        await apply(f"--- {target}\n+++ /dev/null\n@@ -1,1 +0,0 @@\n-actual\n")
+    with pytest.raises(PatchError):
+        await apply(f"--- {target}\n+++ /dev/null\n@@ -1,1 +0,0 @@\n-other\n")
+    assert target.read_text() == "actual\ncontent\n"
+
+
+async def test_failed_rename_rolls_back_earlier_files(tmp_path, monkeypatch):
+    first, second = tmp_path / "a.txt", tmp_path / "b.txt"
+    first.write_text("a\n")
+    second.write_text("b\n")
+    replace = os.replace
+
+    def failing_replace(src, dst):
+        if os.fspath(dst) == str(second) and src.endswith(".tmp"):
+            raise OSError("disk full")
+        replace(src, dst)
+
+    monkeypatch.setattr(file_writer.os, "replace", failing_replace)
+    changes = build_changes(
+        files=[{"path": str(first), "content": "A\n"}, {"path": str(second), "content": "B\n"}]
+    )
+
+    with pytest.raises(OSError, match="disk full"):
+        await write_files(changes)
+
+    assert first.read_text() == "a\n"
+    assert second.read_text() == "b\n"
+    assert sorted(os.listdir(tmp_path)) == ["a.txt", "b.txt"]
+
+
+def test_header_like_lines_inside_a_hunk_are_changes():
+    diff = "--- a/notes.md\n+++ b/notes.md\n@@ -1,2 +1,2 @@\n--- old\n+++ new\n keep\n"
+
+    (patch,) = parse_patch(diff)
+
+    assert patch.path == "notes.md"
+    assert patch.hunks[0].old == ["-- old\n", "keep\n"]
+    assert patch.hunks[0].new == ["++ new\n", "keep\n"]
+
+
+def test_miscounted_hunk_still_ends_at_next_file_header():
+    diff = (
+        "--- a/one.py\n+++ b/one.py\n@@ -1,5 +1,5 @@\n-x\n+y\n"
+        "--- a/two.py\n+++ b/two.py\n@@ -1 +1 @@\n-p\n+q\n"
+    )
+
+    assert [patch.path for patch in parse_patch(diff)] == ["one.py", "two.py"]
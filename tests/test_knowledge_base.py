@@ -0,0 +1,73 @@
+"""Tests for duplicate folding in the knowledge base."""
+
+import pytest
+
+from config.settings import settings
+from glm_code_system.learning.embeddings import HashingEmbedder
+from glm_code_system.learning.knowledge_base import CodePattern, KnowledgeBase
+
+CODE = """def add(a, b):
+    return a + b
+"""
+
+
+@pytest.fixture
+async def kb(tmp_path):
+    kb = KnowledgeBase(f"sqlite+aiosqlite:///{tmp_path / 'kb.db'}", HashingEmbedder(64))
+    await kb.initialize()
+    yield kb
+    await kb.close()
+
+
+async def get_pattern(kb: KnowledgeBase, pattern_id: int) -> CodePattern:
+    async with kb.async_session() as session:
+        return await session.get(CodePattern, pattern_id)
+
+
+async def test_duplicate_pattern_folds_into_existing(kb):
+    first = await kb.add_pattern("function", CODE, "Add two numbers")
+    second = await kb.add_pattern("function", CODE, "Sum helper")
+
+    assert second.id == first.id
+    pattern = await get_pattern(kb, first.id)
+    assert pattern.duplicate_count == 1
+    assert pattern.usage_count == 0
+    assert pattern.success_rate == 1.0
+
+
+async def test_duplicates_within_one_batch_fold(kb):
+    rows = [kb._new_pattern("function", CODE, f"copy {i}", None, None) for i in range(3)]
+
+    ids = await kb._write_batch(rows)
+
+    assert len(set(ids)) == 1
+    pattern = await get_pattern(kb, ids[0])
+    assert pattern.duplicate_count == 2
+    assert pattern.usage_count == 0
+
+
+async def test_folding_does_not_skew_success_rate(kb):
+    first = await kb.add_pattern("function", CODE, "Add two numbers")
+    await kb.add_pattern("function", CODE, "Add two numbers again")
+
+    await kb.record_pattern_outcomes([(first.id, False)])
+
+    pattern = await get_pattern(kb, first.id)
+    assert pattern.usage_count == 1
+    assert pattern.success_rate == 0.0
+
+
+async def test_different_types_are_not_folded(kb):
+    first = await kb.add_pattern("function", CODE, "Add two numbers")
+    second = await kb.add_pattern("test", CODE, "Add two numbers")
+
+    assert second.id != first.id
+
+
+async def test_dedup_can_be_disabled(kb, monkeypatch):
+    monkeypatch.setattr(settings, "kb_dedup_enabled", False)
+
+    first = await kb.add_pattern("function", CODE, "Add two numbers")
+    second = await kb.add_pattern("function", CODE, "Add two numbers")
+
+    assert second.id != first.id
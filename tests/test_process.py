@@ -0,0 +1,91 @@
+"""Tests for subprocess runs with timeouts and bounded output."""
+
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from glm_code_system.tools import process
+from glm_code_system.tools.process import OutputBuffer, ProcessRun
+
+pytestmark = pytest.mark.skipif(
+    not os.path.isdir("/proc"), reason="needs POSIX process groups and /proc"
+)
+
+PYTHON = sys.executable
+
+
+def is_running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_output_buffer_keeps_head_and_tail():
+    buffer = OutputBuffer(10)
+
+    for chunk in (b"abc", b"defgh", b"ijklmnop"):
+        buffer.write(chunk)
+
+    assert buffer.total == 16
+    assert buffer.dropped == 6
+    assert buffer.getvalue() == "abcde\n... [6 bytes truncated] ...\nlmnop"
+
+
+async def test_collects_output_and_exit_status():
+    run = ProcessRun(f"{PYTHON} -c \"print('out'); import sys; sys.exit(3)\" 1>&2")
+
+    assert await run.wait() == 3
+    assert run.stderr.getvalue() == "out\n"
+    assert run.timed_out is None
+
+
+async def test_hard_timeout_kills_the_process_group():
+    run = ProcessRun("sleep 30 & echo $!; wait", timeout=0.5, idle_timeout=0)
+    started = time.monotonic()
+
+    await run.wait()
+
+    assert run.timed_out == "hard"
+    assert run.returncode == -signal.SIGTERM
+    assert time.monotonic() - started < 5
+    assert not is_running(int(run.stdout.getvalue()))
+
+
+async def test_idle_timeout_keeps_earlier_output():
+    run = ProcessRun("echo started; sleep 30", timeout=10, idle_timeout=0.5)
+
+    await run.wait()
+
+    assert run.timed_out == "idle"
+    assert run.stdout.getvalue() == "started\n"
+
+
+async def test_sigkill_after_grace_period(monkeypatch):
+    monkeypatch.setattr(process, "KILL_GRACE_PERIOD", 0.2)
+    code = (
+        "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+        "print('ready', flush=True); time.sleep(30)"
+    )
+    run = ProcessRun(f'exec {PYTHON} -c "{code}"', timeout=1, idle_timeout=0)
+
+    await run.wait()
+
+    assert run.timed_out == "hard"
+    assert run.returncode == -signal.SIGKILL
+    assert run.stdout.getvalue() == "ready\n"
+
+
+async def test_closing_the_stream_early_kills_the_process():
+    run = ProcessRun("echo first; sleep 30", timeout=0, idle_timeout=0)
+    stream = run.__aiter__()
+
+    assert (await anext(stream)).text == "first\n"
+    await stream.aclose()
+
+    assert run.returncode == -signal.SIGTERM
+    assert not is_running(run._process.pid)
@@ -0,0 +1,139 @@
+"""Tests for GLM call retries and client-side rate limiting."""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from glm_code_system.utils import rate_limiter, retry
+from glm_code_system.utils.rate_limiter import RateLimiter, TokenBucket
+from glm_code_system.utils.retry import RetryPolicy, parse_retry_after
+
+
+def status_error(code: int, **headers: str) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.example.com/chat/completions")
+    response = httpx.Response(code, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {code}", request=request, response=response)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays: list[float] = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(retry.asyncio, "sleep", sleep)
+    return delays
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    future = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(future, usegmt=True)) <= 30
+
+
+def test_retry_after_wins_but_is_capped():
+    policy = RetryPolicy(max_retries=3, base_delay=1.0, max_delay=10.0)
+
+    assert policy.compute_delay(0, status_error(429, **{"Retry-After": "4"})) == 4.0
+    assert policy.compute_delay(0, status_error(503, **{"Retry-After": "3600"})) == 10.0
+    assert 0 <= policy.compute_delay(5, status_error(503)) <= 10.0
+
+
+async def test_retries_until_exhausted(sleeps):
+    policy = RetryPolicy(max_retries=2, base_delay=0.5, max_delay=10.0)
+    calls = 0
+
+    async def overloaded():
+        nonlocal calls
+        calls += 1
+        raise status_error(503, **{"Retry-After": "1"})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await policy.call(overloaded)
+
+    assert calls == 3
+    assert sleeps == [1.0, 1.0]
+    assert policy.stats["retries"] == 2
+    assert policy.stats["gave_up"] == 1
+    assert policy.stats["server_errors"] == 3
+
+
+async def test_client_errors_are_not_retried(sleeps):
+    policy = RetryPolicy(max_retries=5)
+
+    async def bad_request():
+        raise status_error(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await policy.call(bad_request)
+
+    assert sleeps == []
+    assert policy.stats["gave_up"] == 1
+
+
+async def test_transport_error_then_success(sleeps):
+    policy = RetryPolicy(max_retries=2, base_delay=0.5, max_delay=10.0)
+    outcomes = [httpx.ConnectError("refused"), "ok"]
+
+    async def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert await policy.call(flaky) == "ok"
+    assert len(sleeps) == 1 and 0 <= sleeps[0] <= 0.5
+    assert policy.stats["transport_errors"] == 1
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.now += delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake.sleep)
+    return fake
+
+
+def test_token_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(per_minute=60)
+
+    bucket.consume(60)
+    assert bucket.time_until_available(1) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.time_until_available(30) == 0.0
+    assert bucket.time_until_available(31) == pytest.approx(1.0)
+
+
+def test_oversized_request_drains_the_bucket(clock):
+    bucket = TokenBucket(per_minute=100)
+
+    assert bucket.time_until_available(500) == 0.0
+    bucket.consume(500)
+    assert bucket.tokens == 0.0
+
+
+async def test_limiter_queues_instead_of_failing(clock):
+    limiter = RateLimiter(requests_per_minute=2)
+
+    waits = [await limiter.acquire() for _ in range(3)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(30.0)
+    assert limiter.get_stats()["waited"] == 1
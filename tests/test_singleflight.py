@@ -0,0 +1,113 @@
+"""Tests for single-flight request and stream coalescing."""
+
+import asyncio
+
+import pytest
+
+from glm_code_system.utils.singleflight import SingleFlight, StreamFlight
+
+
+class Source:
+    """A stream that yields one chunk each time ``step`` is set."""
+
+    def __init__(self, chunks: int) -> None:
+        self.chunks = chunks
+        self.step = asyncio.Event()
+        self.started = 0
+
+    async def stream(self):
+        self.started += 1
+        for n in range(self.chunks):
+            await self.step.wait()
+            self.step.clear()
+            yield n
+
+
+async def collect(stream) -> list[int]:
+    return [chunk async for chunk in stream]
+
+
+async def advance(source: Source) -> None:
+    source.step.set()
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(3)))
+
+    assert results == ["result"] * 3
+    assert calls == 1
+    assert flight.stats == {"calls": 1, "coalesced": 2}
+
+
+async def test_follower_keeps_stream_when_leader_is_cancelled():
+    flight, source = StreamFlight(), Source(3)
+    leader = asyncio.ensure_future(collect(flight.subscribe("k", source.stream)))
+    await advance(source)
+    follower = asyncio.ensure_future(collect(flight.subscribe("k", source.stream)))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await advance(source)
+    await advance(source)
+
+    assert await follower == [0, 1, 2]
+    assert leader.cancelled()
+    assert source.started == 1
+
+
+async def test_follower_that_has_not_started_reading_keeps_stream():
+    flight, source = StreamFlight(), Source(2)
+    leader = asyncio.ensure_future(collect(flight.subscribe("k", source.stream)))
+    await advance(source)
+    # Subscribed, but not yet iterating when the leader goes away.
+    pending = flight.subscribe("k", source.stream)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(collect(pending))
+    await advance(source)
+
+    assert await follower == [0, 1]
+    assert source.started == 1
+
+
+async def test_abandoned_stream_is_detached_and_restarted():
+    flight, source = StreamFlight(), Source(2)
+    leader = asyncio.ensure_future(collect(flight.subscribe("k", source.stream)))
+    await advance(source)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    assert flight.in_flight == 0
+    fresh = asyncio.ensure_future(collect(flight.subscribe("k", source.stream)))
+    await advance(source)
+    await advance(source)
+
+    assert await fresh == [0, 1]
+    assert source.started == 2
+    assert flight.in_flight == 0
+
+
+async def test_stream_errors_reach_every_subscriber():
+    flight = StreamFlight()
+
+    async def failing():
+        yield 1
+        raise ValueError("upstream broke")
+
+    streams = [flight.subscribe("k", failing) for _ in range(2)]
+
+    for stream in streams:
+        with pytest.raises(ValueError, match="upstream broke"):
+            await collect(stream)
@@ -0,0 +1,69 @@
+"""Tests for the incremental SSE parser and stream delta decoding."""
+
+import pytest
+
+from glm_code_system.utils.sse import DONE, SSEEvent, SSEParser, parse_stream_delta
+
+STREAM = (
+    'event: message\r\ndata: {"choices": [{"delta": {"content": "Été"}}]}\r\n\r\n'
+    ": keep-alive\n\n"
+    "data: first\ndata:second\n\n"
+    "data: [DONE]\n\n"
+).encode("utf-8")
+
+EXPECTED = [
+    SSEEvent("message", '{"choices": [{"delta": {"content": "Été"}}]}'.encode("utf-8")),
+    SSEEvent(None, b"first\nsecond"),
+    SSEEvent(None, DONE),
+]
+
+
+def feed_all(chunks: list[bytes]) -> list[SSEEvent]:
+    parser = SSEParser()
+    events = [event for chunk in chunks for event in parser.feed(chunk)]
+    return events + parser.flush()
+
+
+def test_whole_stream():
+    assert feed_all([STREAM]) == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_split_at_every_boundary(size):
+    # Size 1 also splits the two-byte "É" and every CRLF pair.
+    chunks = [STREAM[i : i + size] for i in range(0, len(STREAM), size)]
+
+    assert feed_all(chunks) == EXPECTED
+
+
+def test_flush_dispatches_unterminated_event():
+    parser = SSEParser()
+
+    assert parser.feed(b"data: tail") == []
+    assert parser.flush() == [SSEEvent(None, b"tail")]
+
+
+def test_parse_stream_delta():
+    delta = parse_stream_delta(EXPECTED[0].data)
+
+    assert delta.content == "Été"
+    assert parse_stream_delta(b'{"choices": []}') is None
+    assert parse_stream_delta(b'{"choices": [], "usage": {"total_tokens": 3}}').usage == {
+        "total_tokens": 3
+    }
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"not json",
+        b"[1, 2]",
+        b'"text"',
+        b"null",
+        b'{"choices": ["x"]}',
+        b'{"choices": [{"delta": 1}]}',
+    ],
+)
+def test_malformed_payloads_raise_value_error(data):
+    with pytest.raises(ValueError):
+        parse_stream_delta(data)
@@ -0,0 +1,191 @@
+"""Tests for plan parsing and the task scheduler."""
+
+import asyncio
+
+import pytest
+
+from glm_code_system.agents.task_graph import (
+    Subtask,
+    TaskGraph,
+    TaskScheduler,
+    parse_plan,
+)
+
+
+def depends(graph: TaskGraph) -> dict[int, tuple[int, ...]]:
+    return {task_id: task.depends_on for task_id, task in graph.tasks.items()}
+
+
+def test_parse_plan_reads_annotations():
+    graph = parse_plan(
+        """Main Goal: Build the API
+
+Subtasks:
+1. Create models (complexity: low)
+2. Add endpoints (complexity: medium; depends on: 1)
+3. Write tests (complexity: high; depends on 1 and 2)
+"""
+    )
+
+    assert depends(graph) == {1: (), 2: (1,), 3: (1, 2)}
+    assert graph.tasks[1].description == "Create models"
+    assert graph.tasks[3].complexity == "high"
+
+
+def test_parse_plan_ignores_dependency_words_in_free_text():
+    graph = parse_plan(
+        """Subtasks:
+1. Create a schema that will require 3 tables (complexity: low)
+2. Deploy after 2 approvals from ops (complexity: medium; depends on: 1)
+3. Write docs (requires 2 reviewers)
+"""
+    )
+
+    assert depends(graph) == {1: (), 2: (1,), 3: ()}
+    assert graph.tasks[1].description == "Create a schema that will require 3 tables"
+
+
+def test_parse_plan_reads_dependencies_section():
+    graph = parse_plan(
+        """Subtasks:
+1. Models
+2. Endpoints
+3. Tests
+4. Docs
+
+Dependencies:
+- 2 depends on 1
+- 3: 1, 2
+- 2 -> 4
+"""
+    )
+
+    assert depends(graph) == {1: (), 2: (1,), 3: (1, 2), 4: (2,)}
+
+
+def test_parse_plan_chains_unreadable_dependencies():
+    graph = parse_plan(
+        """Subtasks:
+1. Models
+2. Endpoints
+3. Tests
+
+Dependencies:
+Do the models before anything else.
+"""
+    )
+
+    assert depends(graph) == {1: (), 2: (1,), 3: (2,)}
+
+
+def test_parse_plan_reads_json():
+    graph = parse_plan(
+        '```json\n{"subtasks": [{"id": 1, "description": "a"}, '
+        '{"id": 2, "description": "b", "complexity": "low", "depends_on": [1]}]}\n```'
+    )
+
+    assert depends(graph) == {1: (), 2: (1,)}
+    assert graph.tasks[2].complexity == "low"
+
+
+def test_parse_plan_without_subtasks_uses_fallback():
+    graph = parse_plan("I am not sure what to do.", fallback="Fix the bug")
+
+    assert list(graph.tasks.values()) == [Subtask(1, "Fix the bug")]
+
+
+def test_graph_drops_unknown_and_cyclic_edges():
+    graph = TaskGraph(
+        [
+            Subtask(1, "a", depends_on=(2, 9)),
+            Subtask(2, "b", depends_on=(1,)),
+            Subtask(3, "c", depends_on=(3, 2)),
+        ]
+    )
+
+    assert depends(graph) == {1: (), 2: (1,), 3: (2,)}
+    assert graph.order() == [1, 2, 3]
+
+
+def test_critical_path_weights_chains():
+    graph = TaskGraph(
+        [
+            Subtask(1, "a", "high"),
+            Subtask(2, "b", "low", (1,)),
+            Subtask(3, "c", "low"),
+        ]
+    )
+
+    assert graph.critical_path() == {1: 4.0, 2: 1.0, 3: 1.0}
+    assert graph.critical_path_length() == 4.0
+
+
+async def test_scheduler_runs_critical_path_first():
+    graph = TaskGraph(
+        [
+            Subtask(1, "side", "low"),
+            Subtask(2, "head", "high"),
+            Subtask(3, "tail", "high", (2,)),
+        ]
+    )
+    started = []
+
+    async def runner(task, outcomes):
+        started.append(task.id)
+        return {"success": True}
+
+    outcomes = await TaskScheduler(max_workers=1).run(graph, runner)
+
+    assert started == [2, 3, 1]
+    assert {outcome.status for outcome in outcomes.values()} == {"succeeded"}
+
+
+async def test_scheduler_runs_independent_tasks_concurrently():
+    graph = TaskGraph([Subtask(1, "a"), Subtask(2, "b"), Subtask(3, "c", depends_on=(1, 2))])
+    running = 0
+    peak = 0
+
+    async def runner(task, outcomes):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return sorted(outcomes)
+
+    outcomes = await TaskScheduler(max_workers=4).run(graph, runner)
+
+    assert peak == 2
+    assert outcomes[3].result == [1, 2]
+
+
+@pytest.mark.parametrize("failure", [RuntimeError("boom"), {"success": False, "error": "boom"}])
+async def test_scheduler_cancels_descendants_of_failed_task(failure):
+    graph = TaskGraph(
+        [
+            Subtask(1, "a"),
+            Subtask(2, "b", depends_on=(1,)),
+            Subtask(3, "c", depends_on=(2,)),
+            Subtask(4, "d"),
+        ]
+    )
+    ran = []
+
+    async def runner(task, outcomes):
+        ran.append(task.id)
+        if task.id == 1:
+            if isinstance(failure, Exception):
+                raise failure
+            return failure
+        return {"success": True}
+
+    outcomes = await TaskScheduler(max_workers=2).run(graph, runner)
+
+    assert sorted(ran) == [1, 4]
+    assert [outcomes[i].status for i in (1, 2, 3, 4)] == [
+        "failed",
+        "cancelled",
+        "cancelled",
+        "succeeded",
+    ]
+    assert outcomes[1].error == "boom"
@@ -0,0 +1,195 @@
+"""Tests for the function-calling tool loop and the coding agent built on it."""
+
+import json
+from typing import Any
+
+from glm_code_system.agents.coding import CodingAgent
+from glm_code_system.agents.context import ELIDED_TOOL_RESULT, ContextWindow
+from glm_code_system.agents.tool_loop import (
+    ToolCallBuffer,
+    compact_result,
+    run_tool_loop,
+)
+from glm_code_system.tools.registry import ToolRegistry, ToolResult
+from glm_code_system.utils.sse import StreamDelta
+from glm_code_system.utils.tokenizer import count_message_tokens
+
+
+def call(name: str, index: int = 0, **arguments: Any) -> dict[str, Any]:
+    return {"index": index, "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+class ScriptedModel:
+    """Streams one scripted turn per request: text, or a list of tool-call fragments."""
+
+    model = "glm-4"
+
+    def __init__(self, *turns: str | list[dict[str, Any]]) -> None:
+        self.turns = list(turns)
+        self.requests: list[list[dict[str, Any]]] = []
+
+    async def generate_stream_deltas(self, messages, temperature=0.7, tools=None):
+        self.requests.append([dict(m) for m in messages])
+        turn = self.turns.pop(0)
+        if isinstance(turn, str):
+            yield StreamDelta(turn)
+        else:
+            for fragment in turn:
+                yield StreamDelta(None, tool_calls=[fragment])
+
+
+async def run(model, messages, **kwargs):
+    events = [event async for event in run_tool_loop(model, ToolRegistry(), messages, **kwargs)]
+    assert events[-1].kind == "done"
+    return events, events[-1].data
+
+
+def test_buffer_joins_fragments_by_index():
+    buffer = ToolCallBuffer()
+    buffer.feed([{"index": 1, "id": "b", "function": {"name": "bash", "arguments": '{"com'}}])
+    buffer.feed([{"index": 0, "function": {"name": "read_file", "arguments": "{}"}}])
+    buffer.feed([{"index": 1, "function": {"arguments": 'mand": "ls"}'}}])
+
+    assert buffer.calls("p") == [("p_0", "read_file", "{}"), ("b", "bash", '{"command": "ls"}')]
+
+
+def test_compact_result_keeps_head_and_tail():
+    text = "head " + "x" * 1000 + " tail"
+
+    compacted = compact_result(ToolResult(success=True, output=text), limit=90)
+
+    assert compacted.startswith("head ")
+    assert compacted.endswith(" tail")
+    assert "characters omitted" in compacted
+    assert compact_result(ToolResult(success=False, output="", error="bad")) == "Error: bad"
+
+
+async def test_loop_runs_calls_and_returns_results(tmp_path):
+    (tmp_path / "a.txt").write_text("alpha")
+    (tmp_path / "b.txt").write_text("beta")
+    model = ScriptedModel(
+        [
+            call("read_file", 0, path=str(tmp_path / "a.txt")),
+            call("read_file", 1, path=str(tmp_path / "b.txt")),
+        ],
+        "Both read.",
+    )
+    messages = [{"role": "user", "content": "read both"}]
+
+    events, result = await run(model, messages)
+
+    assert result.finished and result.iterations == 2
+    assert result.content == "Both read."
+    assert [record.result.output for record in result.tool_calls] == ["alpha", "beta"]
+    assert [m["role"] for m in messages] == ["user", "assistant", "tool", "tool", "assistant"]
+    assert [m["content"] for m in model.requests[1][2:]] == ["alpha", "beta"]
+    assert [e.kind for e in events].count("tool_result") == 2
+
+
+async def test_loop_reports_unusable_arguments():
+    model = ScriptedModel(
+        [
+            {"index": 0, "function": {"name": "read_file", "arguments": "{not json"}},
+            call("bash", 1, command="echo hi", timeout=10_000),
+        ],
+        "Gave up.",
+    )
+
+    _, result = await run(model, [{"role": "user", "content": "go"}])
+
+    errors = [record.result.error for record in result.tool_calls]
+    assert errors[0].startswith("Invalid JSON arguments for read_file")
+    assert errors[1] == "Unexpected arguments for bash: timeout"
+
+
+async def test_loop_stops_after_max_iterations():
+    model = ScriptedModel(*[[call("search_files", pattern="*.nothing")] for _ in range(3)])
+
+    _, result = await run(model, [{"role": "user", "content": "go"}], max_iterations=3)
+
+    assert not result.finished
+    assert result.iterations == 3
+    assert len(result.tool_calls) == 3
+
+
+async def test_loop_fits_tool_rounds_to_budget(tmp_path):
+    (tmp_path / "big.txt").write_text("word " * 400)
+    read = [call("read_file", path=str(tmp_path / "big.txt"))]
+    model = ScriptedModel(read, read, read, read, "done")
+    context = ContextWindow(model, max_tokens=1000, reserve_tokens=0)
+
+    _, result = await run(model, [{"role": "user", "content": "go"}], context=context)
+
+    assert result.finished
+    for request in model.requests:
+        called = set()
+        for message in request:
+            called.update(c["id"] for c in message.get("tool_calls") or [])
+            if message["role"] == "tool":
+                assert message["tool_call_id"] in called
+    last = model.requests[-1]
+    assert sum(m["content"] == "word " * 400 for m in last) == 1
+    assert context.stats["elided_tool_results"] + context.stats["evicted_messages"] > 0
+
+
+def test_fit_tool_rounds_elides_then_drops_whole_rounds():
+    context = ContextWindow(ScriptedModel(), max_tokens=10_000, reserve_tokens=0)
+    messages = [{"role": "user", "content": "go"}]
+    for n in range(3):
+        messages.append(
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{"id": f"c{n}", "type": "function", "function": {}}],
+            }
+        )
+        messages.append({"role": "tool", "tool_call_id": f"c{n}", "content": "data " * 200})
+
+    # One token over budget: eliding the oldest result is enough.
+    context.max_tokens = count_message_tokens(messages, context.tokenizer) - 1
+    context.fit_tool_rounds(messages, 1)
+
+    assert [m["content"] for m in messages[2::2]] == [ELIDED_TOOL_RESULT] + ["data " * 200] * 2
+
+    context.max_tokens = 1
+    context.fit_tool_rounds(messages, 1)
+
+    assert [m["role"] for m in messages] == ["user", "assistant", "tool"]
+    assert messages[-1]["tool_call_id"] == "c2"
+
+
+def test_bash_schema_offers_only_command():
+    (schema,) = [s for s in ToolRegistry().get_tool_schemas() if s["function"]["name"] == "bash"]
+
+    assert schema["function"]["parameters"]["properties"] == {"command": {"type": "string"}}
+    assert schema["function"]["parameters"]["required"] == ["command"]
+
+
+async def execute(*turns):
+    agent = CodingAgent(ScriptedModel(*turns), ToolRegistry(), None)
+    return await agent.execute_task({"description": "fix it"})
+
+
+async def test_task_fails_when_last_test_run_fails():
+    result = await execute(
+        [call("bash", command="python -m pytest /nonexistent-dir -q")], "Done.\nSTATUS: success"
+    )
+
+    assert not result["success"]
+    assert [run["success"] for run in result["test_results"]] == [False]
+
+
+async def test_task_succeeds_when_tests_pass_after_a_failure():
+    result = await execute(
+        [call("bash", command="python -m pytest /nonexistent-dir -q")],
+        [call("bash", command="python -m pytest --version")],
+        "Fixed.\nSTATUS: success",
+    )
+
+    assert result["success"]
+    assert [run["success"] for run in result["test_results"]] == [False, True]
+
+
+async def test_task_fails_when_model_reports_failure():
+    assert not (await execute("Could not do it.\n**Status:** failure"))["success"]
+    assert (await execute("All done."))["success"]
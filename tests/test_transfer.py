@@ -0,0 +1,84 @@
+"""Tests for knowledge base export and import."""
+
+import pytest
+from sqlalchemy import select
+
+from glm_code_system.learning.embeddings import HashingEmbedder
+from glm_code_system.learning.knowledge_base import CodePattern, KnowledgeBase
+
+
+async def open_kb(path) -> KnowledgeBase:
+    kb = KnowledgeBase(f"sqlite+aiosqlite:///{path}", HashingEmbedder(64))
+    await kb.initialize()
+    return kb
+
+
+@pytest.fixture
+async def kbs(tmp_path):
+    source, target = await open_kb(tmp_path / "a.db"), await open_kb(tmp_path / "b.db")
+    yield source, target
+    await source.close()
+    await target.close()
+
+
+async def fill(kb: KnowledgeBase) -> None:
+    pattern = await kb.add_pattern("function", "def add(a, b):\n    return a + b\n", "Add")
+    await kb.add_pattern("test", "def test_add():\n    assert add(1, 2) == 3\n", "Test add")
+    await kb.add_solution("import_error", "pip install -e .", "Install the package")
+    await kb.set_preference("style", "black", confidence=0.6)
+    await kb.set_preference("style", "pep8", confidence=0.4)
+    await kb.record_pattern_outcomes([(pattern.id, True), (pattern.id, False)])
+
+
+async def patterns(kb: KnowledgeBase) -> dict[str, tuple[int, float]]:
+    async with kb.async_session() as session:
+        rows = (await session.execute(select(CodePattern))).scalars()
+        return {row.pattern_type: (row.usage_count, row.success_rate) for row in rows}
+
+
+@pytest.mark.parametrize("name", ["kb.jsonl", "kb.jsonl.gz"])
+@pytest.mark.parametrize("layout", ["rows", "columnar"])
+async def test_round_trip(kbs, tmp_path, name, layout):
+    source, target = kbs
+    await fill(source)
+    path = str(tmp_path / name)
+
+    exported = await source.export_to(path, layout=layout)
+    stats = await target.import_from(path)
+
+    assert exported == {"pattern": 2, "solution": 1, "preference": 2}
+    assert {kind: counts["inserted"] for kind, counts in stats.items()} == exported
+    assert await patterns(target) == await patterns(source)
+    assert sorted(p.value for p in await target.get_preferences("style")) == ["black", "pep8"]
+    (found,) = await target.search_patterns("function")
+    assert found.code.startswith("def add")
+
+
+async def test_conflict_policies(kbs, tmp_path):
+    source, target = kbs
+    await fill(source)
+    path = str(tmp_path / "kb.jsonl")
+    await source.export_to(path)
+    await target.import_from(path)
+
+    skipped = await target.import_from(path, conflict="skip")
+    merged = await target.import_from(path, conflict="merge")
+
+    assert skipped["pattern"]["skipped"] == 2
+    assert merged["pattern"]["merged"] == 2
+    assert (await patterns(target))["function"] == (4, 0.5)
+    assert len(await target.get_preferences("style")) == 2
+
+    await target.import_from(path, conflict="replace")
+    assert (await patterns(target))["function"] == (2, 0.5)
+
+
+async def test_import_rejects_foreign_files(kbs, tmp_path):
+    _, target = kbs
+    path = tmp_path / "other.jsonl"
+    path.write_text('{"format": "something-else"}\n')
+
+    with pytest.raises(ValueError, match="not a knowledge base export"):
+        await target.import_from(str(path))
+    with pytest.raises(ValueError, match="Unknown conflict policy"):
+        await target.import_from(str(path), conflict="overwrite")
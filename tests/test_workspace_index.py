@@ -0,0 +1,174 @@
+"""Tests for the workspace file index."""
+
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from glm_code_system.tools import workspace_index
+from glm_code_system.tools.registry import SearchFilesTool
+from glm_code_system.tools.workspace_index import (
+    WorkspaceIndex,
+    get_workspace_index,
+    is_ignored,
+    parse_gitignore,
+)
+
+
+def touch(root, *paths: str) -> None:
+    for path in paths:
+        full = root / path
+        full.parent.mkdir(parents=True, exist_ok=True)
+        full.write_text("")
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes():
+    yield
+    workspace_index.close_workspace_indexes()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / "repo"
+    root.mkdir()
+    subprocess.run(["git", "init", "-q", str(root)], check=True)
+    (root / ".gitignore").write_text("build/\n*.log\ngen/\n")
+    touch(
+        root,
+        "src/app/main.py",
+        "src/app/debug.log",
+        "src/app/gen/generated.py",
+        "src/lib/util.py",
+        "build/out.py",
+        "node_modules/pkg/index.js",
+    )
+    return root
+
+
+def test_gitignore_rules():
+    rules = parse_gitignore("*.log\n!keep.log\n/dist/\ndocs/**/draft.md\n", "")
+
+    assert is_ignored(rules, "a/b.log", False)
+    assert not is_ignored(rules, "a/keep.log", False)
+    assert is_ignored(rules, "dist", True)
+    assert not is_ignored(rules, "dist", False)
+    assert not is_ignored(rules, "src/dist", True)
+    assert is_ignored(rules, "docs/a/b/draft.md", False)
+
+
+def test_nested_gitignore_applies_below_its_directory():
+    rules = parse_gitignore("*.tmp\n", "sub")
+
+    assert is_ignored(rules, "sub/a.tmp", False)
+    assert not is_ignored(rules, "a.tmp", False)
+
+
+def test_index_prunes_excluded_and_ignored_paths(repo):
+    index = WorkspaceIndex(str(repo), use_inotify=False)
+    index.build()
+
+    assert sorted(index.files) == [
+        ".gitignore",
+        "src/app/main.py",
+        "src/lib/util.py",
+    ]
+
+
+def test_glob_and_fuzzy(repo):
+    index = WorkspaceIndex(str(repo), use_inotify=False)
+    index.build()
+
+    assert index.glob("*.py") == ["src/app/main.py", "src/lib/util.py"]
+    assert index.glob("app/*.py") == ["src/app/main.py"]
+    assert index.glob("*.py", base="src/lib") == ["src/lib/util.py"]
+    assert index.fuzzy("utl")[0] == "src/lib/util.py"
+
+
+def test_polling_picks_up_changes(repo):
+    index = WorkspaceIndex(str(repo), use_inotify=False, poll_interval=0)
+    index.build()
+
+    touch(repo, "src/lib/extra.py")
+    os.remove(repo / "src/app/main.py")
+    # Directory mtimes may not move within the filesystem's timestamp granularity.
+    for directory in ("src/lib", "src/app"):
+        os.utime(repo / directory, ns=(1, 1))
+    index.refresh()
+
+    assert "src/lib/extra.py" in index.files
+    assert "src/app/main.py" not in index.files
+
+
+def test_narrow_path_is_indexed_on_its_own_with_inherited_rules(repo):
+    index, base = get_workspace_index(str(repo / "src/app"))
+    index.build()
+
+    assert index.root == str(repo / "src/app")
+    assert base == ""
+    assert sorted(index.files) == ["main.py"]
+
+
+def test_covering_index_is_reused(repo):
+    outer, _ = get_workspace_index(str(repo))
+    inner, base = get_workspace_index(str(repo / "src/lib"))
+
+    assert inner is outer
+    assert base == "src/lib"
+
+
+@pytest.mark.parametrize("path", ["node_modules", "build", "src/app/gen"])
+def test_excluded_or_ignored_path_is_walked_directly(repo, path):
+    outer, _ = get_workspace_index(str(repo))
+    index, base = get_workspace_index(str(repo / path))
+    index.build()
+
+    assert index is not outer
+    assert base == ""
+    assert len(index.files) == 1
+
+
+async def test_search_files_inside_ignored_directory(repo):
+    tool = SearchFilesTool()
+
+    result = await tool.execute(pattern="*.py", path=str(repo / "build"))
+
+    assert result.success
+    assert result.output == str(repo / "build" / "out.py")
+
+
+def test_refresh_publishes_a_new_snapshot(repo):
+    index = WorkspaceIndex(str(repo), use_inotify=False, poll_interval=0)
+    index.build()
+    before = index.files
+
+    touch(repo, "src/lib/extra.py")
+    os.utime(repo / "src/lib", ns=(1, 1))
+    index.refresh()
+
+    assert "src/lib/extra.py" not in before
+    assert "src/lib/extra.py" in index.files
+    unchanged = index.files
+    index.refresh()
+    assert index.files is unchanged
+
+
+async def test_glob_while_refreshing(repo, monkeypatch):
+    touch(repo, *(f"src/gen{n}/f{i}.py" for n in range(20) for i in range(200)))
+    index = WorkspaceIndex(str(repo), use_inotify=False, poll_interval=0)
+    # Switch threads often so reads overlap the refresh thread's writes.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    refresh = asyncio.ensure_future(index.ensure_fresh())
+    try:
+        while not refresh.done():
+            index.glob("*.py", base="src")
+            index.fuzzy("main", base="src")
+            await asyncio.sleep(0)
+        await refresh
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert len(index.glob("f*.py")) == 4000